@@ -168,6 +168,38 @@ contract Marketplace is Ownable, ReentrancyGuard, Pausable {
         emit MinimumOfferingUpdated(newMinimumOffering);
     }
 
+    // Unknown or already finalized ids are skipped instead of reverting,
+    // so one stale id does not fail the whole batch
+    function batchDiscardTargetedCampaigns(
+        bytes32[] calldata campaignIds
+    ) external onlyOwner nonReentrant whenNotPaused {
+        for (uint256 i = 0; i < campaignIds.length; i++) {
+            TargetedCampaign storage campaign = campaignInfo[campaignIds[i]];
+            if (
+                campaign.creatorAddress == address(0) ||
+                campaign.campaignStatus != CampaignStatus.Ongoing
+            ) {
+                continue;
+            }
+            executeTargetedDiscard(campaignIds[i], campaign);
+        }
+    }
+
+    function batchDiscardPublicCampaigns(
+        bytes32[] calldata campaignIds
+    ) external onlyOwner nonReentrant whenNotPaused {
+        for (uint256 i = 0; i < campaignIds.length; i++) {
+            PublicCampaign storage campaign = openCampaignInfo[campaignIds[i]];
+            if (
+                campaign.creatorAddress == address(0) ||
+                campaign.campaignStatus != CampaignStatus.Ongoing
+            ) {
+                continue;
+            }
+            executePublicDiscard(campaignIds[i], campaign);
+        }
+    }
+
     // ------------------ TARGETED CAMPAIGN FUNCTIONS ------------------
     function createTargetedCampaign(
         address selectedKol,
@@ -391,24 +423,7 @@ contract Marketplace is Ownable, ReentrancyGuard, Pausable {
             );
         }
 
-        campaign.campaignStatus = CampaignStatus.Discarded;
-
-        uint256 amountToReturn = campaign.amountOffered;
-        IERC20 token = IERC20(campaign.tokenAddress);
-
-        if (token.balanceOf(address(this)) < amountToReturn) {
-            revert ContractBalanceInsufficient(
-                amountToReturn,
-                token.balanceOf(address(this))
-            );
-        }
-
-        bool success = token.transfer(campaign.creatorAddress, amountToReturn);
-        if (!success) {
-            revert FundTransferError();
-        }
-
-        emit TargetedCampaignDiscarded(campaignId, msg.sender);
+        executeTargetedDiscard(campaignId, campaign);
     }
 
     // ------------------ PUBLIC CAMPAIGN FUNCTIONS ------------------
@@ -526,24 +541,7 @@ contract Marketplace is Ownable, ReentrancyGuard, Pausable {
             );
         }
 
-        campaign.campaignStatus = CampaignStatus.Discarded;
-
-        uint256 amountToReturn = campaign.poolAmount;
-        IERC20 token = IERC20(campaign.tokenAddress);
-
-        if (token.balanceOf(address(this)) < amountToReturn) {
-            revert ContractBalanceInsufficient(
-                amountToReturn,
-                token.balanceOf(address(this))
-            );
-        }
-
-        bool success = token.transfer(campaign.creatorAddress, amountToReturn);
-        if (!success) {
-            revert FundTransferError();
-        }
-
-        emit PublicCampaignDiscarded(campaignId, msg.sender);
+        executePublicDiscard(campaignId, campaign);
     }
 
     // ------------------ TARGETED CAMPAIGN GETTERS ------------------
@@ -648,4 +646,52 @@ contract Marketplace is Ownable, ReentrancyGuard, Pausable {
             revert InvalidERC20Implementation();
         }
     }
+
+    function executeTargetedDiscard(
+        bytes32 campaignId,
+        TargetedCampaign storage campaign
+    ) internal {
+        campaign.campaignStatus = CampaignStatus.Discarded;
+
+        uint256 amountToReturn = campaign.amountOffered;
+        IERC20 token = IERC20(campaign.tokenAddress);
+
+        if (token.balanceOf(address(this)) < amountToReturn) {
+            revert ContractBalanceInsufficient(
+                amountToReturn,
+                token.balanceOf(address(this))
+            );
+        }
+
+        bool success = token.transfer(campaign.creatorAddress, amountToReturn);
+        if (!success) {
+            revert FundTransferError();
+        }
+
+        emit TargetedCampaignDiscarded(campaignId, msg.sender);
+    }
+
+    function executePublicDiscard(
+        bytes32 campaignId,
+        PublicCampaign storage campaign
+    ) internal {
+        campaign.campaignStatus = CampaignStatus.Discarded;
+
+        uint256 amountToReturn = campaign.poolAmount;
+        IERC20 token = IERC20(campaign.tokenAddress);
+
+        if (token.balanceOf(address(this)) < amountToReturn) {
+            revert ContractBalanceInsufficient(
+                amountToReturn,
+                token.balanceOf(address(this))
+            );
+        }
+
+        bool success = token.transfer(campaign.creatorAddress, amountToReturn);
+        if (!success) {
+            revert FundTransferError();
+        }
+
+        emit PublicCampaignDiscarded(campaignId, msg.sender);
+    }
 }
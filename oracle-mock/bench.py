@@ -0,0 +1,280 @@
+"""Replays a seeded campaign workload through the oracle on a local Hardhat node.
+
+    npx hardhat compile && npx hardhat node
+    python bench.py --targeted 500 --public 500 --spread 3600 --output bench.json
+
+Deploys MockERC20 and Marketplace from the Hardhat artifacts with the
+node's first account as owner and seeds campaigns with deadlines spread
+over `--spread` seconds. Time then moves in `--step` second increments
+with evm_increaseTime, with one Oracle.sweep_once per step. The
+oracle compares deadlines with its own clock, so the Oracle gets a clock
+following the chain timestamp instead of the wall clock. Deadlines and amounts only
+depend on `--seed`, so runs of different oracle versions compare.
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from web3 import Web3
+from web3.middleware import Web3Middleware
+
+from credbuzz_oracle.campaigns import DISCARDED_EVENTS, PUBLIC, TARGETED
+from credbuzz_oracle.config import OracleConfig
+from credbuzz_oracle.logs import setup_logging
+from credbuzz_oracle.oracle import Oracle
+
+# Private key of the first Hardhat dev account, the Marketplace owner
+HARDHAT_OWNER_KEY = '0xac0974bec39a17e36ba4a6b4d238ff944bacb478cbed5efcae784d7bf4f2ff80'
+ARTIFACTS = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'artifacts', 'contracts')
+
+# RPCs sent by the sweep, its page prefetch threads included; the calls of a
+# batch count one each. The background threads below are left out.
+sweep_rpcs = 0
+sweep_rpcs_lock = threading.Lock()
+BACKGROUND_THREADS = ('receipt-tracker', 'backend-notifier', 'leader-election', 'log-stream')
+
+
+def count_sweep_rpcs(count: int):
+    global sweep_rpcs
+    if threading.current_thread().name.startswith(BACKGROUND_THREADS):
+        return
+    with sweep_rpcs_lock:
+        sweep_rpcs += count
+
+
+class SweepRpcCounter(Web3Middleware):
+    def wrap_make_request(self, make_request):
+        def middleware(method, params):
+            count_sweep_rpcs(1)
+            return make_request(method, params)
+
+        return middleware
+
+    def wrap_make_batch_request(self, make_batch_request):
+        def middleware(requests_info):
+            count_sweep_rpcs(len(requests_info))
+            return make_batch_request(requests_info)
+
+        return middleware
+
+
+class ChainClock:
+    """Oracle clock whose time() follows the chain."""
+
+    def __init__(self):
+        self.offset = 0
+
+    def follow(self, timestamp: int):
+        self.offset = timestamp - time.time()
+
+    def time(self) -> float:
+        return time.time() + self.offset
+
+
+class BackendHandler(BaseHTTPRequestHandler):
+    """Accepts every campaign update, the backend is not what is measured."""
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self.send_response(200)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+def load_artifact(path: str) -> dict:
+    with open(os.path.join(ARTIFACTS, path)) as f:
+        return json.load(f)
+
+
+def deploy(w3: Web3, artifact: dict, *args) -> str:
+    contract = w3.eth.contract(abi=artifact['abi'], bytecode=artifact['bytecode'])
+    tx_hash = contract.constructor(*args).transact({'from': w3.eth.accounts[0]})
+    return w3.eth.wait_for_transaction_receipt(tx_hash)['contractAddress']
+
+
+def seed(w3: Web3, marketplace, token, args) -> dict:
+    """Creates the campaigns and returns their deadline by (campaign_type, campaign_id)."""
+    rng = random.Random(args.seed)
+    accounts = w3.eth.accounts
+    creators, kol = accounts[1:1 + args.creators], accounts[1 + args.creators]
+    for creator in creators:
+        token.functions.mint(creator, 10 ** 30).transact({'from': accounts[0]})
+        token.functions.approve(marketplace.address, 2 ** 256 - 1).transact({'from': creator})
+
+    # every block moves the chain at least a second, keep the deadlines ahead of seeding
+    start = w3.eth.get_block('latest')['timestamp'] + args.targeted + args.public + 60
+    campaign_types = [TARGETED] * args.targeted + [PUBLIC] * args.public
+    rng.shuffle(campaign_types)
+
+    deadlines = {}
+    for campaign_type in campaign_types:
+        creator = rng.choice(creators)
+        amount = rng.randint(100, 10 ** 6)
+        deadline = start + rng.randint(0, args.spread)
+        if campaign_type == TARGETED:
+            tx_hash = marketplace.functions.createTargetedCampaign(kol, amount, deadline, token.address).transact(
+                {'from': creator})
+            event = marketplace.events.TargetedCampaignCreated()
+        else:
+            tx_hash = marketplace.functions.createPublicCampaign(deadline, amount, token.address).transact(
+                {'from': creator})
+            event = marketplace.events.PublicCampaignCreated()
+        receipt = w3.eth.wait_for_transaction_receipt(tx_hash)
+        campaign_id = bytes(event.process_receipt(receipt)[0]['args']['campaignId'])
+        deadlines[(campaign_type, campaign_id)] = deadline
+    return deadlines
+
+
+def summarize(values: list) -> dict:
+    if not values:
+        return {}
+    values = sorted(values)
+    return {
+        'mean': round(statistics.fmean(values), 3),
+        'p50': round(values[len(values) // 2], 3),
+        'p95': round(values[min(len(values) - 1, int(len(values) * 0.95))], 3),
+        'max': round(values[-1], 3),
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], text=True, stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return None
+
+
+def run(args) -> dict:
+    w3 = Web3(Web3.HTTPProvider(args.rpc_url))
+    token_artifact = load_artifact('mocks/MockERC20.sol/MockERC20.json')
+    marketplace_artifact = load_artifact('Marketplace.sol/Marketplace.json')
+    token = w3.eth.contract(address=deploy(w3, token_artifact, 'Mock Token', 'MTK'), abi=token_artifact['abi'])
+    marketplace = w3.eth.contract(address=deploy(w3, marketplace_artifact), abi=marketplace_artifact['abi'])
+
+    seed_started = time.perf_counter()
+    deadlines = seed(w3, marketplace, token, args)
+    seed_duration = time.perf_counter() - seed_started
+
+    backend = HTTPServer(('127.0.0.1', 0), BackendHandler)
+    threading.Thread(target=backend.serve_forever, daemon=True).start()
+
+    workdir = tempfile.mkdtemp(prefix='oracle-bench-')
+    setup_logging(args.log_level)
+    clock = ChainClock()
+    oracle = Oracle(OracleConfig(
+        rpc_urls=[args.rpc_url],
+        private_key=HARDHAT_OWNER_KEY,
+        marketplace_address=marketplace.address,
+        marketplace_abi_path=os.path.join(ARTIFACTS, 'Marketplace.sol/Marketplace.json'),
+        usdc_address=token.address,
+        usdc_abi_path=os.path.join(ARTIFACTS, 'mocks/MockERC20.sol/MockERC20.json'),
+        backend_url=f'http://127.0.0.1:{backend.server_port}',
+        checkpoint_path=os.path.join(workdir, 'checkpoint.sqlite3'),
+        receipt_poll_interval=args.receipt_poll_interval,
+    ), clock=clock.time)
+    oracle.w3.middleware_onion.add(SweepRpcCounter, 'bench_rpc_counter')
+    oracle.backend_notifier.start()
+    oracle.receipt_tracker.start()
+
+    global sweep_rpcs
+    sweep_latencies, rpcs_per_sweep, expiry_lags = [], [], []
+    discard_txs = set()
+    remaining = dict(deadlines)
+    from_block = w3.eth.block_number
+    end = max(deadlines.values()) + args.step
+
+    run_started = time.perf_counter()
+    bootstrap = None
+    while remaining and clock.time() <= end + args.grace:
+        clock.follow(w3.eth.get_block('latest')['timestamp'])
+        sweep_rpcs = 0
+        started = time.perf_counter()
+        oracle.sweep_once()
+        elapsed = (time.perf_counter() - started) * 1000
+        if bootstrap is None:
+            bootstrap = {'duration_ms': round(elapsed, 3), 'rpcs': sweep_rpcs}
+        else:
+            sweep_latencies.append(elapsed)
+            rpcs_per_sweep.append(sweep_rpcs)
+
+        # let the receipt poller settle this sweep's discards before moving time
+        settle_until = time.time() + args.settle_timeout
+        while oracle.pending_discards and time.time() < settle_until:
+            time.sleep(0.05)
+
+        to_block = w3.eth.block_number
+        for campaign_type in (TARGETED, PUBLIC):
+            event = marketplace.events[DISCARDED_EVENTS[campaign_type]]()
+            for log in event.get_logs(from_block=from_block, to_block=to_block):
+                key = (campaign_type, bytes(log['args']['campaignId']))
+                if key in remaining:
+                    expiry_lags.append(clock.time() - remaining.pop(key))
+                    discard_txs.add(bytes(log['transactionHash']))
+        from_block = to_block + 1
+
+        w3.provider.make_request('evm_increaseTime', [args.step])
+        w3.provider.make_request('evm_mine', [])
+    run_duration = time.perf_counter() - run_started
+
+    return {
+        'oracle_commit': git_commit(),
+        'config': {
+            'targeted': args.targeted, 'public': args.public, 'spread_s': args.spread,
+            'step_s': args.step, 'seed': args.seed, 'creators': args.creators,
+        },
+        'seed_duration_s': round(seed_duration, 3),
+        'bootstrap': bootstrap,
+        'sweeps': len(sweep_latencies),
+        'sweep_latency_ms': summarize(sweep_latencies),
+        'rpcs_per_sweep': summarize(rpcs_per_sweep),
+        'discarded': len(deadlines) - len(remaining),
+        'not_discarded': len(remaining),
+        'transactions': len(discard_txs),
+        'run_duration_s': round(run_duration, 3),
+        'transactions_per_second': round(len(discard_txs) / run_duration, 3),
+        'discards_per_second': round((len(deadlines) - len(remaining)) / run_duration, 3),
+        # chain seconds from a deadline to the sweep that saw its Discarded log, at most one step apart
+        'expiry_lag_s': summarize(expiry_lags),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--rpc-url', default='http://127.0.0.1:8545')
+    parser.add_argument('--targeted', type=int, default=200)
+    parser.add_argument('--public', type=int, default=200)
+    parser.add_argument('--spread', type=int, default=3600, help='seconds the deadlines are spread over')
+    parser.add_argument('--step', type=int, default=60, help='chain seconds between sweeps')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--creators', type=int, default=8)
+    parser.add_argument('--grace', type=int, default=600, help='chain seconds to keep sweeping after the last deadline')
+    parser.add_argument('--settle-timeout', type=float, default=30, help='seconds to wait for receipts after a sweep')
+    parser.add_argument('--receipt-poll-interval', type=float, default=0.2)
+    parser.add_argument('--log-level', default='WARNING')
+    parser.add_argument('--output', help='file to write the results to, stdout otherwise')
+    args = parser.parse_args()
+
+    results = json.dumps(run(args), indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(results + '\n')
+    else:
+        print(results)
+    # the oracle's background threads never exit
+    sys.stdout.flush()
+    os._exit(0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,20 @@
+"""Discards Marketplace campaigns once their offer ends.
+
+`Oracle` sweeps with blocking web3 calls and `AsyncOracle` on asyncio, both
+built from a `config.OracleConfig`. Importing the package only pulls the
+standard library; the other names are imported on first use.
+"""
+from .oracle import Oracle
+
+__all__ = ['AsyncOracle', 'Oracle', 'OracleConfig']
+
+
+def __getattr__(name: str):
+    # web3, aiohttp and pydantic are only imported by the code that needs them
+    if name == 'AsyncOracle':
+        from .async_oracle import AsyncOracle
+        return AsyncOracle
+    if name == 'OracleConfig':
+        from .config import OracleConfig
+        return OracleConfig
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
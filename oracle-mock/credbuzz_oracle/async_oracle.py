@@ -0,0 +1,328 @@
+import asyncio
+import logging
+import time
+from functools import cached_property
+
+import aiohttp
+from web3 import AsyncWeb3
+from web3.exceptions import TimeExhausted
+
+from .backend import AsyncBackendNotifier
+from .campaign_index import AsyncCampaignIndex
+from .campaigns import AsyncMarketplaceCampaigns
+from .discards import DISCARD_BASE_GAS, AsyncDiscardPreflight, refunds
+from .fee_oracle import AsyncFeeOracle
+from .metrics import SWEEP_DURATION
+from .multicall import AsyncMulticallReader
+from .nonce_manager import AsyncNonceManager
+from .oracle import Oracle
+from .outcomes import RETRY_NEW_NONCE, classify
+from .receipt_tracker import AsyncReceiptTracker
+from .rpc_pool import AsyncPooledHTTPProvider
+from .tokens import AsyncTokenMetadata
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncOracle(Oracle):
+    """Asyncio execution mode of the oracle, built from the same config.OracleConfig.
+
+    Reads, transaction submission, receipt waits and backend notifications
+    all run as concurrent tasks sharing one aiohttp session, with at most
+    `max_concurrency` RPC requests in flight. Backend notifications are
+    coalesced into bulk posts. A sweep only schedules discards; it never
+    waits on a receipt or on the backend. Retry scheduling, preflight
+    rejects and receipt handling are Oracle's, only the I/O is async.
+    """
+
+    def __init__(self, config, clock=time.time, config_loader=None):
+        super().__init__(config, clock=clock, config_loader=config_loader)
+        self.session = None
+        self._loop = None
+        self._semaphore = asyncio.Semaphore(config.max_concurrency)
+        self._wakeup = asyncio.Event()
+        self._tasks = set()
+
+    @cached_property
+    def w3(self):
+        # reads issued in the same loop tick are coalesced into JSON-RPC batches
+        return AsyncWeb3(AsyncPooledHTTPProvider(self.config.rpc_urls, write_mode=self.config.rpc_write_mode,
+                                                 max_batch_size=self.config.rpc_batch_size))
+
+    @cached_property
+    def multicall_reader(self):
+        return AsyncMulticallReader(self.w3, self.multicall_address, max_concurrency=self.config.max_concurrency)
+
+    @cached_property
+    def marketplace_campaigns(self):
+        return AsyncMarketplaceCampaigns(self.marketplace_contract, self.multicall_reader,
+                                         cache_size=self.config.campaign_cache_size)
+
+    @cached_property
+    def token_metadata(self):
+        return AsyncTokenMetadata(self.w3, self.multicall_reader, cache_size=self.config.token_cache_size)
+
+    @cached_property
+    def campaign_index(self):
+        return AsyncCampaignIndex(self.w3, self.marketplace_campaigns, checkpoint=self.checkpoint_store)
+
+    @cached_property
+    def nonce_manager(self):
+        return AsyncNonceManager(self.w3, self.owner.address, self.checkpoint_store)
+
+    @cached_property
+    def fee_oracle(self):
+        return AsyncFeeOracle(self.w3, max_fee_per_gas=self.config.max_fee_per_gas)
+
+    @cached_property
+    def discard_preflight(self):
+        return AsyncDiscardPreflight(self.w3, self.marketplace_contract, self.owner.address,
+                                     max_batch_size=self.config.preflight_batch_size)
+
+    @cached_property
+    def receipt_tracker(self):
+        return AsyncReceiptTracker(self.w3, poll_interval=self.config.receipt_poll_interval,
+                                   max_batch_blocks=self.config.receipt_batch_blocks)
+
+    @cached_property
+    def backend_notifier(self):
+        # posts through the oracle's aiohttp session once `run` opened it
+        return AsyncBackendNotifier(self.config.backend_url, session=self.session,
+                                    timeout=self.config.backend_timeout,
+                                    batch_window=self.config.backend_batch_window)
+
+    def run(self):
+        asyncio.run(self._run())
+
+    async def _run(self):
+        self._loop = asyncio.get_running_loop()
+        connector = aiohttp.TCPConnector(limit=self.config.max_concurrency)
+        async with aiohttp.ClientSession(connector=connector) as session:
+            self.session = session
+            await self.w3.provider.cache_async_session(session)
+            self.chain_id = await self.w3.eth.chain_id
+            self.batch_discard = self.check_batch_discard(await self.w3.eth.get_code(self.marketplace_contract.address))
+            self.start()
+
+            while True:
+                self.reload()
+                try:
+                    with SWEEP_DURATION.time():
+                        await self.sweep_once()
+                except Exception as e:
+                    logger.exception('Error processing campaigns: %s', e)
+
+                await self.wait_for_work()
+
+    async def wait_for_work(self):
+        """Sleeps until the next deadline or streamed logs, but pulls new logs at
+        least every sleep_time. A standby leaves due deadlines to the leader and
+        is woken by its election."""
+        delay = self.config.sleep_time
+        next_deadline = self.deadline_scheduler.next_deadline()
+        if next_deadline is not None and self.is_leader():
+            delay = min(delay, next_deadline - self.clock())
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), max(delay, 0))
+        except asyncio.TimeoutError:
+            pass
+        self._wakeup.clear()
+
+    def start(self):
+        """Starts the receipt and backend tasks and the election, and resumes the discards in flight."""
+        self._spawn(self.receipt_tracker.run())
+        self.backend_notifier.session = self.session
+        self._spawn(self.backend_notifier.run())
+        if self.leader_elector is not None:
+            self.leader_elector.start()
+        self.resume_pending_discards()
+
+    def resume_pending_discards(self):
+        for nonce, tx_hashes, keys in self.nonce_manager.restore():
+            if keys:
+                for key in keys:
+                    self.pending_discards[key] = nonce
+                campaign_ids = [campaign_id for _, campaign_id in keys]
+                self._spawn(self.finish_discard(keys[0][0], campaign_ids, nonce, tx_hashes))
+
+    def request_reload(self):
+        self._reload_requested = True
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    def reconfigure(self, config) -> dict:
+        """Also takes the live RPC batch size and concurrency; the multicall
+        reader and the aiohttp connector keep the concurrency they started with."""
+        live = super().reconfigure(config)
+        if 'rpc_batch_size' in live and 'w3' in self.__dict__:
+            self.w3.provider.max_batch_size = self.config.rpc_batch_size
+        if 'max_concurrency' in live:
+            # holders of the old semaphore release it as they finish
+            self._semaphore = asyncio.Semaphore(self.config.max_concurrency)
+        self._wakeup.set()
+        return live
+
+    async def sweep_once(self):
+        started = time.perf_counter()
+        if self.campaign_index.last_block is None:
+            changed = self.campaign_index.restore()
+            if self.campaign_index.last_block is None:
+                changed = await self.campaign_index.bootstrap()
+            else:
+                changed |= await self.campaign_index.sync()
+            if self.log_stream is not None:
+                self._spawn(self.log_stream.run())
+        else:
+            poll_logs = self.log_stream is None or not self.log_stream.connected
+            changed = await self.campaign_index.sync(poll_logs=poll_logs)
+
+        self.reschedule(changed)
+        if not self.is_leader():
+            # due campaigns stay scheduled for when this replica takes over
+            logger.info('Standing by', extra={'sample': 'standby', 'tracked': len(self.campaign_index.campaigns)})
+            return
+
+        due = self.deadline_scheduler.pop_due(self.clock())
+        expired = self.expired_campaigns(due)
+        for campaign_type, campaign_ids in expired.items():
+            for campaign_id in campaign_ids:
+                # in flight from now on, the next sweep leaves it to this one
+                self.pending_discards[(campaign_type, campaign_id)] = None
+            for chunk in self.discard_batches(campaign_ids):
+                self._spawn(self.discard_expired(campaign_type, chunk))
+
+        self.log_sweep(started, changed, due, expired)
+
+    def on_elected(self):
+        # called on the elector thread
+        self._loop.call_soon_threadsafe(self._on_elected)
+
+    def _on_elected(self):
+        # the previous leader may have used nonces our counter doesn't know about
+        self.nonce_manager.reset()
+        self._wakeup.set()
+
+    def _spawn(self, coro):
+        # keep a reference so running tasks are not garbage collected
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def on_streamed_logs(self, logs: list):
+        self.campaign_index.ingest(logs)
+        self._wakeup.set()
+
+    def on_stream_connect(self):
+        # cover the blocks we may have missed while disconnected
+        self.campaign_index.request_backfill()
+        self._wakeup.set()
+
+    async def discard_expired(self, campaign_type: str, campaign_ids: list):
+        try:
+            campaign_ids = await self.preflight_discards(campaign_type, campaign_ids)
+            if not campaign_ids:
+                return
+            nonce, tx_hash = await self.send_discard(campaign_type, campaign_ids)
+        except Exception as e:
+            self.discard_failed(campaign_type, campaign_ids, e)
+            return
+
+        logger.info('Sent discard of %d %s campaigns as offer time ended', len(campaign_ids), campaign_type)
+        await self.finish_discard(campaign_type, campaign_ids, nonce, [tx_hash])
+
+    async def preflight_discards(self, campaign_type: str, campaign_ids: list) -> list:
+        campaign_ids, rejected = await self.discard_preflight.check(campaign_type, campaign_ids)
+        self.skip_rejected(campaign_type, rejected)
+        return campaign_ids
+
+    async def finish_discard(self, campaign_type: str, campaign_ids: list, nonce: int, tx_hashes: list):
+        keys = [(campaign_type, campaign_id) for campaign_id in campaign_ids]
+        try:
+            receipt = await self.wait_for_discard(campaign_type, campaign_ids, nonce, tx_hashes)
+            if receipt is None:
+                self.discard_dropped(campaign_type, campaign_ids)
+                return
+
+            discarded = self.settle_discard(campaign_type, campaign_ids, nonce, receipt)
+            if discarded is not None:
+                campaign_ids, campaigns = discarded
+                self.report_discarded(campaign_type, campaign_ids,
+                                      await self.refunded_amounts(campaign_type, campaigns))
+
+        except Exception as e:
+            self.discard_failed(campaign_type, [campaign_id for _, campaign_id in keys], e)
+        finally:
+            for key in keys:
+                self.pending_discards.pop(key, None)
+
+    async def refunded_amounts(self, campaign_type: str, campaigns: list) -> dict:
+        try:
+            return await self.token_metadata.totals(refunds(campaign_type, [c for c in campaigns if c is not None]))
+        except Exception as e:
+            logger.warning('Error reading token metadata: %s', e)
+            return {}
+
+    async def send_discard(self, campaign_type: str, campaign_ids: list) -> tuple:
+        if not self.is_leader():
+            raise Exception("Not sending, another replica holds the leader lease")
+        keys = [(campaign_type, campaign_id) for campaign_id in campaign_ids]
+        owner = self.owner.address
+        async with self._semaphore:
+            nonce = await self.nonce_manager.allocate()
+            try:
+                discard_call = self.discard_call(campaign_type, campaign_ids)
+                gas = await self.fee_oracle.gas(discard_call, campaign_type, len(campaign_ids), owner, DISCARD_BASE_GAS)
+                discard_txn = await discard_call.build_transaction({
+                    'from': owner, 'nonce': nonce, 'chainId': self.chain_id, 'gas': gas,
+                    **await self.fee_oracle.fees()
+                })
+                tx_hash = await self.sign_and_send_txn(discard_txn)
+            except Exception as e:
+                self.nonce_manager.release(nonce)
+                if classify(e) == RETRY_NEW_NONCE:
+                    await self.nonce_manager.resync()
+                raise
+
+        self.nonce_manager.sent(nonce, tx_hash, keys)
+        for key in keys:
+            self.pending_discards[key] = nonce
+        return nonce, tx_hash
+
+    async def sign_and_send_txn(self, txn: dict):
+        signed_txn = self.owner.sign_transaction(txn)
+        return await self.w3.eth.send_raw_transaction(signed_txn.raw_transaction)
+
+    async def wait_for_discard(self, campaign_type: str, campaign_ids: list, nonce: int, tx_hashes: list):
+        """Returns the receipt of the discard sent with `nonce` as one of `tx_hashes`,
+        replacing it with higher fees while it is stuck, or None if the node dropped it."""
+        tx_hashes = list(tx_hashes)
+        while True:
+            try:
+                # resolves with whichever of the hashes gets mined
+                return await self.receipt_tracker.track(tx_hashes, self.config.receipt_timeout)
+            except TimeExhausted:
+                logger.warning('No receipt yet for discard of %d %s campaigns', len(campaign_ids), campaign_type)
+
+            if tx_hashes[-1] in await self.nonce_manager.resync():
+                return None
+            if not self.is_leader():
+                # the new leader owns the account now, just wait for the receipt
+                continue
+            try:
+                tx_hashes.append(await self.replace_discard(campaign_type, campaign_ids, nonce, tx_hashes[-1]))
+            except Exception as e:
+                if self.replacement_failed(tx_hashes[-1], e) and tx_hashes[-1] in await self.nonce_manager.resync():
+                    return None
+
+    async def replace_discard(self, campaign_type: str, campaign_ids: list, nonce: int, tx_hash):
+        async with self._semaphore:
+            stuck_txn = await self.w3.eth.get_transaction(tx_hash)
+            discard_txn = await self.discard_call(campaign_type, campaign_ids).build_transaction({
+                'from': self.owner.address, 'nonce': nonce, 'chainId': self.chain_id,
+                'gas': stuck_txn['gas'], **await self.fee_oracle.bump(stuck_txn)
+            })
+            new_hash = await self.sign_and_send_txn(discard_txn)
+
+        self.nonce_manager.sent(nonce, new_hash, [(campaign_type, campaign_id) for campaign_id in campaign_ids])
+        logger.warning('Replaced stuck discard %s with %s', AsyncWeb3.to_hex(tx_hash), AsyncWeb3.to_hex(new_hash))
+        return new_hash
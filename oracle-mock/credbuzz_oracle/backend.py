@@ -0,0 +1,248 @@
+import asyncio
+import logging
+import threading
+import time
+
+import aiohttp
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from .metrics import BACKEND_FAILURES
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = (500, 502, 503, 504)
+# Responses meaning the backend has no bulk endpoint
+BATCH_UNSUPPORTED_STATUSES = (404, 405, 501)
+
+
+class BatchUnsupported(Exception):
+    pass
+
+
+def update_body(campaign_id: str, status: str) -> dict:
+    return {
+        "campaign_id": campaign_id,
+        "status": status
+    }
+
+
+def updates_body(updates: dict) -> dict:
+    return {
+        "updates": [update_body(campaign_id, status) for campaign_id, status in updates.items()]
+    }
+
+
+def take_batch(pending: dict, max_batch_size: int) -> dict:
+    """Pops up to `max_batch_size` of the oldest `pending` updates."""
+    return {campaign_id: pending.pop(campaign_id) for campaign_id in list(pending)[:max_batch_size]}
+
+
+class BackendNotifier:
+    """Sends campaign status updates to the backend off the sweep.
+
+    Updates wait in a bounded pending map keyed by campaign id, so repeated
+    updates for one campaign collapse into the latest one. Worker threads
+    collect what arrives within `batch_window` seconds and post it as one
+    `/update-campaigns` payload, falling back to one `/update-campaign` post
+    per update if the backend has no bulk endpoint. All posts share one
+    keep-alive session; connection errors and 5xx responses are retried
+    with exponential backoff.
+    """
+
+    def __init__(self, base_url: str, workers: int = 2, queue_size: int = 1000,
+                 connect_timeout: float = 3.05, read_timeout: float = 10,
+                 max_retries: int = 5, backoff_factor: float = 0.5,
+                 batch_window: float = 0.5, max_batch_size: int = 500):
+        self.base_url = base_url
+        self.timeout = (connect_timeout, read_timeout)
+        self.workers = workers
+        self.queue_size = queue_size
+        self.batch_window = batch_window
+        self.max_batch_size = max_batch_size
+        self.batch_supported = True
+
+        retry = Retry(
+            total=max_retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=frozenset({'POST'}),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers.update({"Content-Type": "application/json"})
+
+        self._pending = {}
+        self._in_flight = 0
+        self._condition = threading.Condition()
+        self._threads = []
+
+    def start(self):
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f'backend-notifier-{i}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def notify(self, campaign_id: str, status: str) -> bool:
+        """Queues an update, returns False if the queue is full."""
+        with self._condition:
+            if campaign_id not in self._pending and len(self._pending) >= self.queue_size:
+                return False
+            self._pending[campaign_id] = status
+            self._condition.notify_all()
+            return True
+
+    def post_update(self, campaign_id: str, status: str):
+        body = update_body(campaign_id, status)
+        response = self.session.post(f"{self.base_url}/update-campaign", json=body, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def post_updates(self, updates: dict):
+        body = updates_body(updates)
+        response = self.session.post(f"{self.base_url}/update-campaigns", json=body, timeout=self.timeout)
+        if response.status_code in BATCH_UNSUPPORTED_STATUSES:
+            raise BatchUnsupported(f"Bulk update returned {response.status_code}")
+        response.raise_for_status()
+        return response.json()
+
+    def flush(self):
+        """Blocks until every queued update was sent or given up on."""
+        with self._condition:
+            while self._pending or self._in_flight:
+                self._condition.wait()
+
+    def _work(self):
+        while True:
+            with self._condition:
+                while not self._pending:
+                    self._condition.wait()
+
+            # give the burst a moment to accumulate into one batch
+            time.sleep(self.batch_window)
+
+            with self._condition:
+                batch = take_batch(self._pending, self.max_batch_size)
+                self._in_flight += 1
+            try:
+                if batch:
+                    self._send(batch)
+            finally:
+                with self._condition:
+                    self._in_flight -= 1
+                    self._condition.notify_all()
+
+    def _send(self, batch: dict):
+        if self.batch_supported and len(batch) > 1:
+            try:
+                self.post_updates(batch)
+                return
+            except BatchUnsupported as e:
+                logger.warning('Backend has no bulk update endpoint, posting one by one: %s', e)
+                self.batch_supported = False
+            except Exception as e:
+                logger.error('Error updating %d campaigns: %s', len(batch), e)
+                BACKEND_FAILURES.inc(len(batch))
+                return
+
+        for campaign_id, status in batch.items():
+            try:
+                self.post_update(campaign_id, status)
+            except Exception as e:
+                logger.error('Error updating campaign %s to %s: %s', campaign_id, status, e)
+                BACKEND_FAILURES.inc()
+
+
+class AsyncBackendNotifier:
+    """BackendNotifier for asyncio, posting through the oracle's aiohttp session.
+
+    Updates collapse per campaign id the same way and are posted by one
+    `run` task as `/update-campaigns` batches, one `/update-campaign` post
+    per update if the backend has no bulk endpoint. Connection errors,
+    timeouts and 5xx responses are retried with exponential backoff. The
+    `session` is set by the caller before `run` starts.
+    """
+
+    def __init__(self, base_url: str, session=None, queue_size: int = 1000, timeout: float = 10,
+                 max_retries: int = 5, backoff_factor: float = 0.5,
+                 batch_window: float = 0.5, max_batch_size: int = 500):
+        self.base_url = base_url
+        self.session = session
+        self.queue_size = queue_size
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.batch_window = batch_window
+        self.max_batch_size = max_batch_size
+        self.batch_supported = True
+
+        self._pending = {}
+        self._ready = asyncio.Event()
+
+    def notify(self, campaign_id: str, status: str) -> bool:
+        """Queues an update, returns False if the queue is full."""
+        if campaign_id not in self._pending and len(self._pending) >= self.queue_size:
+            return False
+        self._pending[campaign_id] = status
+        self._ready.set()
+        return True
+
+    async def run(self):
+        while True:
+            await self._ready.wait()
+            # give the burst a moment to accumulate into one batch
+            await asyncio.sleep(self.batch_window)
+            batch = take_batch(self._pending, self.max_batch_size)
+            if not self._pending:
+                self._ready.clear()
+            if batch:
+                await self._send(batch)
+
+    async def post_update(self, campaign_id: str, status: str):
+        return await self._post('/update-campaign', update_body(campaign_id, status))
+
+    async def post_updates(self, updates: dict):
+        return await self._post('/update-campaigns', updates_body(updates), batch=True)
+
+    async def _post(self, path: str, body: dict, batch: bool = False):
+        delay = self.backoff_factor
+        for attempt in range(self.max_retries + 1):
+            try:
+                async with self.session.post(f"{self.base_url}{path}", json=body, timeout=self.timeout) as response:
+                    if batch and response.status in BATCH_UNSUPPORTED_STATUSES:
+                        raise BatchUnsupported(f"Bulk update returned {response.status}")
+                    if response.status not in RETRY_STATUSES:
+                        response.raise_for_status()
+                        return await response.json()
+                    error = Exception(f"status {response.status}")
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                error = e
+            if attempt < self.max_retries:
+                await asyncio.sleep(delay)
+                delay *= 2
+        raise error
+
+    async def _send(self, batch: dict):
+        if self.batch_supported and len(batch) > 1:
+            try:
+                await self.post_updates(batch)
+                return
+            except BatchUnsupported as e:
+                logger.warning('Backend has no bulk update endpoint, posting one by one: %s', e)
+                self.batch_supported = False
+            except Exception as e:
+                logger.error('Error updating %d campaigns: %s', len(batch), str(e) or type(e).__name__)
+                BACKEND_FAILURES.inc(len(batch))
+                return
+
+        for campaign_id, status in batch.items():
+            try:
+                await self.post_update(campaign_id, status)
+            except Exception as e:
+                logger.error('Error updating campaign %s to %s: %s', campaign_id, status,
+                             str(e) or type(e).__name__)
+                BACKEND_FAILURES.inc()
@@ -0,0 +1,55 @@
+import threading
+from collections import OrderedDict
+
+from .metrics import CACHE_HITS, CACHE_MISSES
+
+
+class LRUCache:
+    """Bounded thread-safe LRU map counting hits and misses under `name`.
+
+    Entries never expire on their own; callers invalidate them when the
+    chain tells them the value changed.
+    """
+
+    def __init__(self, name: str, maxsize: int):
+        self.name = name
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._entries:
+                CACHE_MISSES.labels(self.name).inc()
+                return default
+            self._entries.move_to_end(key)
+            value = self._entries[key]
+        CACHE_HITS.labels(self.name).inc()
+        return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def update(self, key, fn):
+        """Replaces a cached value with `fn(value)`, no-op if it isn't cached."""
+        with self._lock:
+            if key in self._entries:
+                self._entries[key] = fn(self._entries[key])
+
+    def resize(self, maxsize: int):
+        """Changes the bound, dropping the least recently used entries over it."""
+        with self._lock:
+            self.maxsize = maxsize
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            return self._entries.pop(key, None)
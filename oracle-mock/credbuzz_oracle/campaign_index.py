@@ -0,0 +1,319 @@
+import asyncio
+import threading
+
+from web3 import Web3
+
+from .campaigns import CAMPAIGN_TYPES, EVENT_NAMES, FINAL_EVENTS, INFO_FNS, CampaignStatus, decode_campaign
+from .multicall import abi_output_types
+
+class CampaignIndex:
+    """Local view of the ongoing campaigns, kept current from contract logs.
+
+    The index is bootstrapped once through the paginated getters. After that
+    `sync` only pulls the Marketplace logs emitted since the last synced
+    block and re-reads the campaigns they mention through the marketplace
+    cache: Created/Updated logs invalidate the cached record, while
+    Fulfilled/Completed/Discarded logs only set its status. Finalized
+    campaigns are dropped, so memory follows the number of ongoing campaigns.
+
+    Logs can also be pushed from a subscription with `ingest`, in which case
+    `sync` only polls for logs after `request_backfill`.
+
+    With a `checkpoint` store every sync is persisted, and `restore` resumes
+    from the last checkpointed block instead of a full bootstrap.
+
+    An `owns(key)` predicate restricts the index to one shard of the
+    campaigns; the others are neither read nor kept.
+    """
+
+    def __init__(self, w3: Web3, marketplace, max_log_range: int = 2000, checkpoint=None, owns=None):
+        self.w3 = w3
+        self.marketplace = marketplace
+        self.contract = marketplace.contract
+        self.checkpoint = checkpoint
+        self.owns = owns
+        self.max_log_range = max_log_range
+        self.campaigns = {}
+        self.last_block = None
+
+        # campaign key -> status set by its logs, None when it must be re-read
+        self._dirty = {}
+        self._backfill = False
+        self._streamed_block = None
+        self._lock = threading.Lock()
+
+        self._info_types = {
+            campaign_type: abi_output_types(self.contract.get_function_by_name(INFO_FNS[campaign_type]).abi)
+            for campaign_type in CAMPAIGN_TYPES
+        }
+        self._topic_types = {}
+        self._final_statuses = {}
+        for campaign_type, event_names in EVENT_NAMES.items():
+            for event_name in event_names:
+                topic = self.contract.events[event_name].topic
+                self._topic_types[topic] = campaign_type
+                if event_name in FINAL_EVENTS:
+                    self._final_statuses[topic] = FINAL_EVENTS[event_name]
+
+    @property
+    def topics(self) -> list:
+        return list(self._topic_types)
+
+    def get(self, key: tuple):
+        return self.campaigns.get(key)
+
+    def remove(self, key: tuple):
+        self.campaigns.pop(key, None)
+        if self.checkpoint is not None:
+            self.checkpoint.delete_campaign(key)
+
+    def restore(self) -> set:
+        """Loads the checkpointed campaigns and returns their keys. Leaves
+        `last_block` unset when there is no checkpoint to resume from."""
+        if self.checkpoint is None:
+            return set()
+
+        last_block, encoded_infos = self.checkpoint.load_campaigns()
+        if last_block is None:
+            return set()
+
+        self.campaigns = {
+            key: decode_campaign(key[0], self.w3.codec.decode(self._info_types[key[0]], encoded_info)[0])
+            for key, encoded_info in encoded_infos.items()
+        }
+        for (campaign_type, _), campaign in self.campaigns.items():
+            self.marketplace.remember(campaign_type, campaign)
+        self.last_block = last_block
+        return set(self.campaigns)
+
+    def bootstrap(self) -> set:
+        """Loads every campaign from the paginated getters and returns their keys.
+        `last_block` stays unset until every campaign was read, so a failed
+        bootstrap is retried rather than synced or checkpointed."""
+        self.campaigns = {}
+        self.last_block = None
+        block = self.w3.eth.block_number
+
+        keys = set()
+        for campaign_type in CAMPAIGN_TYPES:
+            campaign_ids = self.marketplace.list_campaign_ids(campaign_type, block)
+            keys.update(key for key in ((campaign_type, campaign_id) for campaign_id in campaign_ids)
+                        if self._owned(key))
+        self._refresh(dict.fromkeys(keys))
+        self.last_block = block
+        self._save(keys)
+        return keys
+
+    def sync(self, poll_logs: bool = True) -> set:
+        """Applies the logs emitted since the last sync and returns the keys
+        of the campaigns they touched. With `poll_logs=False` only streamed
+        logs are applied, unless a backfill was requested."""
+        backfill, self._backfill = self._backfill, False
+        if poll_logs or backfill:
+            try:
+                latest_block = self.w3.eth.block_number
+                if latest_block > self.last_block:
+                    self._add_logs(self._get_logs(self.last_block + 1, latest_block), latest_block)
+            except Exception:
+                self._backfill = self._backfill or backfill
+                raise
+
+        events = self._take_dirty()
+        try:
+            self._refresh(events)
+        except Exception:
+            self._requeue(events)
+            raise
+        self._save(set(events))
+        return set(events)
+
+    def ingest(self, logs: list):
+        """Queues the campaigns touched by streamed logs for the next `sync`."""
+        with self._lock:
+            self._merge(self._events_from_logs(logs))
+            for log in logs:
+                self._streamed_block = max(self._streamed_block or 0, log['blockNumber'])
+
+    def request_backfill(self):
+        """Makes the next `sync` poll for logs, e.g. after a stream reconnect."""
+        with self._lock:
+            if self.last_block is not None and self._streamed_block is not None:
+                # every streamed block was delivered, re-read the last one to be safe
+                self.last_block = max(self.last_block, self._streamed_block - 1)
+            self._backfill = True
+
+    def _add_logs(self, logs: list, latest_block: int):
+        with self._lock:
+            self._merge(self._events_from_logs(logs))
+            self.last_block = max(self.last_block, latest_block)
+
+    def _save(self, keys: set):
+        if self.checkpoint is None:
+            return
+
+        upserts, deletes = [], []
+        for key in keys:
+            campaign = self.campaigns.get(key)
+            if campaign is None:
+                deletes.append(key)
+                continue
+            upserts.append((
+                key,
+                campaign.campaign_status,
+                campaign.offer_ends_in,
+                campaign.token_address,
+                self.w3.codec.encode(self._info_types[key[0]], [tuple(campaign)]),
+            ))
+        self.checkpoint.save_campaigns(self.last_block, upserts, deletes)
+
+    def _owned(self, key: tuple) -> bool:
+        return self.owns is None or self.owns(key)
+
+    def _take_dirty(self) -> dict:
+        with self._lock:
+            events, self._dirty = self._dirty, {}
+            return events
+
+    def _requeue(self, events: dict):
+        with self._lock:
+            self._merge(events)
+
+    def _merge(self, events: dict):
+        for key, status in events.items():
+            # a final status only stands alone, anything else about the campaign needs a re-read
+            self._dirty[key] = status if self._dirty.get(key, status) == status else None
+
+    def _events_from_logs(self, logs: list) -> dict:
+        events = {}
+        for log in logs:
+            topic = Web3.to_hex(log['topics'][0])
+            campaign_type = self._topic_types.get(topic)
+            if campaign_type is None:
+                continue
+            key = (campaign_type, bytes(log['topics'][1]))
+            if not self._owned(key):
+                continue
+            # a log removed by a reorg says nothing about the current status
+            status = None if log.get('removed') else self._final_statuses.get(topic)
+            events[key] = status if events.get(key, status) == status else None
+        return events
+
+    def _invalidate(self, events: dict):
+        for (campaign_type, campaign_id), status in events.items():
+            if status is None:
+                self.marketplace.invalidate(campaign_type, campaign_id)
+            else:
+                self.marketplace.finalize(campaign_type, campaign_id, status)
+
+    def _refresh(self, events: dict):
+        self._invalidate(events)
+        for campaign_type in CAMPAIGN_TYPES:
+            campaign_ids = [campaign_id for key_type, campaign_id in events if key_type == campaign_type]
+            self._apply(campaign_type, campaign_ids, self.marketplace.get_campaigns(campaign_type, campaign_ids))
+
+    def _apply(self, campaign_type: str, campaign_ids: list, campaigns: list):
+        for campaign_id, campaign in zip(campaign_ids, campaigns):
+            key = (campaign_type, campaign_id)
+            if campaign is not None and campaign.campaign_status == CampaignStatus.ONGOING:
+                self.campaigns[key] = campaign
+            else:
+                self.campaigns.pop(key, None)
+
+    def _get_logs(self, from_block: int, to_block: int) -> list:
+        logs = []
+        for start in range(from_block, to_block + 1, self.max_log_range):
+            logs.extend(self._get_logs_range(start, min(start + self.max_log_range - 1, to_block)))
+        return logs
+
+    def _get_logs_range(self, from_block: int, to_block: int) -> list:
+        try:
+            return self.w3.eth.get_logs({
+                'address': self.contract.address,
+                'fromBlock': from_block,
+                'toBlock': to_block,
+                'topics': [list(self._topic_types)],
+            })
+        except Exception:
+            # Providers cap the number of logs per query: halve the range and retry
+            if from_block == to_block:
+                raise
+            middle = (from_block + to_block) // 2
+            return self._get_logs_range(from_block, middle) + self._get_logs_range(middle + 1, to_block)
+
+
+class AsyncCampaignIndex(CampaignIndex):
+    """CampaignIndex for AsyncWeb3. Pages, info batches and log ranges are
+    fetched concurrently; `marketplace` must be an AsyncMarketplaceCampaigns."""
+
+    async def bootstrap(self) -> set:
+        self.campaigns = {}
+        self.last_block = None
+        block = await self.w3.eth.block_number
+
+        id_lists = await asyncio.gather(*(
+            self.marketplace.list_campaign_ids(campaign_type, block) for campaign_type in CAMPAIGN_TYPES
+        ))
+        keys = {
+            (campaign_type, campaign_id)
+            for campaign_type, campaign_ids in zip(CAMPAIGN_TYPES, id_lists)
+            for campaign_id in campaign_ids
+            if self._owned((campaign_type, campaign_id))
+        }
+        await self._refresh(dict.fromkeys(keys))
+        self.last_block = block
+        self._save(keys)
+        return keys
+
+    async def sync(self, poll_logs: bool = True) -> set:
+        backfill, self._backfill = self._backfill, False
+        if poll_logs or backfill:
+            try:
+                latest_block = await self.w3.eth.block_number
+                if latest_block > self.last_block:
+                    self._add_logs(await self._get_logs(self.last_block + 1, latest_block), latest_block)
+            except Exception:
+                self._backfill = self._backfill or backfill
+                raise
+
+        events = self._take_dirty()
+        try:
+            await self._refresh(events)
+        except Exception:
+            self._requeue(events)
+            raise
+        self._save(set(events))
+        return set(events)
+
+    async def _refresh(self, events: dict):
+        self._invalidate(events)
+        campaign_ids = {
+            campaign_type: [campaign_id for key_type, campaign_id in events if key_type == campaign_type]
+            for campaign_type in CAMPAIGN_TYPES
+        }
+        campaign_lists = await asyncio.gather(*(
+            self.marketplace.get_campaigns(campaign_type, campaign_ids[campaign_type])
+            for campaign_type in CAMPAIGN_TYPES
+        ))
+        for campaign_type, campaigns in zip(CAMPAIGN_TYPES, campaign_lists):
+            self._apply(campaign_type, campaign_ids[campaign_type], campaigns)
+
+    async def _get_logs(self, from_block: int, to_block: int) -> list:
+        log_lists = await asyncio.gather(*(
+            self._get_logs_range(start, min(start + self.max_log_range - 1, to_block))
+            for start in range(from_block, to_block + 1, self.max_log_range)
+        ))
+        return [log for logs in log_lists for log in logs]
+
+    async def _get_logs_range(self, from_block: int, to_block: int) -> list:
+        try:
+            return await self.w3.eth.get_logs({
+                'address': self.contract.address,
+                'fromBlock': from_block,
+                'toBlock': to_block,
+                'topics': [list(self._topic_types)],
+            })
+        except Exception:
+            if from_block == to_block:
+                raise
+            middle = (from_block + to_block) // 2
+            return await self._get_logs_range(from_block, middle) + await self._get_logs_range(middle + 1, to_block)
@@ -0,0 +1,201 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from enum import IntEnum
+from typing import NamedTuple
+
+from web3 import Web3
+
+from .cache import LRUCache
+
+TARGETED = 'targeted'
+PUBLIC = 'public'
+CAMPAIGN_TYPES = (TARGETED, PUBLIC)
+
+PAGINATED_FNS = {
+    TARGETED: 'getTargetedCampaignsPaginated',
+    PUBLIC: 'getPublicCampaignsPaginated',
+}
+INFO_FNS = {
+    TARGETED: 'getTargetedCampaignInfo',
+    PUBLIC: 'getPublicCampaignInfo',
+}
+DISCARD_FNS = {
+    TARGETED: 'discardTargetedCampaign',
+    PUBLIC: 'discardPublicCampaign',
+}
+BATCH_DISCARD_FNS = {
+    TARGETED: 'batchDiscardTargetedCampaigns',
+    PUBLIC: 'batchDiscardPublicCampaigns',
+}
+DISCARDED_EVENTS = {
+    TARGETED: 'TargetedCampaignDiscarded',
+    PUBLIC: 'PublicCampaignDiscarded',
+}
+EVENT_NAMES = {
+    TARGETED: ('TargetedCampaignCreated', 'TargetedCampaignUpdated',
+               'TargetedCampaignFulfilled', 'TargetedCampaignDiscarded'),
+    PUBLIC: ('PublicCampaignCreated', 'PublicCampaignUpdated',
+             'PublicCampaignCompleted', 'PublicCampaignDiscarded'),
+}
+
+
+class CampaignStatus(IntEnum):
+    ONGOING = 0
+    COMPLETED = 1
+    DISCARDED = 2
+
+
+# Events that finalize a campaign, the status they set needs no re-read
+FINAL_EVENTS = {
+    'TargetedCampaignFulfilled': CampaignStatus.COMPLETED,
+    'TargetedCampaignDiscarded': CampaignStatus.DISCARDED,
+    'PublicCampaignCompleted': CampaignStatus.COMPLETED,
+    'PublicCampaignDiscarded': CampaignStatus.DISCARDED,
+}
+
+
+class TargetedCampaign(NamedTuple):
+    id: bytes
+    creator_address: str
+    selected_kol: str
+    offer_ends_in: int
+    amount_offered: int
+    token_address: str
+    campaign_status: CampaignStatus
+
+
+class PublicCampaign(NamedTuple):
+    id: bytes
+    creator_address: str
+    offer_ends_in: int
+    pool_amount: int
+    token_address: str
+    campaign_status: CampaignStatus
+
+
+RECORD_TYPES = {
+    TARGETED: TargetedCampaign,
+    PUBLIC: PublicCampaign,
+}
+ADDRESS_FIELDS = {
+    TARGETED: ('creator_address', 'selected_kol', 'token_address'),
+    PUBLIC: ('creator_address', 'token_address'),
+}
+# Escrowed amount, refunded to the creator on discard
+AMOUNT_FIELDS = {
+    TARGETED: 'amount_offered',
+    PUBLIC: 'pool_amount',
+}
+
+
+def decode_campaign(campaign_type: str, raw: tuple):
+    """Turns a decoded TargetedCampaign / PublicCampaign struct into its record."""
+    record = RECORD_TYPES[campaign_type](*raw)
+    return record._replace(
+        id=bytes(record.id),
+        campaign_status=CampaignStatus(record.campaign_status),
+        **{field: Web3.to_checksum_address(getattr(record, field)) for field in ADDRESS_FIELDS[campaign_type]},
+    )
+
+
+class MarketplaceCampaigns:
+    """Typed access to the bytes32 campaign getters of the Marketplace.
+
+    Ids are paged through get*CampaignsPaginated. Once the first page gives
+    the total, the remaining pages are fetched in parallel ahead of the
+    consumer. Infos are read through the multicall reader and returned as
+    TargetedCampaign / PublicCampaign records.
+
+    Records are kept in a bounded LRU cache. Ids, creators and tokens never
+    change, so a cached record stays valid until an event says otherwise:
+    `invalidate` drops it when a Created/Updated event may have changed the
+    deadline or amount, and `finalize` sets the status a Fulfilled/Completed
+    /Discarded event carries without reading the campaign again.
+    """
+
+    def __init__(self, contract, reader, page_size: int = 500, prefetch: int = 4, cache_size: int = 10000):
+        self.contract = contract
+        self.reader = reader
+        self.page_size = page_size
+        self.prefetch = prefetch
+        self.cache = LRUCache('campaigns', cache_size)
+
+    def remember(self, campaign_type: str, campaign):
+        self.cache.put((campaign_type, campaign.id), campaign)
+
+    def invalidate(self, campaign_type: str, campaign_id: bytes):
+        self.cache.pop((campaign_type, campaign_id))
+
+    def finalize(self, campaign_type: str, campaign_id: bytes, status: CampaignStatus):
+        self.cache.update((campaign_type, campaign_id), lambda campaign: campaign._replace(campaign_status=status))
+
+    def iter_campaign_ids(self, campaign_type: str, block_identifier='latest'):
+        paginated_fn = self.contract.functions[PAGINATED_FNS[campaign_type]]
+
+        def fetch_page(offset: int) -> list:
+            page, _ = paginated_fn(offset, self.page_size).call(block_identifier=block_identifier)
+            return page
+
+        first_page, total = paginated_fn(0, self.page_size).call(block_identifier=block_identifier)
+        for campaign_id in first_page:
+            yield bytes(campaign_id)
+
+        with ThreadPoolExecutor(max_workers=self.prefetch) as executor:
+            for page in executor.map(fetch_page, range(self.page_size, total, self.page_size)):
+                for campaign_id in page:
+                    yield bytes(campaign_id)
+
+    def list_campaign_ids(self, campaign_type: str, block_identifier='latest') -> list:
+        return list(self.iter_campaign_ids(campaign_type, block_identifier))
+
+    def get_campaigns(self, campaign_type: str, campaign_ids: list) -> list:
+        """Records in the order of `campaign_ids`, None for unknown ids."""
+        campaigns, missing = self._cached(campaign_type, campaign_ids)
+        raw_infos = self.reader.read(
+            self.contract, INFO_FNS[campaign_type], [(campaign_id,) for campaign_id in missing]
+        )
+        return self._fill(campaign_type, campaigns, raw_infos)
+
+    def get_campaign(self, campaign_type: str, campaign_id: bytes):
+        return self.get_campaigns(campaign_type, [campaign_id])[0]
+
+    def _cached(self, campaign_type: str, campaign_ids: list) -> tuple:
+        campaigns = [self.cache.get((campaign_type, campaign_id)) for campaign_id in campaign_ids]
+        missing = [campaign_id for campaign_id, campaign in zip(campaign_ids, campaigns) if campaign is None]
+        return campaigns, missing
+
+    def _fill(self, campaign_type: str, campaigns: list, raw_infos: list) -> list:
+        fetched = iter(raw_infos)
+        for i, campaign in enumerate(campaigns):
+            if campaign is not None:
+                continue
+            raw = next(fetched)
+            if raw is not None:
+                campaigns[i] = decode_campaign(campaign_type, raw)
+                self.remember(campaign_type, campaigns[i])
+        return campaigns
+
+
+class AsyncMarketplaceCampaigns(MarketplaceCampaigns):
+    """MarketplaceCampaigns for AsyncWeb3; `reader` must be an AsyncMulticallReader."""
+
+    async def list_campaign_ids(self, campaign_type: str, block_identifier='latest') -> list:
+        paginated_fn = self.contract.functions[PAGINATED_FNS[campaign_type]]
+        first_page, total = await paginated_fn(0, self.page_size).call(block_identifier=block_identifier)
+
+        other_pages = await asyncio.gather(*(
+            paginated_fn(offset, self.page_size).call(block_identifier=block_identifier)
+            for offset in range(self.page_size, total, self.page_size)
+        ))
+        pages = [first_page] + [page for page, _ in other_pages]
+        return [bytes(campaign_id) for page in pages for campaign_id in page]
+
+    async def get_campaigns(self, campaign_type: str, campaign_ids: list) -> list:
+        campaigns, missing = self._cached(campaign_type, campaign_ids)
+        raw_infos = await self.reader.read(
+            self.contract, INFO_FNS[campaign_type], [(campaign_id,) for campaign_id in missing]
+        )
+        return self._fill(campaign_type, campaigns, raw_infos)
+
+    async def get_campaign(self, campaign_type: str, campaign_id: bytes):
+        return (await self.get_campaigns(campaign_type, [campaign_id]))[0]
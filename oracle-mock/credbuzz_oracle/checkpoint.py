@@ -0,0 +1,153 @@
+import sqlite3
+import threading
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS campaigns (
+    campaign_type TEXT NOT NULL,
+    campaign_id BLOB NOT NULL,
+    status INTEGER NOT NULL,
+    deadline INTEGER NOT NULL,
+    token TEXT NOT NULL,
+    info BLOB NOT NULL,
+    PRIMARY KEY (campaign_type, campaign_id)
+);
+"""
+
+# one row per broadcast of a nonce, replacements included
+PENDING_TXS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS pending_txs (
+    nonce INTEGER NOT NULL,
+    tx_hash BLOB NOT NULL,
+    campaign_type TEXT,
+    -- concatenated bytes32 ids of a batch discard
+    campaign_id BLOB,
+    PRIMARY KEY (nonce, tx_hash)
+)
+"""
+
+
+class CheckpointStore:
+    """SQLite checkpoint of the oracle state.
+
+    Keeps the last fully processed block, the ongoing campaigns and the
+    discard transactions still in flight, so a restart only backfills the
+    logs emitted since the checkpoint. A checkpoint written for another
+    Marketplace address is discarded on open.
+    """
+
+    def __init__(self, path: str, marketplace_address: str):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._migrate()
+        self._conn.executescript(SCHEMA)
+        self._conn.execute(PENDING_TXS_SCHEMA)
+        self._lock = threading.Lock()
+
+        if self._get_meta('marketplace_address') != marketplace_address.lower():
+            self.reset()
+            self._set_meta('marketplace_address', marketplace_address.lower())
+
+    def reset(self):
+        with self._lock:
+            self._conn.execute('BEGIN')
+            self._conn.execute('DELETE FROM meta')
+            self._conn.execute('DELETE FROM campaigns')
+            self._conn.execute('DELETE FROM pending_txs')
+            self._conn.execute('COMMIT')
+
+    def load_campaigns(self) -> tuple:
+        """Returns (last_block, {key: encoded info}), last_block is None
+        when nothing was checkpointed yet."""
+        last_block = self._get_meta('last_block')
+        if last_block is None:
+            return None, {}
+
+        with self._lock:
+            rows = self._conn.execute('SELECT campaign_type, campaign_id, info FROM campaigns').fetchall()
+        return int(last_block), {(campaign_type, bytes(campaign_id)): bytes(info) for campaign_type, campaign_id, info in rows}
+
+    def save_campaigns(self, last_block: int, upserts: list, deletes: list):
+        """Atomically writes (key, status, deadline, token, encoded info) rows,
+        removes the `deletes` keys and moves the checkpoint to `last_block`."""
+        with self._lock:
+            self._conn.execute('BEGIN')
+            try:
+                self._conn.executemany(
+                    'INSERT OR REPLACE INTO campaigns VALUES (?, ?, ?, ?, ?, ?)',
+                    [(key[0], key[1], status, deadline, token, info)
+                     for key, status, deadline, token, info in upserts]
+                )
+                self._conn.executemany(
+                    'DELETE FROM campaigns WHERE campaign_type = ? AND campaign_id = ?', deletes
+                )
+                self._conn.execute(
+                    'INSERT OR REPLACE INTO meta VALUES (?, ?)', ('last_block', str(last_block))
+                )
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+
+    def delete_campaign(self, key: tuple):
+        with self._lock:
+            self._conn.execute('DELETE FROM campaigns WHERE campaign_type = ? AND campaign_id = ?', key)
+
+    def load_pending(self) -> list:
+        """Returns (nonce, tx_hashes, keys) for every nonce still in flight, with
+        the hashes of its transaction and replacements in broadcast order."""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT nonce, tx_hash, campaign_type, campaign_id FROM pending_txs ORDER BY nonce, rowid'
+            ).fetchall()
+        in_flight = {}
+        for nonce, tx_hash, campaign_type, campaign_ids in rows:
+            if nonce not in in_flight:
+                in_flight[nonce] = ([], [
+                    (campaign_type, bytes(campaign_ids[i:i + 32])) for i in range(0, len(campaign_ids), 32)
+                ] if campaign_type else [])
+            in_flight[nonce][0].append(bytes(tx_hash))
+        return [(nonce, tx_hashes, keys) for nonce, (tx_hashes, keys) in in_flight.items()]
+
+    def add_pending(self, nonce: int, tx_hash: bytes, keys: list = None):
+        """Records an in-flight transaction discarding `keys`, which all share one
+        campaign type. Replacements are added next to the transactions they replace."""
+        campaign_type = keys[0][0] if keys else None
+        campaign_ids = b''.join(campaign_id for _, campaign_id in keys) if keys else None
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR IGNORE INTO pending_txs VALUES (?, ?, ?, ?)',
+                (nonce, bytes(tx_hash), campaign_type, campaign_ids)
+            )
+
+    def remove_pending(self, nonces: list):
+        with self._lock:
+            self._conn.executemany('DELETE FROM pending_txs WHERE nonce = ?', [(nonce,) for nonce in nonces])
+
+    def close(self):
+        self._conn.close()
+
+    def _migrate(self):
+        # pending_txs used to keep only the last hash of a nonce
+        columns = self._conn.execute('PRAGMA table_info(pending_txs)').fetchall()
+        if [column[1] for column in columns if column[5]] == ['nonce']:
+            self._conn.execute('BEGIN')
+            self._conn.execute('ALTER TABLE pending_txs RENAME TO pending_txs_by_nonce')
+            self._conn.execute(PENDING_TXS_SCHEMA)
+            self._conn.execute('INSERT INTO pending_txs SELECT * FROM pending_txs_by_nonce')
+            self._conn.execute('DROP TABLE pending_txs_by_nonce')
+            self._conn.execute('COMMIT')
+
+    def _get_meta(self, key: str):
+        with self._lock:
+            row = self._conn.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key: str, value: str):
+        with self._lock:
+            self._conn.execute('INSERT OR REPLACE INTO meta VALUES (?, ?)', (key, value))
@@ -0,0 +1,230 @@
+"""Validated oracle configuration, read from the environment.
+
+ORACLE_NETWORK picks the prefix of the network-specific variables, BASE by
+default: ORACLE_NETWORK=test reads TEST_ALCHEMY_RPC_URL, TEST_RPC_URLS,
+TEST_ALCHEMY_WS_URL and TEST_PRIVATE_KEY. Every other variable is listed
+in ENV_VARS. Empty variables count as unset.
+"""
+import logging
+import os
+import re
+from typing import Literal, Optional
+
+from pydantic import BaseModel, ConfigDict, Field, FilePath, SecretStr, ValidationError, field_validator
+
+logger = logging.getLogger(__name__)
+
+ENV_VARS = {
+    'marketplace_address': 'MARKETPLACE_ADDRESS',
+    'marketplace_abi_path': 'MARKETPLACE_ABI_PATH',
+    'usdc_address': 'USDC_ADDRESS',
+    'usdc_abi_path': 'USDC_ABI_PATH',
+    'backend_url': 'BASE_URL',
+    'rpc_write_mode': 'RPC_WRITE_MODE',
+    'rpc_batch_size': 'RPC_BATCH_SIZE',
+    'multicall_address': 'MULTICALL_ADDRESS',
+    'checkpoint_path': 'CHECKPOINT_PATH',
+    'mode': 'ORACLE_MODE',
+    'shards': 'ORACLE_SHARDS',
+    'max_concurrency': 'ORACLE_MAX_CONCURRENCY',
+    'sleep_time': 'SWEEP_INTERVAL',
+    'campaign_cache_size': 'CAMPAIGN_CACHE_SIZE',
+    'token_cache_size': 'TOKEN_CACHE_SIZE',
+    'max_fee_per_gas': 'MAX_FEE_PER_GAS',
+    'discard_batch_gas': 'DISCARD_BATCH_GAS_LIMIT',
+    'preflight_batch_size': 'PREFLIGHT_BATCH_SIZE',
+    'receipt_timeout': 'RECEIPT_TIMEOUT',
+    'receipt_poll_interval': 'RECEIPT_POLL_INTERVAL',
+    'receipt_batch_blocks': 'RECEIPT_BATCH_BLOCKS',
+    'retry_delay': 'RETRY_DELAY',
+    'retry_max_delay': 'RETRY_MAX_DELAY',
+    'backend_workers': 'BACKEND_WORKERS',
+    'backend_timeout': 'BACKEND_TIMEOUT',
+    'backend_batch_window': 'BACKEND_BATCH_WINDOW',
+    'leader_lease_path': 'LEADER_LEASE_PATH',
+    'leader_lease_ttl': 'LEADER_LEASE_TTL',
+    'metrics_port': 'METRICS_PORT',
+    'metrics_addr': 'METRICS_ADDR',
+    'log_level': 'LOG_LEVEL',
+}
+
+# Settings a running oracle picks up on reload, the others need a restart
+LIVE_FIELDS = frozenset({
+    'sleep_time', 'max_concurrency', 'rpc_batch_size', 'campaign_cache_size', 'token_cache_size',
+    'max_fee_per_gas', 'discard_batch_gas', 'preflight_batch_size', 'receipt_timeout', 'receipt_poll_interval',
+    'receipt_batch_blocks', 'retry_delay', 'retry_max_delay', 'backend_batch_window', 'log_level',
+})
+
+ADDRESS = re.compile(r'^0x[0-9a-fA-F]{40}$')
+PRIVATE_KEY = re.compile(r'^(0x)?[0-9a-fA-F]{64}$')
+
+
+class OracleConfig(BaseModel):
+    # RPC URLs carry API keys: validation errors never echo the input
+    model_config = ConfigDict(frozen=True, extra='forbid', hide_input_in_errors=True)
+
+    rpc_urls: list[str] = Field(min_length=1)
+    private_key: SecretStr
+    marketplace_address: str
+    marketplace_abi_path: FilePath
+    usdc_address: str
+    usdc_abi_path: FilePath
+    # campaign status updates are posted to the backend
+    backend_url: str
+    # eth_sendRawTransaction goes to every endpoint ('all') or the first healthy one ('preferred')
+    rpc_write_mode: Literal['all', 'preferred'] = 'all'
+    # calls per JSON-RPC batch the async provider coalesces
+    rpc_batch_size: int = Field(100, ge=1)
+    # optional websocket endpoint, enables the eth_subscribe log stream
+    ws_url: Optional[str] = None
+    # None picks multicall.MULTICALL3_ADDRESS
+    multicall_address: Optional[str] = None
+    checkpoint_path: str = 'oracle_checkpoint.sqlite3'
+
+    mode: Literal['sync', 'async'] = 'sync'
+    # shard worker processes, shard i serves metrics on metrics_port + 1 + i
+    shards: int = Field(1, ge=1)
+    max_concurrency: int = Field(16, ge=1)
+    # seconds between log polls when no deadline or streamed log comes first
+    sleep_time: float = Field(30, gt=0)
+
+    campaign_cache_size: int = Field(10000, ge=1)
+    token_cache_size: int = Field(1024, ge=1)
+    # caps replacement fees, in wei
+    max_fee_per_gas: Optional[int] = Field(None, gt=0)
+    # None picks discards.DISCARD_BATCH_GAS_LIMIT
+    discard_batch_gas: Optional[int] = Field(None, gt=0)
+    preflight_batch_size: int = Field(100, ge=1)
+
+    receipt_timeout: float = Field(180, gt=0)
+    receipt_poll_interval: float = Field(1, gt=0)
+    receipt_batch_blocks: int = Field(50, ge=1)
+    retry_delay: float = Field(30, gt=0)
+    retry_max_delay: float = Field(900, gt=0)
+
+    backend_workers: int = Field(2, ge=1)
+    backend_timeout: float = Field(10, gt=0)
+    backend_batch_window: float = Field(0.5, ge=0)
+
+    # shared by redundant replicas, only the lease holder sends transactions
+    leader_lease_path: Optional[str] = None
+    leader_lease_ttl: float = Field(15, gt=0)
+
+    # Prometheus scrape endpoint, local only unless metrics_addr says otherwise
+    metrics_port: int = Field(9464, ge=0, le=65535)
+    metrics_addr: str = '127.0.0.1'
+    # LOG_LEVEL=DEBUG adds per-campaign detail
+    log_level: str = 'INFO'
+
+    @field_validator('rpc_urls')
+    @classmethod
+    def _http_urls(cls, urls: list) -> list:
+        for i, url in enumerate(urls):
+            if not url.startswith(('http://', 'https://')):
+                raise ValueError(f'URL {i} is not an HTTP URL')
+        return urls
+
+    @field_validator('backend_url')
+    @classmethod
+    def _http_url(cls, url: str) -> str:
+        if not url.startswith(('http://', 'https://')):
+            raise ValueError('not an HTTP URL')
+        return url.rstrip('/')
+
+    @field_validator('ws_url')
+    @classmethod
+    def _ws_url(cls, url: Optional[str]) -> Optional[str]:
+        if url is not None and not url.startswith(('ws://', 'wss://')):
+            raise ValueError('not a websocket URL')
+        return url
+
+    @field_validator('marketplace_address', 'usdc_address', 'multicall_address')
+    @classmethod
+    def _address(cls, address: Optional[str]) -> Optional[str]:
+        if address is not None and not ADDRESS.match(address):
+            raise ValueError(f'not an address: {address}')
+        return address
+
+    @field_validator('private_key')
+    @classmethod
+    def _private_key(cls, key: SecretStr) -> SecretStr:
+        if not PRIVATE_KEY.match(key.get_secret_value()):
+            raise ValueError('not a 32-byte hex private key')
+        return key
+
+    @field_validator('log_level')
+    @classmethod
+    def _log_level(cls, level: str) -> str:
+        level = level.upper()
+        if not isinstance(logging.getLevelName(level), int):
+            raise ValueError(f'unknown log level: {level}')
+        return level
+
+    @field_validator('retry_max_delay')
+    @classmethod
+    def _retry_max_delay(cls, max_delay: float, info) -> float:
+        if max_delay < info.data.get('retry_delay', 0):
+            raise ValueError('retry_max_delay is below retry_delay')
+        return max_delay
+
+    @classmethod
+    def from_env(cls, environ=os.environ) -> 'OracleConfig':
+        """Raises a ValidationError, a ValueError, naming every missing or invalid setting."""
+        network = environ.get('ORACLE_NETWORK', 'base').upper()
+        values = {field: environ[name] for field, name in ENV_VARS.items() if environ.get(name)}
+        rpc_url = environ.get(f'{network}_ALCHEMY_RPC_URL')
+        # optional comma-separated fallback endpoints, pooled with the Alchemy one
+        fallback_urls = [url.strip() for url in environ.get(f'{network}_RPC_URLS', '').split(',') if url.strip()]
+        values['rpc_urls'] = ([rpc_url] if rpc_url else []) + fallback_urls
+        if environ.get(f'{network}_ALCHEMY_WS_URL'):
+            values['ws_url'] = environ[f'{network}_ALCHEMY_WS_URL']
+        if environ.get(f'{network}_PRIVATE_KEY'):
+            values['private_key'] = environ[f'{network}_PRIVATE_KEY']
+        return cls(**values)
+
+    def changes(self, other: 'OracleConfig') -> tuple:
+        """(live, restart) changes from this config to `other`: values of the
+        settings a running oracle can take, names of those needing a restart."""
+        live, restart = {}, []
+        for field in type(self).model_fields:
+            if getattr(self, field) != getattr(other, field):
+                if field in LIVE_FIELDS:
+                    live[field] = getattr(other, field)
+                else:
+                    restart.append(field)
+        return live, restart
+
+
+def load_config(environ=os.environ) -> Optional[OracleConfig]:
+    """OracleConfig.from_env for reloads: logs the validation errors and returns None."""
+    try:
+        return OracleConfig.from_env(environ)
+    except ValidationError as e:
+        errors = ['%s: %s' % ('.'.join(map(str, error['loc'])), error['msg'])
+                  for error in e.errors(include_input=False, include_url=False)]
+        logger.error('Invalid configuration, keeping the current one: %s', '; '.join(errors))
+        return None
+
+
+def apply_live(config: OracleConfig, fee_oracle=None, receipt_tracker=None, retry_policy=None, campaigns=None,
+               token_metadata=None, discard_preflight=None, backend_notifier=None):
+    """Pushes the live settings of `config` into the components an oracle has built."""
+    from .outcomes import BACKOFF
+
+    logging.getLogger().setLevel(config.log_level)
+    if fee_oracle is not None:
+        fee_oracle.max_fee_per_gas = config.max_fee_per_gas
+    if receipt_tracker is not None:
+        receipt_tracker.poll_interval = config.receipt_poll_interval
+        receipt_tracker.max_batch_blocks = config.receipt_batch_blocks
+    if retry_policy is not None:
+        retry_policy.base_delays[BACKOFF] = config.retry_delay
+        retry_policy.max_delay = config.retry_max_delay
+    if campaigns is not None:
+        campaigns.cache.resize(config.campaign_cache_size)
+    if token_metadata is not None:
+        token_metadata.cache.resize(config.token_cache_size)
+    if discard_preflight is not None:
+        discard_preflight.max_batch_size = config.preflight_batch_size
+    if backend_notifier is not None:
+        backend_notifier.batch_window = config.backend_batch_window
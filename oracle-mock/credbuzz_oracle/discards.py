@@ -0,0 +1,169 @@
+import asyncio
+import logging
+
+from eth_utils import function_abi_to_4byte_selector
+from web3 import Web3
+from web3.exceptions import ContractLogicError, Web3TypeError
+from web3.logs import DISCARD
+
+from .campaigns import AMOUNT_FIELDS, BATCH_DISCARD_FNS, DISCARD_FNS, DISCARDED_EVENTS
+
+logger = logging.getLogger(__name__)
+
+# Gas of one batchDiscard*Campaigns entry: cold reads of the campaign, the
+# status write, the ERC20 refund and the Discarded event
+DISCARD_GAS_PER_CAMPAIGN = 60000
+# Transaction base cost plus calldata and loop overhead
+DISCARD_BASE_GAS = 50000
+# Keeps a batch well below the block gas limit so it is picked up quickly
+DISCARD_BATCH_GAS_LIMIT = 12_000_000
+
+
+def chunk_discards(campaign_ids: list, batch_gas_limit: int = DISCARD_BATCH_GAS_LIMIT) -> list:
+    """Splits `campaign_ids` into batches whose discard gas stays within `batch_gas_limit`."""
+    size = max(1, (batch_gas_limit - DISCARD_BASE_GAS) // DISCARD_GAS_PER_CAMPAIGN)
+    return [campaign_ids[i:i + size] for i in range(0, len(campaign_ids), size)]
+
+
+def supports_batch_discard(contract, code) -> bool:
+    """Whether the contract ABI and its deployed `code` both have the batch discard
+    functions; a Marketplace deployed before them only has the single ones."""
+    selectors = [
+        function_abi_to_4byte_selector(entry) for entry in contract.abi
+        if entry['type'] == 'function' and entry['name'] in BATCH_DISCARD_FNS.values()
+    ]
+    # the dispatcher pushes the selector of every external function
+    return len(selectors) == len(BATCH_DISCARD_FNS) and all(selector in bytes(code) for selector in selectors)
+
+
+def discarded_ids(contract, campaign_type: str, receipt) -> list:
+    """Ids the batch actually discarded; ids already finalized on chain are skipped by the contract."""
+    events = contract.events[DISCARDED_EVENTS[campaign_type]]().process_receipt(receipt, errors=DISCARD)
+    return [bytes(event['args']['campaignId']) for event in events]
+
+
+def refunds(campaign_type: str, campaigns: list) -> list:
+    """(token_address, amount) escrowed by each discarded campaign record."""
+    amount_field = AMOUNT_FIELDS[campaign_type]
+    return [(campaign.token_address, getattr(campaign, amount_field)) for campaign in campaigns]
+
+
+# Reverts with a plain string or a failed assert
+BUILTIN_ERRORS = (
+    {'type': 'error', 'name': 'Error', 'inputs': [{'name': 'message', 'type': 'string'}]},
+    {'type': 'error', 'name': 'Panic', 'inputs': [{'name': 'code', 'type': 'uint256'}]},
+)
+
+
+def revert_errors(contract) -> dict:
+    """Names of the contract's custom errors by 4-byte selector."""
+    errors = {}
+    for entry in [*contract.abi, *BUILTIN_ERRORS]:
+        if entry['type'] == 'error':
+            types = ','.join(item['type'] for item in entry['inputs'])
+            errors[Web3.keccak(text=f"{entry['name']}({types})")[:4]] = entry['name']
+    return errors
+
+
+def revert_name(errors: dict, data) -> str:
+    """Error name of the revert `data`, 'Reverted' when it matches no known error."""
+    data = Web3.to_bytes(hexstr=data) if isinstance(data, str) else bytes(data or b'')
+    return errors.get(data[:4], 'Reverted')
+
+
+class DiscardPreflight:
+    """Simulates planned discards against the pending block before signing.
+
+    The batch discard functions skip settled ids, but a campaign whose refund
+    fails reverts the whole batch, so every id is simulated through the
+    single discard function, as eth_calls from `sender` sent in JSON-RPC
+    batches of `max_batch_size`. `check` returns the ids to send and the
+    error name of those whose discard would revert. Ids whose simulation
+    could not run are kept, the transaction decides for them.
+    """
+
+    def __init__(self, w3: Web3, contract, sender: str, max_batch_size: int = 100):
+        self.w3 = w3
+        self.contract = contract
+        self.sender = sender
+        self.max_batch_size = max_batch_size
+        self.errors = revert_errors(contract)
+        self.batch = True
+
+    def check(self, campaign_type: str, campaign_ids: list) -> tuple:
+        return self._split(campaign_ids, self._simulate(self._calls(campaign_type, campaign_ids)))
+
+    def _calls(self, campaign_type: str, campaign_ids: list) -> list:
+        return [{
+            'from': self.sender, 'to': self.contract.address,
+            'data': self.contract.encode_abi(DISCARD_FNS[campaign_type], [campaign_id]),
+        } for campaign_id in campaign_ids]
+
+    def _simulate(self, calls: list) -> list:
+        """Revert data of every call, None for calls that succeed or could not run."""
+        if self.batch:
+            try:
+                return self._batch_simulate(calls)
+            except (AttributeError, NotImplementedError, Web3TypeError):
+                # the provider can't batch, simulate one call at a time from now on
+                self.batch = False
+            except Exception as e:
+                logger.warning('Error simulating %d discards in a batch: %s', len(calls), e)
+        return [self._call(call) for call in calls]
+
+    def _batch_simulate(self, calls: list) -> list:
+        make_batch_request = self.w3.provider.batch_request_func(self.w3, self.w3.middleware_onion)
+        reverts = []
+        for i in range(0, len(calls), self.max_batch_size):
+            responses = make_batch_request([('eth_call', [call, 'pending']) for call in calls[i:i + self.max_batch_size]])
+            if not isinstance(responses, list):
+                raise Exception(responses.get('error', responses))
+            reverts.extend(self._response_revert(response) for response in responses)
+        return reverts
+
+    def _call(self, call: dict):
+        try:
+            self.w3.eth.call(call, 'pending')
+        except ContractLogicError as e:
+            return e.data or '0x'
+        except Exception as e:
+            logger.warning('Error simulating discard: %s', e)
+        return None
+
+    def _response_revert(self, response: dict):
+        error = response.get('error')
+        if error is None:
+            return None
+        data = error.get('data')
+        if isinstance(data, dict):
+            data = data.get('data')
+        if isinstance(data, str) and data.startswith('0x'):
+            return data
+        # a revert without data, anything else is a node error and not the campaign's fault
+        return '0x' if 'revert' in str(error.get('message', '')).lower() else None
+
+    def _split(self, campaign_ids: list, reverts: list) -> tuple:
+        ok, rejected = [], {}
+        for campaign_id, revert in zip(campaign_ids, reverts):
+            if revert is None:
+                ok.append(campaign_id)
+            else:
+                rejected[campaign_id] = revert_name(self.errors, revert)
+        return ok, rejected
+
+
+class AsyncDiscardPreflight(DiscardPreflight):
+    """DiscardPreflight for AsyncWeb3, the pooled provider coalesces the calls into batches."""
+
+    async def check(self, campaign_type: str, campaign_ids: list) -> tuple:
+        calls = self._calls(campaign_type, campaign_ids)
+        return self._split(campaign_ids, await asyncio.gather(*[self._call(call) for call in calls]))
+
+    async def _call(self, call: dict):
+        try:
+            await self.w3.eth.call(call, 'pending')
+        except ContractLogicError as e:
+            return e.data or '0x'
+        except Exception as e:
+            logger.warning('Error simulating discard: %s', e)
+        return None
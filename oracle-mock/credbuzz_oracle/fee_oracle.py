@@ -0,0 +1,132 @@
+import asyncio
+import math
+import threading
+import time
+
+from eth_utils import function_signature_to_4byte_selector
+from web3 import Web3
+
+# Nodes only accept a replacement that raises both fees by at least 10%
+MIN_REPLACEMENT_BUMP = 1.1
+
+
+class FeeOracle:
+    """EIP-1559 fees and gas limits for the oracle's transactions.
+
+    Fee suggestions come from one eth_feeHistory call and are reused for
+    `ttl` seconds, about one Base block, so back-to-back transactions don't
+    each pay a gas price lookup. Gas estimates are memoized per function
+    selector and campaign type as a per-campaign cost and scaled to the
+    batch size; a batch more than `reshape_factor` times larger or smaller
+    than the measured one is estimated again, and `forget` drops the
+    estimates of a campaign type after a revert. `bump` prices the
+    replacement of a stuck transaction.
+    """
+
+    def __init__(self, w3: Web3, ttl: float = 2, priority_percentile: int = 50,
+                 min_priority_fee: int = 1_000_000, max_fee_per_gas: int = None,
+                 estimate_margin: float = 1.2, bump_factor: float = 1.25, reshape_factor: float = 2):
+        self.w3 = w3
+        self.ttl = ttl
+        self.priority_percentile = priority_percentile
+        self.min_priority_fee = min_priority_fee
+        self.max_fee_per_gas = max_fee_per_gas
+        self.estimate_margin = estimate_margin
+        self.bump_factor = bump_factor
+        self.reshape_factor = reshape_factor
+        self._fees = None
+        self._fetched_at = 0
+        # (selector, campaign type) -> (gas per campaign, batch size it was measured on)
+        self._gas_per_item = {}
+        self._lock = threading.Lock()
+
+    def fees(self) -> dict:
+        with self._lock:
+            if self._fees is None or time.time() - self._fetched_at >= self.ttl:
+                self._fees = self._suggest(self.w3.eth.fee_history(1, 'latest', [self.priority_percentile]))
+                self._fetched_at = time.time()
+            return dict(self._fees)
+
+    def gas(self, call, campaign_type: str, count: int, sender: str, base_gas: int = 21000) -> int:
+        key = self._shape(call, campaign_type)
+        if self._stale(key, count):
+            self._memoize(key, call.estimate_gas({'from': sender}), count, base_gas)
+        return self._scale(key, count, base_gas)
+
+    def forget(self, campaign_type: str):
+        """Drops the memoized estimates of `campaign_type`, e.g. after a
+        transaction priced with them reverted."""
+        for key in [key for key in self._gas_per_item if key[1] == campaign_type]:
+            self._gas_per_item.pop(key, None)
+
+    def bump(self, stuck_txn) -> dict:
+        """Fees for a replacement of `stuck_txn`: the current suggestion, but
+        at least `bump_factor` times what the stuck transaction offered."""
+        stuck_priority = stuck_txn.get('maxPriorityFeePerGas', stuck_txn.get('gasPrice'))
+        stuck_max = stuck_txn.get('maxFeePerGas', stuck_txn.get('gasPrice'))
+        return self._bumped(self.fees(), stuck_priority, stuck_max)
+
+    def _bumped(self, fees: dict, stuck_priority: int, stuck_max: int) -> dict:
+        priority = max(fees['maxPriorityFeePerGas'], math.ceil(stuck_priority * self.bump_factor))
+        max_fee = max(fees['maxFeePerGas'], math.ceil(stuck_max * self.bump_factor), priority)
+        if self.max_fee_per_gas is not None:
+            max_fee = min(max_fee, self.max_fee_per_gas)
+            priority = min(priority, max_fee)
+        if max_fee < stuck_max * MIN_REPLACEMENT_BUMP or priority < stuck_priority * MIN_REPLACEMENT_BUMP:
+            raise Exception(f"Fee cap {self.max_fee_per_gas} reached, cannot replace transaction")
+        return {'maxFeePerGas': max_fee, 'maxPriorityFeePerGas': priority}
+
+    def _suggest(self, history) -> dict:
+        # baseFeePerGas holds one entry past the requested blocks: the next block's base fee
+        base_fee = history['baseFeePerGas'][-1] if history['baseFeePerGas'] else 0
+        reward = history['reward'][0][0] if history['reward'] else 0
+        priority = max(reward, self.min_priority_fee)
+        # room for the base fee to double before the transaction is priced out
+        max_fee = 2 * base_fee + priority
+        if self.max_fee_per_gas is not None:
+            max_fee = min(max_fee, self.max_fee_per_gas)
+            priority = min(priority, max_fee)
+        return {'maxFeePerGas': max_fee, 'maxPriorityFeePerGas': priority}
+
+    def _shape(self, call, campaign_type: str) -> tuple:
+        return function_signature_to_4byte_selector(call.signature), campaign_type
+
+    def _stale(self, key: tuple, count: int) -> bool:
+        memo = self._gas_per_item.get(key)
+        if memo is None:
+            return True
+        measured = memo[1]
+        return not measured / self.reshape_factor <= count <= measured * self.reshape_factor
+
+    def _memoize(self, key: tuple, estimate: int, count: int, base_gas: int):
+        count = max(count, 1)
+        self._gas_per_item[key] = math.ceil(max(estimate - base_gas, 0) / count), count
+
+    def _scale(self, key: tuple, count: int, base_gas: int) -> int:
+        return math.ceil((base_gas + self._gas_per_item[key][0] * count) * self.estimate_margin)
+
+
+class AsyncFeeOracle(FeeOracle):
+    """FeeOracle for AsyncWeb3; `fees`, `gas` and `bump` are coroutines."""
+
+    def __init__(self, w3, *args, **kwargs):
+        super().__init__(w3, *args, **kwargs)
+        self._async_lock = asyncio.Lock()
+
+    async def fees(self) -> dict:
+        async with self._async_lock:
+            if self._fees is None or time.time() - self._fetched_at >= self.ttl:
+                self._fees = self._suggest(await self.w3.eth.fee_history(1, 'latest', [self.priority_percentile]))
+                self._fetched_at = time.time()
+            return dict(self._fees)
+
+    async def gas(self, call, campaign_type: str, count: int, sender: str, base_gas: int = 21000) -> int:
+        key = self._shape(call, campaign_type)
+        if self._stale(key, count):
+            self._memoize(key, await call.estimate_gas({'from': sender}), count, base_gas)
+        return self._scale(key, count, base_gas)
+
+    async def bump(self, stuck_txn) -> dict:
+        stuck_priority = stuck_txn.get('maxPriorityFeePerGas', stuck_txn.get('gasPrice'))
+        stuck_max = stuck_txn.get('maxFeePerGas', stuck_txn.get('gasPrice'))
+        return self._bumped(await self.fees(), stuck_priority, stuck_max)
@@ -0,0 +1,125 @@
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS leases (
+    name TEXT PRIMARY KEY,
+    holder TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+"""
+
+
+class SqliteLease:
+    """Lease backend on a row of a SQLite file shared by the replicas of one host.
+
+    A backend needs `acquire(holder, ttl)`, taking or extending the lease
+    when it is free, expired or already `holder`'s and returning whether
+    `holder` now has it, and `release(holder)`. A Redis backend maps onto
+    SET NX PX plus a compare-and-set script.
+    """
+
+    def __init__(self, path: str, name: str = 'oracle'):
+        self.name = name
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=5)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    def acquire(self, holder: str, ttl: float) -> bool:
+        now = time.time()
+        with self._lock:
+            # one statement, so two replicas can't both see the lease as free
+            self._conn.execute(
+                'INSERT INTO leases VALUES (?, ?, ?) ON CONFLICT(name) DO UPDATE '
+                'SET holder = excluded.holder, expires_at = excluded.expires_at '
+                'WHERE leases.holder = excluded.holder OR leases.expires_at < ?',
+                (self.name, holder, now + ttl, now),
+            )
+            row = self._conn.execute('SELECT holder FROM leases WHERE name = ?', (self.name,)).fetchone()
+        return row is not None and row[0] == holder
+
+    def release(self, holder: str):
+        with self._lock:
+            self._conn.execute('DELETE FROM leases WHERE name = ? AND holder = ?', (self.name, holder))
+
+
+class LeaderElector:
+    """Keeps one replica of the oracle in charge of the owner account.
+
+    A background thread tries to take or renew the lease every
+    `renew_interval` seconds. The replica counts as leader only until
+    `ttl - safety_margin` seconds after its last successful renewal, so a
+    stalled leader stops sending before a standby can take over. Standbys
+    retry at the same pace and take over at most `ttl + renew_interval`
+    seconds after the leader stops renewing. `on_elected` and `on_demoted`
+    run on the election thread.
+    """
+
+    def __init__(self, backend, holder: str = None, ttl: float = 15, renew_interval: float = 3,
+                 safety_margin: float = 3, on_elected=None, on_demoted=None):
+        self.backend = backend
+        self.holder = holder or f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+        self.ttl = ttl
+        self.renew_interval = renew_interval
+        self.safety_margin = safety_margin
+        self.on_elected = on_elected
+        self.on_demoted = on_demoted
+        self._valid_until = 0
+        self._leading = False
+        self._stopped = threading.Event()
+
+    @property
+    def is_leader(self) -> bool:
+        return time.monotonic() < self._valid_until
+
+    def start(self):
+        threading.Thread(target=self._run, name='leader-election', daemon=True).start()
+
+    def stop(self):
+        self._stopped.set()
+        self._valid_until = 0
+        try:
+            self.backend.release(self.holder)
+        except Exception as e:
+            logger.error('Error releasing the leader lease: %s', e)
+
+    def renew(self):
+        """One election round: takes or renews the lease and fires the callbacks."""
+        started = time.monotonic()
+        try:
+            acquired = self.backend.acquire(self.holder, self.ttl)
+        except Exception as e:
+            logger.error('Error renewing the leader lease: %s', e)
+            acquired = False
+        if acquired:
+            self._valid_until = started + self.ttl - self.safety_margin
+
+        if self.is_leader and not self._leading:
+            self._leading = True
+            logger.warning('Elected leader as %s', self.holder)
+            self._notify(self.on_elected)
+        elif not self.is_leader and self._leading:
+            self._leading = False
+            logger.warning('Lost the leader lease, standing by as %s', self.holder)
+            self._notify(self.on_demoted)
+
+    def _notify(self, callback):
+        if callback is None:
+            return
+        try:
+            callback()
+        except Exception as e:
+            logger.error('Error handling a leadership change: %s', e)
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self.renew()
+            self._stopped.wait(self.renew_interval)
@@ -0,0 +1,60 @@
+import asyncio
+import logging
+import threading
+from urllib.parse import urlparse
+
+from web3 import AsyncWeb3, WebSocketProvider
+
+logger = logging.getLogger(__name__)
+
+
+class LogStream:
+    """Streams Marketplace logs over an eth_subscribe websocket subscription.
+
+    Every received log is handed to `on_logs`. The connection is re-opened
+    with exponential backoff when it drops, and `on_connect` is called once
+    the new subscription is live so the caller can backfill the block range
+    it may have missed in between.
+    """
+
+    def __init__(self, ws_url: str, address: str, topics: list, on_logs, on_connect,
+                 reconnect_delay: float = 1, max_reconnect_delay: float = 60):
+        self.ws_url = ws_url
+        # host and port only, the URL path carries the API key
+        self.name = urlparse(ws_url).netloc.rsplit('@', 1)[-1] or ws_url
+        self.address = address
+        self.topics = topics
+        self.on_logs = on_logs
+        self.on_connect = on_connect
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.connected = False
+
+    async def run(self):
+        delay = self.reconnect_delay
+        while True:
+            try:
+                async with AsyncWeb3(WebSocketProvider(self.ws_url)) as w3:
+                    await w3.eth.subscribe('logs', {'address': self.address, 'topics': [self.topics]})
+                    self.connected = True
+                    delay = self.reconnect_delay
+                    logger.info('Subscribed to Marketplace logs on %s', self.name)
+                    self.on_connect()
+
+                    async for message in w3.socket.process_subscriptions():
+                        self.on_logs([message['result']])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning('Log subscription lost, reconnecting in %ss: %s', delay, e)
+            finally:
+                self.connected = False
+
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.max_reconnect_delay)
+
+    def start_thread(self) -> threading.Thread:
+        """Runs the stream on its own event loop in a daemon thread."""
+        thread = threading.Thread(target=asyncio.run, args=(self.run(),), name='log-stream', daemon=True)
+        thread.start()
+        return thread
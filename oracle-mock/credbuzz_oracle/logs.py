@@ -0,0 +1,86 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+import time
+
+# attributes every LogRecord has, anything else was passed through `extra`
+RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'taskName'}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line; `extra` fields become top-level keys."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': round(record.created, 3),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        entry.update((key, value) for key, value in vars(record).items() if key not in RECORD_ATTRS)
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps one record per `sample` key every `interval` seconds.
+
+    Records logged with `extra={'sample': key}` are repetitive by nature;
+    the first one of an interval goes through carrying the number of
+    records suppressed since the previous one, the rest are dropped before
+    they are formatted or queued.
+    """
+
+    def __init__(self, interval: float = 60):
+        super().__init__()
+        self.interval = interval
+        self._seen = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        key = getattr(record, 'sample', None)
+        if key is None:
+            return True
+        now = time.monotonic()
+        with self._lock:
+            emitted_at, suppressed = self._seen.get(key, (None, 0))
+            if emitted_at is not None and now - emitted_at < self.interval:
+                self._seen[key] = (emitted_at, suppressed + 1)
+                return False
+            self._seen[key] = (now, 0)
+        record.suppressed = suppressed
+        return True
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """Queues the record untouched so message formatting happens on the
+    listener thread instead of the caller's."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def setup_logging(level: str = 'INFO', sample_interval: float = 60):
+    """Routes every logger through a queue to one JSON stdout writer thread."""
+    log_queue = queue.SimpleQueue()
+    handler = DeferredQueueHandler(log_queue)
+    handler.addFilter(SamplingFilter(sample_interval))
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(JsonFormatter())
+    listener = logging.handlers.QueueListener(log_queue, stream_handler)
+    listener.start()
+    atexit.register(listener.stop)
+
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(level.upper())
+    # web3 and urllib3 debug output would drown the oracle's own records
+    for noisy in ('web3', 'urllib3', 'websockets', 'asyncio'):
+        logging.getLogger(noisy).setLevel(max(root.level, logging.INFO))
+    return listener
@@ -0,0 +1,90 @@
+import logging
+import time
+
+from prometheus_client import Counter, Gauge, Histogram, start_http_server
+from web3.middleware import Web3Middleware
+
+logger = logging.getLogger(__name__)
+
+RPC_LATENCY = Histogram(
+    'oracle_rpc_latency_seconds', 'JSON-RPC round trip by method', ['method'],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+SWEEP_DURATION = Histogram(
+    'oracle_sweep_duration_seconds', 'Duration of one campaign sweep',
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+SUBMIT_TO_RECEIPT = Histogram(
+    'oracle_submit_to_receipt_seconds', 'Time from first broadcast of a nonce to its receipt',
+    buckets=(1, 2, 4, 8, 15, 30, 60, 120, 300, 600),
+)
+DISCARDS = Counter('oracle_discards_total', 'Campaigns discarded on chain', ['campaign_type'])
+DISCARD_REVERTS = Counter('oracle_discard_reverts_total', 'Discard transactions that reverted', ['campaign_type'])
+DISCARD_PREFLIGHT_REJECTS = Counter(
+    'oracle_discard_preflight_rejects_total', 'Planned discards dropped as their simulation reverted',
+    ['campaign_type', 'error'],
+)
+RPC_ENDPOINT_ERRORS = Counter('oracle_rpc_endpoint_errors_total', 'Failed requests by RPC endpoint', ['endpoint'])
+CACHE_HITS = Counter('oracle_cache_hits_total', 'Reads answered from a local cache', ['cache'])
+CACHE_MISSES = Counter('oracle_cache_misses_total', 'Reads that had to go to the chain', ['cache'])
+BACKEND_FAILURES = Counter('oracle_backend_failures_total', 'Campaign updates the backend never accepted')
+PENDING_NONCES = Gauge('oracle_pending_nonces', 'Transactions sent and not yet mined')
+CAMPAIGNS_TRACKED = Gauge('oracle_campaigns_tracked', 'Ongoing campaigns in the index')
+
+
+class RpcMetricsMiddleware(Web3Middleware):
+    """Observes the latency of every request into RPC_LATENCY, batches as `batch`."""
+
+    def wrap_make_request(self, make_request):
+        def middleware(method, params):
+            start = time.perf_counter()
+            try:
+                return make_request(method, params)
+            finally:
+                RPC_LATENCY.labels(method).observe(time.perf_counter() - start)
+
+        return middleware
+
+    def wrap_make_batch_request(self, make_batch_request):
+        def middleware(requests_info):
+            start = time.perf_counter()
+            try:
+                return make_batch_request(requests_info)
+            finally:
+                RPC_LATENCY.labels('batch').observe(time.perf_counter() - start)
+
+        return middleware
+
+    async def async_wrap_make_request(self, make_request):
+        async def middleware(method, params):
+            start = time.perf_counter()
+            try:
+                return await make_request(method, params)
+            finally:
+                RPC_LATENCY.labels(method).observe(time.perf_counter() - start)
+
+        return middleware
+
+    async def async_wrap_make_batch_request(self, make_batch_request):
+        async def middleware(requests_info):
+            start = time.perf_counter()
+            try:
+                return await make_batch_request(requests_info)
+            finally:
+                RPC_LATENCY.labels('batch').observe(time.perf_counter() - start)
+
+        return middleware
+
+
+def instrument(w3, nonce_manager, campaign_index):
+    """Times every RPC of `w3` and reads the gauges from the oracle state on
+    scrape; shard workers sign nothing and pass no `nonce_manager`."""
+    w3.middleware_onion.add(RpcMetricsMiddleware, 'rpc_metrics')
+    if nonce_manager is not None:
+        PENDING_NONCES.set_function(lambda: len(nonce_manager.pending))
+    CAMPAIGNS_TRACKED.set_function(lambda: len(campaign_index.campaigns))
+
+
+def serve(port: int, addr: str = '127.0.0.1'):
+    start_http_server(port, addr=addr)
+    logger.info('Serving metrics on http://%s:%d/metrics', addr, port)
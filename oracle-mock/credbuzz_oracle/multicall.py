@@ -0,0 +1,219 @@
+import asyncio
+
+from web3 import Web3
+from web3.exceptions import ContractLogicError
+
+# Multicall3 is deployed at the same address on Base and most EVM chains
+MULTICALL3_ADDRESS = '0xcA11bde05977b3631167028862bE2a173976CA11'
+
+MULTICALL3_ABI = [
+    {
+        'inputs': [
+            {
+                'components': [
+                    {'internalType': 'address', 'name': 'target', 'type': 'address'},
+                    {'internalType': 'bool', 'name': 'allowFailure', 'type': 'bool'},
+                    {'internalType': 'bytes', 'name': 'callData', 'type': 'bytes'},
+                ],
+                'internalType': 'struct Multicall3.Call3[]',
+                'name': 'calls',
+                'type': 'tuple[]',
+            }
+        ],
+        'name': 'aggregate3',
+        'outputs': [
+            {
+                'components': [
+                    {'internalType': 'bool', 'name': 'success', 'type': 'bool'},
+                    {'internalType': 'bytes', 'name': 'returnData', 'type': 'bytes'},
+                ],
+                'internalType': 'struct Multicall3.Result[]',
+                'name': 'returnData',
+                'type': 'tuple[]',
+            }
+        ],
+        'stateMutability': 'payable',
+        'type': 'function',
+    }
+]
+
+# Every aggregate3 result is (bool success, bytes returnData): a tuple offset,
+# the success word, the bytes offset and the bytes length before the payload
+RESULT_OVERHEAD_BYTES = 4 * 32
+# Used for outputs whose encoded size cannot be known up front
+DYNAMIC_OUTPUT_BYTES = 8 * 32
+
+
+def _output_size(outputs: list) -> int:
+    size = 0
+    for output in outputs:
+        output_type = output['type']
+        if output_type == 'tuple':
+            size += _output_size(output['components'])
+        elif output_type in ('bytes', 'string') or output_type.endswith('[]'):
+            size += DYNAMIC_OUTPUT_BYTES
+        else:
+            size += 32
+    return size
+
+
+def _abi_type(output: dict) -> str:
+    if output['type'].startswith('tuple'):
+        components = ','.join(_abi_type(c) for c in output['components'])
+        return f"({components}){output['type'][len('tuple'):]}"
+    return output['type']
+
+
+def abi_output_types(fn_abi: dict) -> list:
+    return [_abi_type(output) for output in fn_abi['outputs']]
+
+
+class MulticallReader:
+    """Packs many view calls into Multicall3 aggregate3 eth_calls.
+
+    Batches are cut so that the call count, the estimated gas and the
+    estimated response size all stay under their limits. A batch the node
+    still rejects is bisected until it goes through.
+    """
+
+    def __init__(self, w3: Web3, address: str = MULTICALL3_ADDRESS,
+                 max_batch_size: int = 500, max_batch_gas: int = 25_000_000,
+                 gas_per_call: int = 25_000, max_response_bytes: int = 1_000_000):
+        self.w3 = w3
+        self.multicall = w3.eth.contract(address=Web3.to_checksum_address(address), abi=MULTICALL3_ABI)
+        self.max_batch_size = max_batch_size
+        self.max_batch_gas = max_batch_gas
+        self.gas_per_call = gas_per_call
+        self.max_response_bytes = max_response_bytes
+        self._available = None
+
+    def is_available(self) -> bool:
+        # Local nodes usually don't have Multicall3, fall back to plain eth_calls there
+        if self._available is None:
+            self._available = len(self.w3.eth.get_code(self.multicall.address)) > 0
+        return self._available
+
+    def read(self, contract, fn_name: str, args_list: list) -> list:
+        """Calls `fn_name` once per entry of `args_list` and returns the decoded
+        results in the same order, with None for calls that reverted."""
+        return self.aggregate([(contract, fn_name, args) for args in args_list])
+
+    def aggregate(self, calls: list) -> list:
+        """Executes (contract, fn_name, args) calls and returns the decoded
+        results in input order, with None for calls that reverted."""
+        if not calls:
+            return []
+
+        prepared = [self._prepare(contract, fn_name, args) for contract, fn_name, args in calls]
+        if not self.is_available():
+            return [self._call_single(call) for call in prepared]
+
+        results = []
+        for batch in self._split(prepared):
+            results.extend(self._execute(batch))
+        return results
+
+    def _prepare(self, contract, fn_name: str, args) -> dict:
+        fn_abi = contract.get_function_by_name(fn_name).abi
+        return {
+            'target': contract.address,
+            'call_data': contract.encode_abi(fn_name, args=list(args)),
+            'output_types': abi_output_types(fn_abi),
+            'response_bytes': RESULT_OVERHEAD_BYTES + _output_size(fn_abi['outputs']),
+        }
+
+    def _split(self, prepared: list):
+        batch, batch_gas, batch_bytes = [], 0, 0
+        for call in prepared:
+            if batch and (len(batch) >= self.max_batch_size
+                          or batch_gas + self.gas_per_call > self.max_batch_gas
+                          or batch_bytes + call['response_bytes'] > self.max_response_bytes):
+                yield batch
+                batch, batch_gas, batch_bytes = [], 0, 0
+            batch.append(call)
+            batch_gas += self.gas_per_call
+            batch_bytes += call['response_bytes']
+        if batch:
+            yield batch
+
+    def _execute(self, batch: list) -> list:
+        try:
+            raw_results = self.multicall.functions.aggregate3(
+                [(call['target'], True, call['call_data']) for call in batch]
+            ).call()
+        except Exception:
+            # Out of gas or a response too large for the node: halve and retry
+            if len(batch) == 1:
+                return [self._call_single(batch[0])]
+            middle = len(batch) // 2
+            return self._execute(batch[:middle]) + self._execute(batch[middle:])
+
+        return [
+            self._decode(call, return_data) if success else None
+            for call, (success, return_data) in zip(batch, raw_results)
+        ]
+
+    def _call_single(self, call: dict):
+        try:
+            return_data = self.w3.eth.call({'to': call['target'], 'data': call['call_data']})
+        except ContractLogicError:
+            return None
+        return self._decode(call, return_data)
+
+    def _decode(self, call: dict, return_data: bytes):
+        decoded = self.w3.codec.decode(call['output_types'], return_data)
+        return decoded[0] if len(decoded) == 1 else decoded
+
+
+class AsyncMulticallReader(MulticallReader):
+    """MulticallReader for AsyncWeb3. Batches are sent concurrently, at most
+    `max_concurrency` at a time."""
+
+    def __init__(self, w3, address: str = MULTICALL3_ADDRESS, max_concurrency: int = 8, **kwargs):
+        super().__init__(w3, address, **kwargs)
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def is_available(self) -> bool:
+        if self._available is None:
+            self._available = len(await self.w3.eth.get_code(self.multicall.address)) > 0
+        return self._available
+
+    async def read(self, contract, fn_name: str, args_list: list) -> list:
+        return await self.aggregate([(contract, fn_name, args) for args in args_list])
+
+    async def aggregate(self, calls: list) -> list:
+        if not calls:
+            return []
+
+        prepared = [self._prepare(contract, fn_name, args) for contract, fn_name, args in calls]
+        if not await self.is_available():
+            return list(await asyncio.gather(*(self._call_single(call) for call in prepared)))
+
+        batches = await asyncio.gather(*(self._execute(batch) for batch in self._split(prepared)))
+        return [result for batch in batches for result in batch]
+
+    async def _execute(self, batch: list) -> list:
+        try:
+            async with self._semaphore:
+                raw_results = await self.multicall.functions.aggregate3(
+                    [(call['target'], True, call['call_data']) for call in batch]
+                ).call()
+        except Exception:
+            if len(batch) == 1:
+                return [await self._call_single(batch[0])]
+            middle = len(batch) // 2
+            left, right = await asyncio.gather(self._execute(batch[:middle]), self._execute(batch[middle:]))
+            return left + right
+
+        return [
+            self._decode(call, return_data) if success else None
+            for call, (success, return_data) in zip(batch, raw_results)
+        ]
+
+    async def _call_single(self, call: dict):
+        try:
+            async with self._semaphore:
+                return_data = await self.w3.eth.call({'to': call['target'], 'data': call['call_data']})
+        except ContractLogicError:
+            return None
+        return self._decode(call, return_data)
@@ -0,0 +1,200 @@
+import asyncio
+import heapq
+import threading
+import time
+
+from web3 import Web3
+from web3.exceptions import TransactionNotFound
+
+from .metrics import SUBMIT_TO_RECEIPT
+
+
+class NonceManager:
+    """Hands out owner nonces locally so transactions can be pipelined.
+
+    The pending nonce is fetched once; after that nonces are allocated from a
+    local counter. Nonces whose transaction never reached the node are
+    released and handed out again first, so a failed send doesn't leave a gap
+    that blocks every later transaction. `resync` reconciles the local view
+    with the chain after errors or dropped transactions; nonces allocated but
+    not yet `sent` or released stay reserved through it. `pending` maps each
+    nonce in flight to the hashes sent with it, replacements last.
+
+    With a `checkpoint` store the in-flight transactions survive restarts.
+    """
+
+    def __init__(self, w3: Web3, address: str, checkpoint=None):
+        self.w3 = w3
+        self.address = address
+        self.checkpoint = checkpoint
+        self.pending = {}
+        self._sent_at = {}
+        self._next_nonce = None
+        self._free = []
+        self._reserved = set()
+        self._lock = threading.Lock()
+
+    def allocate(self) -> int:
+        with self._lock:
+            if self._next_nonce is None and not self._free:
+                self._next_nonce = self.w3.eth.get_transaction_count(self.address, 'pending')
+            return self._reserve()
+
+    def _reserve(self) -> int:
+        if self._free:
+            nonce = heapq.heappop(self._free)
+        else:
+            # a reset may restart the counter below nonces still being signed
+            while self._next_nonce in self._reserved:
+                self._next_nonce += 1
+            nonce = self._next_nonce
+            self._next_nonce += 1
+        self._reserved.add(nonce)
+        return nonce
+
+    def reset(self):
+        """Drops the local counter so the next nonce comes from the chain,
+        e.g. after another replica may have used the account."""
+        with self._lock:
+            self._next_nonce = None
+            self._free = []
+
+    def restore(self) -> list:
+        """Reloads the checkpointed in-flight transactions as (nonce, tx_hashes, keys),
+        `tx_hashes` being the transaction sent with the nonce and its replacements."""
+        if self.checkpoint is None:
+            return []
+        in_flight = self.checkpoint.load_pending()
+        with self._lock:
+            for nonce, tx_hashes, _ in in_flight:
+                self.pending[nonce] = list(tx_hashes)
+        return in_flight
+
+    def sent(self, nonce: int, tx_hash, keys: list = None):
+        with self._lock:
+            self.pending.setdefault(nonce, []).append(tx_hash)
+            self._reserved.discard(nonce)
+            # replacements keep the time of the first broadcast
+            self._sent_at.setdefault(nonce, time.time())
+        if self.checkpoint is not None:
+            self.checkpoint.add_pending(nonce, tx_hash, keys)
+
+    def release(self, nonce: int):
+        """Gives back a nonce whose transaction was never broadcast."""
+        with self._lock:
+            self._reserved.discard(nonce)
+            heapq.heappush(self._free, nonce)
+
+    def confirmed(self, nonce: int):
+        with self._lock:
+            self.pending.pop(nonce, None)
+            sent_at = self._sent_at.pop(nonce, None)
+        if sent_at is not None:
+            SUBMIT_TO_RECEIPT.observe(time.time() - sent_at)
+        if self.checkpoint is not None:
+            self.checkpoint.remove_pending([nonce])
+
+    def resync(self) -> list:
+        """Re-reads the account nonce, forgets mined and dropped transactions
+        and marks every unused nonce below the local counter as free again,
+        except those held by transactions in the node's pool that this
+        manager didn't send. Returns the last hash of every nonce whose
+        transaction was dropped, or whose nonce was mined without any of its
+        hashes, e.g. by a previous leader or a manual send."""
+        with self._lock:
+            chain_nonce = self.w3.eth.get_transaction_count(self.address, 'latest')
+            pool_nonce = self.w3.eth.get_transaction_count(self.address, 'pending')
+            dropped = []
+            for nonce, tx_hashes in self.pending.items():
+                if nonce >= chain_nonce:
+                    if self._is_dropped(tx_hashes[-1]):
+                        dropped.append(tx_hashes[-1])
+                elif not self._any_mined(tx_hashes):
+                    dropped.append(tx_hashes[-1])
+            self._reconcile(chain_nonce, dropped, pool_nonce)
+            return dropped
+
+    def _reconcile(self, chain_nonce: int, dropped: list, pool_nonce: int = None):
+        settled = [
+            nonce for nonce, tx_hashes in self.pending.items()
+            if nonce < chain_nonce or tx_hashes[-1] in dropped
+        ]
+        for nonce in settled:
+            del self.pending[nonce]
+            self._sent_at.pop(nonce, None)
+        if self.checkpoint is not None:
+            self.checkpoint.remove_pending(settled)
+
+        # nonces below the pool's count are all taken by pooled transactions, ours or not
+        first_free = max(chain_nonce, pool_nonce or 0)
+        in_use = self.pending.keys() | self._reserved
+        in_flight = max(in_use) + 1 if in_use else first_free
+        self._next_nonce = max(first_free, in_flight)
+        self._free = [
+            nonce for nonce in range(first_free, self._next_nonce)
+            if nonce not in self.pending and nonce not in self._reserved
+        ]
+        heapq.heapify(self._free)
+
+    def _is_dropped(self, tx_hash) -> bool:
+        try:
+            self.w3.eth.get_transaction(tx_hash)
+            return False
+        except TransactionNotFound:
+            return True
+
+    def _any_mined(self, tx_hashes: list) -> bool:
+        # the latest replacement is the likeliest to have been mined
+        for tx_hash in reversed(tx_hashes):
+            try:
+                self.w3.eth.get_transaction_receipt(tx_hash)
+                return True
+            except TransactionNotFound:
+                pass
+        return False
+
+
+class AsyncNonceManager(NonceManager):
+    """NonceManager for AsyncWeb3; `allocate` and `resync` are coroutines."""
+
+    def __init__(self, w3, address: str, checkpoint=None):
+        super().__init__(w3, address, checkpoint)
+        self._async_lock = asyncio.Lock()
+
+    async def allocate(self) -> int:
+        async with self._async_lock:
+            if self._next_nonce is None and not self._free:
+                self._next_nonce = await self.w3.eth.get_transaction_count(self.address, 'pending')
+            with self._lock:
+                return self._reserve()
+
+    async def resync(self) -> list:
+        async with self._async_lock:
+            chain_nonce = await self.w3.eth.get_transaction_count(self.address, 'latest')
+            pool_nonce = await self.w3.eth.get_transaction_count(self.address, 'pending')
+            dropped = []
+            for nonce, tx_hashes in list(self.pending.items()):
+                if nonce >= chain_nonce:
+                    if await self._is_dropped(tx_hashes[-1]):
+                        dropped.append(tx_hashes[-1])
+                elif not await self._any_mined(tx_hashes):
+                    dropped.append(tx_hashes[-1])
+            with self._lock:
+                self._reconcile(chain_nonce, dropped, pool_nonce)
+            return dropped
+
+    async def _is_dropped(self, tx_hash) -> bool:
+        try:
+            await self.w3.eth.get_transaction(tx_hash)
+            return False
+        except TransactionNotFound:
+            return True
+
+    async def _any_mined(self, tx_hashes: list) -> bool:
+        for tx_hash in reversed(tx_hashes):
+            try:
+                await self.w3.eth.get_transaction_receipt(tx_hash)
+                return True
+            except TransactionNotFound:
+                pass
+        return False
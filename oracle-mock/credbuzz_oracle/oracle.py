@@ -0,0 +1,682 @@
+"""The discard oracle as an object, built from a config.OracleConfig.
+
+Importing this module only pulls the standard library. Providers,
+contracts, the signer and every other component are built the first time
+they are used, so an Oracle is cheap to create and components a caller
+never touches are never built; `python -X importtime -c "import credbuzz_oracle"`
+keeps it honest. app.py is the command line entry point around it.
+"""
+import json
+import logging
+import time
+from functools import cached_property
+
+logger = logging.getLogger(__name__)
+
+
+def _hex(value: bytes) -> str:
+    return '0x' + bytes(value).hex()
+
+
+class Oracle:
+    """Discards Marketplace campaigns once their offer ends.
+
+    `sweep_once` runs one pass over the index and the due deadlines, `start`
+    launches the background threads a long-running oracle needs and `run`
+    does both forever. `clock` stands in for time.time where deadlines are
+    compared, the benchmark makes it follow the chain. `request_reload`
+    has `run` swap in the config returned by `config_loader` between
+    sweeps, None when the new one is invalid. async_oracle.AsyncOracle
+    takes the same decisions with asyncio I/O.
+    """
+
+    def __init__(self, config, clock=time.time, config_loader=None):
+        self.config = config
+        self.clock = clock
+        self.config_loader = config_loader
+        # campaign key -> nonce of its in-flight discard transaction
+        self.pending_discards = {}
+        self._reload_requested = False
+
+    @cached_property
+    def w3(self):
+        from web3 import Web3
+
+        from .rpc_pool import PooledHTTPProvider
+
+        # reads go to the fastest healthy endpoint
+        return Web3(PooledHTTPProvider(self.config.rpc_urls, write_mode=self.config.rpc_write_mode))
+
+    @cached_property
+    def marketplace_abi(self) -> list:
+        return self._load_abi(self.config.marketplace_abi_path)
+
+    @cached_property
+    def marketplace_contract(self):
+        return self.w3.eth.contract(address=self.config.marketplace_address, abi=self.marketplace_abi)
+
+    @cached_property
+    def usdc_contract(self):
+        return self.w3.eth.contract(address=self.config.usdc_address, abi=self._load_abi(self.config.usdc_abi_path))
+
+    @cached_property
+    def owner(self):
+        from eth_account import Account
+
+        return Account.from_key(self.config.private_key.get_secret_value())
+
+    @cached_property
+    def chain_id(self) -> int:
+        return self.w3.eth.chain_id
+
+    @property
+    def multicall_address(self) -> str:
+        from .multicall import MULTICALL3_ADDRESS
+
+        return self.config.multicall_address or MULTICALL3_ADDRESS
+
+    @property
+    def discard_batch_gas(self) -> int:
+        from .discards import DISCARD_BATCH_GAS_LIMIT
+
+        # expired campaigns are discarded in batches bounded by this much gas
+        return self.config.discard_batch_gas or DISCARD_BATCH_GAS_LIMIT
+
+    @cached_property
+    def batch_discard(self) -> bool:
+        return self.check_batch_discard(self.w3.eth.get_code(self.marketplace_contract.address))
+
+    def check_batch_discard(self, code) -> bool:
+        from .discards import supports_batch_discard
+
+        supported = supports_batch_discard(self.marketplace_contract, code)
+        if not supported:
+            logger.warning('Marketplace has no batch discard functions, discarding one campaign per transaction')
+        return supported
+
+    @cached_property
+    def multicall_reader(self):
+        from .multicall import MulticallReader
+
+        # batches campaign reads into Multicall3 aggregate calls
+        return MulticallReader(self.w3, self.multicall_address)
+
+    @cached_property
+    def checkpoint_store(self):
+        from .checkpoint import CheckpointStore
+
+        # last processed block, ongoing campaigns and in-flight discards survive restarts
+        return CheckpointStore(self.config.checkpoint_path, self.config.marketplace_address)
+
+    @cached_property
+    def marketplace_campaigns(self):
+        from .campaigns import MarketplaceCampaigns
+
+        # typed reads of the bytes32 campaign getters, records cached until their logs change them
+        return MarketplaceCampaigns(self.marketplace_contract, self.multicall_reader,
+                                    cache_size=self.config.campaign_cache_size)
+
+    @cached_property
+    def token_metadata(self):
+        from .tokens import TokenMetadata
+
+        # symbol and decimals of campaign tokens, read once per token
+        return TokenMetadata(self.w3, self.multicall_reader, cache_size=self.config.token_cache_size)
+
+    @cached_property
+    def campaign_index(self):
+        from .campaign_index import CampaignIndex
+
+        # ongoing campaigns, bootstrapped once and then kept current from contract logs
+        return CampaignIndex(self.w3, self.marketplace_campaigns, checkpoint=self.checkpoint_store)
+
+    @cached_property
+    def deadline_scheduler(self):
+        from .scheduler import DeadlineScheduler
+
+        # wakes the main loop exactly when the next campaign offer ends
+        return DeadlineScheduler()
+
+    @cached_property
+    def retry_policy(self):
+        from .outcomes import RetryPolicy
+
+        # failed campaigns are retried after a delay picked by the kind of failure,
+        # transient ones back off from retry_delay seconds up to retry_max_delay
+        return RetryPolicy(backoff=self.config.retry_delay, max_delay=self.config.retry_max_delay)
+
+    @cached_property
+    def nonce_manager(self):
+        from .nonce_manager import NonceManager
+
+        # owner nonces are handed out locally so discards can be sent back-to-back
+        return NonceManager(self.w3, self.owner.address, self.checkpoint_store)
+
+    @cached_property
+    def fee_oracle(self):
+        from .fee_oracle import FeeOracle
+
+        # EIP-1559 fees cached per block and memoized gas estimates
+        return FeeOracle(self.w3, max_fee_per_gas=self.config.max_fee_per_gas)
+
+    @cached_property
+    def discard_preflight(self):
+        from .discards import DiscardPreflight
+
+        # planned discards are simulated against the pending block, ids that would revert stay out of the batch
+        return DiscardPreflight(self.w3, self.marketplace_contract, self.owner.address,
+                                max_batch_size=self.config.preflight_batch_size)
+
+    @cached_property
+    def receipt_tracker(self):
+        from .receipt_tracker import ReceiptTracker
+
+        # one poller resolves the receipts of every in-flight transaction off the sweep, block by block
+        return ReceiptTracker(self.w3, poll_interval=self.config.receipt_poll_interval,
+                              max_batch_blocks=self.config.receipt_batch_blocks)
+
+    @cached_property
+    def backend_notifier(self):
+        from .backend import BackendNotifier
+
+        # coalesces status updates and posts them in batches over pooled keep-alive connections
+        return BackendNotifier(
+            self.config.backend_url,
+            workers=self.config.backend_workers,
+            read_timeout=self.config.backend_timeout,
+            batch_window=self.config.backend_batch_window,
+        )
+
+    @cached_property
+    def leader_elector(self):
+        if not self.config.leader_lease_path:
+            return None
+        from .leader import LeaderElector, SqliteLease
+
+        # redundant replicas share one owner account: only the lease holder
+        # sends transactions, standbys keep their index warm
+        return LeaderElector(SqliteLease(self.config.leader_lease_path), ttl=self.config.leader_lease_ttl,
+                             on_elected=self.on_elected)
+
+    @cached_property
+    def log_stream(self):
+        if not self.config.ws_url:
+            return None
+        from .log_stream import LogStream
+
+        # pushes Marketplace logs into the index as they happen, polling is the fallback
+        return LogStream(self.config.ws_url, self.config.marketplace_address, self.campaign_index.topics,
+                         self.on_streamed_logs, self.on_stream_connect)
+
+    def _load_abi(self, path: str) -> list:
+        try:
+            with open(path) as f:
+                return json.load(f)['abi']
+        except FileNotFoundError as e:
+            raise FileNotFoundError(f"ABI file not found: {e}")
+
+    def instrument(self):
+        """RPC latency per method plus backlog gauges for the metrics endpoint."""
+        from .metrics import instrument
+
+        instrument(self.w3, self.nonce_manager, self.campaign_index)
+
+    def on_elected(self):
+        # the previous leader may have used nonces our counter doesn't know about
+        self.nonce_manager.reset()
+        self.deadline_scheduler.wake()
+
+    def is_leader(self) -> bool:
+        return self.leader_elector is None or self.leader_elector.is_leader
+
+    def on_streamed_logs(self, logs: list):
+        self.campaign_index.ingest(logs)
+        self.deadline_scheduler.wake()
+
+    def on_stream_connect(self):
+        # cover the blocks we may have missed while disconnected
+        self.campaign_index.request_backfill()
+        self.deadline_scheduler.wake()
+
+    def discard_campaign(self, campaign_id: str):
+        if not self.backend_notifier.notify(campaign_id, 'discarded'):
+            raise Exception(f"Error discarding campaign {campaign_id}: backend queue is full")
+
+    def handle_campaign(self, campaign_type: str, campaign_id: bytes, campaign) -> bool:
+        """Returns True when the campaign offer ended and it should be discarded."""
+        from .campaigns import CampaignStatus
+        from .outcomes import classify
+
+        try:
+            if campaign is None:
+                logger.warning('Campaign %s not found', _hex(campaign_id))
+                return False
+
+            # extract data
+            offer_time = campaign.offer_ends_in
+
+            if campaign.campaign_status == CampaignStatus.ONGOING:
+                # check for the offer time and current time
+                current_time = int(self.clock())
+
+                if current_time > offer_time:
+                    if (campaign_type, campaign_id) in self.pending_discards:
+                        logger.debug('Discard already in flight for campaign %s', _hex(campaign_id))
+                        return False
+
+                    # discarded with the other expired campaigns of the sweep
+                    return True
+                else:
+                    logger.info('Offer time not ended for campaign', extra={
+                        'sample': 'offer-not-ended', 'campaign_id': _hex(campaign_id),
+                        'offer_ends_in': offer_time, 'now': current_time,
+                    })
+                    self.deadline_scheduler.schedule((campaign_type, campaign_id), offer_time + 1)
+
+        except Exception as e:
+            self.retry_campaigns(campaign_type, [campaign_id], classify(e))
+            logger.error('Error handling campaign %s: %s', _hex(campaign_id), e, extra={'campaign': campaign})
+        return False
+
+    def discard_expired(self, campaign_type: str, campaign_ids: list):
+        campaign_ids = self.preflight_discards(campaign_type, campaign_ids)
+        if not campaign_ids:
+            return
+        try:
+            self.send_discard(campaign_type, campaign_ids)
+        except Exception as e:
+            self.discard_failed(campaign_type, campaign_ids, e)
+            return
+        logger.info('Sent discard of %d %s campaigns as offer time ended', len(campaign_ids), campaign_type)
+
+    def discard_failed(self, campaign_type: str, campaign_ids: list, error: Exception):
+        """Schedules the retry of a discard that could not be sent or settled."""
+        from .outcomes import classify
+
+        category = classify(error, self.discard_preflight.errors)
+        for campaign_id in campaign_ids:
+            self.pending_discards.pop((campaign_type, campaign_id), None)
+        self.retry_campaigns(campaign_type, campaign_ids, category)
+        logger.error('Error discarding %d %s campaigns: %s', len(campaign_ids), campaign_type, error,
+                     extra={'outcome': category})
+
+    def retry_campaigns(self, campaign_type: str, campaign_ids: list, category: str):
+        """Schedules the next attempt of each campaign, terminal ones leave the index."""
+        for campaign_id in campaign_ids:
+            key = (campaign_type, campaign_id)
+            delay = self.retry_policy.delay(key, category)
+            if delay is None:
+                self.campaign_index.remove(key)
+                self.deadline_scheduler.cancel(key)
+            else:
+                self.deadline_scheduler.schedule(key, self.clock() + delay)
+
+    def preflight_discards(self, campaign_type: str, campaign_ids: list) -> list:
+        """Drops the ids whose discard would revert, settled campaigns leave the index."""
+        campaign_ids, rejected = self.discard_preflight.check(campaign_type, campaign_ids)
+        self.skip_rejected(campaign_type, rejected)
+        return campaign_ids
+
+    def skip_rejected(self, campaign_type: str, rejected: dict):
+        """Retries or drops the campaigns whose discard preflight failed, by revert error."""
+        from .metrics import DISCARD_PREFLIGHT_REJECTS
+        from .outcomes import classify_revert
+
+        for campaign_id, error in rejected.items():
+            DISCARD_PREFLIGHT_REJECTS.labels(campaign_type, error).inc()
+            self.pending_discards.pop((campaign_type, campaign_id), None)
+            self.retry_campaigns(campaign_type, [campaign_id], classify_revert(error))
+            logger.debug('Skipping discard of campaign %s: %s', _hex(campaign_id), error)
+        if rejected:
+            logger.warning('Skipped %d %s discards that would revert', len(rejected), campaign_type,
+                           extra={'errors': sorted(set(rejected.values()))})
+
+    def discard_batches(self, campaign_ids: list) -> list:
+        """Splits `campaign_ids` into the id lists of one discard transaction each."""
+        from .discards import chunk_discards
+
+        # the batch functions are only looked up once there is something to discard
+        if not campaign_ids:
+            return []
+        if not self.batch_discard:
+            return [[campaign_id] for campaign_id in campaign_ids]
+        return chunk_discards(campaign_ids, self.discard_batch_gas)
+
+    def discard_call(self, campaign_type: str, campaign_ids: list):
+        """The batch discard of `campaign_ids`, or the single discard when the
+        Marketplace has no batch functions and `discard_batches` sent one id."""
+        from .campaigns import BATCH_DISCARD_FNS, DISCARD_FNS
+
+        if self.batch_discard:
+            return self.marketplace_contract.functions[BATCH_DISCARD_FNS[campaign_type]](campaign_ids)
+        campaign_id, = campaign_ids
+        return self.marketplace_contract.functions[DISCARD_FNS[campaign_type]](campaign_id)
+
+    def send_discard(self, campaign_type: str, campaign_ids: list):
+        from .discards import DISCARD_BASE_GAS
+        from .outcomes import RETRY_NEW_NONCE, classify
+
+        if not self.is_leader():
+            raise Exception("Not sending, another replica holds the leader lease")
+        keys = [(campaign_type, campaign_id) for campaign_id in campaign_ids]
+        owner = self.owner.address
+        nonce = self.nonce_manager.allocate()
+        try:
+            discard_call = self.discard_call(campaign_type, campaign_ids)
+            discard_txn = discard_call.build_transaction({
+                'from': owner, 'nonce': nonce, 'chainId': self.chain_id,
+                'gas': self.fee_oracle.gas(discard_call, campaign_type, len(campaign_ids), owner, DISCARD_BASE_GAS),
+                **self.fee_oracle.fees()
+            })
+            tx_hash = self.sign_and_send_txn(discard_txn)
+        except Exception as e:
+            self.nonce_manager.release(nonce)
+            if classify(e) == RETRY_NEW_NONCE:
+                # the nonce is used or held by a transaction we did not send
+                self.nonce_manager.resync()
+            raise
+
+        self.nonce_manager.sent(nonce, tx_hash, keys)
+        for key in keys:
+            self.pending_discards[key] = nonce
+        self.track_discard(campaign_type, campaign_ids, nonce, [tx_hash])
+
+    def track_discard(self, campaign_type: str, campaign_ids: list, nonce: int, tx_hashes: list):
+        """`tx_hashes` are the transaction sent with `nonce` and its replacements, any of them may get mined."""
+        future = self.receipt_tracker.track(tx_hashes, self.config.receipt_timeout)
+        future.add_done_callback(lambda f: self.on_discard_receipt(campaign_type, campaign_ids, nonce, tx_hashes, f))
+
+    def on_discard_stuck(self, campaign_type: str, campaign_ids: list, nonce: int, tx_hashes: list):
+        if tx_hashes[-1] in self.nonce_manager.resync():
+            self.discard_dropped(campaign_type, campaign_ids)
+            return
+
+        if not self.is_leader():
+            # the new leader owns the account now, just wait for the receipt
+            self.track_discard(campaign_type, campaign_ids, nonce, tx_hashes)
+            return
+
+        try:
+            tx_hashes = tx_hashes + [self.replace_discard(campaign_type, campaign_ids, nonce, tx_hashes[-1])]
+        except Exception as e:
+            if self.replacement_failed(tx_hashes[-1], e) and tx_hashes[-1] in self.nonce_manager.resync():
+                self.discard_dropped(campaign_type, campaign_ids)
+                return
+        self.track_discard(campaign_type, campaign_ids, nonce, tx_hashes)
+
+    def replacement_failed(self, tx_hash, error: Exception) -> bool:
+        """Logs a failed fee bump of `tx_hash`. Returns True when its nonce was
+        mined meanwhile, by one of our transactions or another sender's; other
+        failures leave the stuck transaction to be bumped again."""
+        from .outcomes import RETRY_NEW_NONCE, classify
+
+        category = classify(error, self.discard_preflight.errors, replacement=True)
+        logger.error('Error replacing discard transaction %s: %s', _hex(tx_hash), error, extra={'outcome': category})
+        return category == RETRY_NEW_NONCE
+
+    def replace_discard(self, campaign_type: str, campaign_ids: list, nonce: int, tx_hash):
+        stuck_txn = self.w3.eth.get_transaction(tx_hash)
+        discard_txn = self.discard_call(campaign_type, campaign_ids).build_transaction({
+            'from': self.owner.address, 'nonce': nonce, 'chainId': self.chain_id, 'gas': stuck_txn['gas'],
+            **self.fee_oracle.bump(stuck_txn)
+        })
+        new_hash = self.sign_and_send_txn(discard_txn)
+        self.nonce_manager.sent(nonce, new_hash, [(campaign_type, campaign_id) for campaign_id in campaign_ids])
+        logger.warning('Replaced stuck discard %s with %s', _hex(tx_hash), _hex(new_hash))
+        return new_hash
+
+    def discard_dropped(self, campaign_type: str, campaign_ids: list):
+        from .outcomes import RETRY_NEW_NONCE
+
+        # the node forgot the transaction or another one used its nonce, the retry takes a new one
+        for campaign_id in campaign_ids:
+            self.pending_discards.pop((campaign_type, campaign_id), None)
+        self.retry_campaigns(campaign_type, campaign_ids, RETRY_NEW_NONCE)
+
+    def on_discard_receipt(self, campaign_type: str, campaign_ids: list, nonce: int, tx_hashes: list, future):
+        from web3.exceptions import TimeExhausted
+
+        try:
+            receipt = future.result()
+        except TimeExhausted:
+            logger.warning('No receipt yet for discard of %d %s campaigns', len(campaign_ids), campaign_type)
+            try:
+                self.on_discard_stuck(campaign_type, campaign_ids, nonce, tx_hashes)
+            except Exception as e:
+                logger.error('Error resyncing nonces: %s', e)
+                self.track_discard(campaign_type, campaign_ids, nonce, tx_hashes)
+            return
+
+        discarded = self.settle_discard(campaign_type, campaign_ids, nonce, receipt)
+        if discarded is not None:
+            campaign_ids, campaigns = discarded
+            self.report_discarded(campaign_type, campaign_ids, self.refunded_amounts(campaign_type, campaigns))
+
+    def settle_discard(self, campaign_type: str, campaign_ids: list, nonce: int, receipt):
+        """Applies the receipt of a discard sent with `nonce`. Returns the ids it
+        discarded and their last known campaigns, None when it reverted and the
+        campaigns were scheduled for a retry."""
+        from .discards import discarded_ids
+        from .metrics import DISCARD_REVERTS, DISCARDS
+        from .outcomes import BACKOFF
+
+        keys = [(campaign_type, campaign_id) for campaign_id in campaign_ids]
+        self.nonce_manager.confirmed(nonce)
+        for key in keys:
+            self.pending_discards.pop(key, None)
+        if receipt['status'] != 1:
+            logger.error('Discard transaction reverted for %d %s campaigns', len(keys), campaign_type)
+            DISCARD_REVERTS.labels(campaign_type).inc()
+            # the gas limit may have been too low, measure it again
+            self.fee_oracle.forget(campaign_type)
+            # the next preflight tells the campaigns that can still be discarded
+            self.retry_campaigns(campaign_type, campaign_ids, BACKOFF)
+            return None
+
+        # ids the contract skipped were already finalized, none of them is ongoing anymore
+        campaigns = {key: self.campaign_index.get(key) for key in keys}
+        for key in keys:
+            self.campaign_index.remove(key)
+            self.retry_policy.forget(key)
+        campaign_ids = discarded_ids(self.marketplace_contract, campaign_type, receipt)
+        DISCARDS.labels(campaign_type).inc(len(campaign_ids))
+        return campaign_ids, [campaigns.get((campaign_type, campaign_id)) for campaign_id in campaign_ids]
+
+    def report_discarded(self, campaign_type: str, campaign_ids: list, refunded: dict):
+        """Queues the backend updates of the discarded campaigns."""
+        for campaign_id in campaign_ids:
+            campaign_hex = _hex(campaign_id)
+            logger.debug('Discarded campaign as offer time ended %s', campaign_hex)
+            try:
+                self.discard_campaign(campaign_hex)
+            except Exception as e:
+                logger.error(str(e))
+        logger.info('Discarded %d %s campaigns as offer time ended', len(campaign_ids), campaign_type,
+                    extra={'refunded': refunded})
+
+    def refunded_amounts(self, campaign_type: str, campaigns: list) -> dict:
+        """Amounts refunded by the discarded `campaigns` per token symbol, for the log."""
+        from .discards import refunds
+
+        try:
+            return self.token_metadata.totals(refunds(campaign_type, [c for c in campaigns if c is not None]))
+        except Exception as e:
+            logger.warning('Error reading token metadata: %s', e)
+            return {}
+
+    def sign_and_send_txn(self, txn: dict):
+        signed_txn = self.owner.sign_transaction(txn)
+        tx_hash = self.w3.eth.send_raw_transaction(signed_txn.raw_transaction)
+        return tx_hash
+
+    def sweep_once(self):
+        """Catches the index up with the chain and discards the campaigns whose offer ended."""
+        started = time.perf_counter()
+        try:
+            campaign_index = self.campaign_index
+            if campaign_index.last_block is None:
+                # resume from the checkpoint with a log backfill, full bootstrap without one
+                changed = campaign_index.restore()
+                if campaign_index.last_block is None:
+                    changed = campaign_index.bootstrap()
+                else:
+                    changed |= campaign_index.sync()
+                if self.log_stream is not None:
+                    self.log_stream.start_thread()
+            else:
+                # only poll for logs while the stream is down
+                changed = campaign_index.sync(poll_logs=self.log_stream is None or not self.log_stream.connected)
+
+            self.reschedule(changed)
+            if not self.is_leader():
+                # due campaigns stay scheduled for when this replica takes over
+                logger.info('Standing by', extra={'sample': 'standby', 'tracked': len(campaign_index.campaigns)})
+                return
+
+            # only campaigns whose offer has ended are handled
+            due = self.deadline_scheduler.pop_due(self.clock())
+            expired = self.expired_campaigns(due)
+
+            # expired campaigns go out in gas-bounded batches instead of one transaction each
+            for campaign_type, campaign_ids in expired.items():
+                for chunk in self.discard_batches(campaign_ids):
+                    self.discard_expired(campaign_type, chunk)
+
+            self.log_sweep(started, changed, due, expired)
+
+        except Exception as e:
+            raise Exception(f"Error processing campaigns: {str(e)}")
+
+    def reschedule(self, changed: set):
+        """(Re)schedules the campaigns whose deadline may have moved."""
+        for key in changed:
+            campaign = self.campaign_index.get(key)
+            if campaign is None:
+                self.deadline_scheduler.cancel(key)
+            else:
+                self.deadline_scheduler.schedule(key, campaign.offer_ends_in + 1)
+
+    def expired_campaigns(self, due: list) -> dict:
+        """Ids of the `due` campaigns to discard now, by campaign type."""
+        from .campaigns import CAMPAIGN_TYPES
+
+        expired = {campaign_type: [] for campaign_type in CAMPAIGN_TYPES}
+        for key in due:
+            campaign = self.campaign_index.get(key)
+            if campaign is not None and self.handle_campaign(*key, campaign):
+                expired[key[0]].append(key[1])
+        return expired
+
+    def log_sweep(self, started: float, changed: set, due: list, expired: dict):
+        # one summary record per sweep instead of a line per campaign
+        logger.info('Sweep done', extra={
+            'tracked': len(self.campaign_index.campaigns), 'changed': len(changed), 'due': len(due),
+            'expired': sum(len(campaign_ids) for campaign_ids in expired.values()),
+            'in_flight': len(self.pending_discards),
+            'duration_ms': round((time.perf_counter() - started) * 1000, 1),
+        })
+
+    def resume_pending_discards(self):
+        for nonce, tx_hashes, keys in self.nonce_manager.restore():
+            if keys:
+                for key in keys:
+                    self.pending_discards[key] = nonce
+                # whichever of the replacements gets mined settles the discard
+                self.track_discard(keys[0][0], [campaign_id for _, campaign_id in keys], nonce, tx_hashes)
+
+    def discard_requested(self, campaign_type: str, campaign_ids: list):
+        """Discards the expired campaigns a shard worker reported, skipping those already in flight."""
+        if not self.is_leader():
+            # the worker reports them again once the resubmit delay passes
+            return
+        campaign_ids = [
+            campaign_id for campaign_id in campaign_ids if (campaign_type, campaign_id) not in self.pending_discards
+        ]
+        for chunk in self.discard_batches(campaign_ids):
+            self.discard_expired(campaign_type, chunk)
+
+    def start(self):
+        """Starts the election, backend and receipt threads and resumes the discards in flight."""
+        if self.leader_elector is not None:
+            self.leader_elector.start()
+        self.backend_notifier.start()
+        self.receipt_tracker.start()
+        self.resume_pending_discards()
+
+    def request_reload(self):
+        """Safe from a signal handler, the reload happens on the sweep thread."""
+        self._reload_requested = True
+        self.deadline_scheduler.wake()
+
+    def reload(self):
+        if not self._reload_requested or self.config_loader is None:
+            return
+        self._reload_requested = False
+        config = self.config_loader()
+        if config is not None:
+            self.reconfigure(config)
+
+    def reconfigure(self, config) -> dict:
+        """Takes the live settings of `config`, warm caches and connections are
+        kept. Returns the settings that changed."""
+        from .config import apply_live
+
+        live = self._take_live(config)
+        if not live:
+            return live
+        # only the components built so far, the others read the new config when they are
+        apply_live(
+            self.config, fee_oracle=self.__dict__.get('fee_oracle'),
+            receipt_tracker=self.__dict__.get('receipt_tracker'), retry_policy=self.__dict__.get('retry_policy'),
+            campaigns=self.__dict__.get('marketplace_campaigns'), token_metadata=self.__dict__.get('token_metadata'),
+            discard_preflight=self.__dict__.get('discard_preflight'),
+            backend_notifier=self.__dict__.get('backend_notifier'),
+        )
+        return live
+
+    def _take_live(self, config) -> dict:
+        live, restart = self.config.changes(config)
+        if restart:
+            logger.warning('Ignoring configuration changes that need a restart', extra={'fields': restart})
+        if live:
+            self.config = self.config.model_copy(update=live)
+            changed = {field: str(value) for field, value in live.items()}
+            logger.warning('Reloaded configuration', extra={'changed': changed})
+        return live
+
+    def run(self):
+        from .metrics import SWEEP_DURATION
+
+        self.start()
+        while True:
+            self.reload()
+            try:
+                with SWEEP_DURATION.time():
+                    self.sweep_once()
+            except Exception as e:
+                # an unreachable or rate limited RPC only costs this sweep
+                logger.exception('%s', e)
+            # new campaigns are picked up from logs at least every sleep_time seconds,
+            # or as soon as they are streamed; a standby leaves due deadlines to the leader
+            # and is woken by its election
+            self.deadline_scheduler.wait(self.config.sleep_time, deadlines=self.is_leader())
+
+    def run_sharded(self):
+        """Runs config.shards index workers around this process's signer; reloads
+        apply to the signer, the workers keep the settings they were forked with."""
+        from .metrics import serve
+        from .sharding import ShardSupervisor
+
+        config = self.config
+        supervisor = ShardSupervisor(config.shards, {
+            'rpc_urls': config.rpc_urls, 'marketplace_address': config.marketplace_address,
+            'marketplace_abi': self.marketplace_abi, 'multicall_address': self.multicall_address,
+            'campaign_cache_size': config.campaign_cache_size, 'log_level': config.log_level,
+            'sleep_time': config.sleep_time, 'resubmit_delay': config.receipt_timeout,
+            'metrics_addr': config.metrics_addr,
+        }, self.discard_requested, metrics_port=config.metrics_port, on_tick=self.reload)
+        # forked before the metrics, notifier and tracker threads start
+        supervisor.start()
+        serve(config.metrics_port, config.metrics_addr)
+        self.start()
+        supervisor.run()
@@ -0,0 +1,91 @@
+import random
+import threading
+
+from web3.exceptions import ContractLogicError, TimeExhausted
+
+from .discards import revert_name
+
+# Nothing to retry, the campaign is settled on chain
+TERMINAL = 'terminal'
+# The transaction may still land with its nonce, retry soon at a better price
+RETRY_SAME_NONCE = 'retryable-same-nonce'
+# The nonce is gone or out of sync, resync and retry soon with the next one
+RETRY_NEW_NONCE = 'retryable-new-nonce'
+# Transient or unknown, retry with exponential backoff
+BACKOFF = 'backoff'
+
+# Marketplace.sol custom errors a discard can revert with
+REVERT_CATEGORIES = {
+    'InvalidCampaignStatus': TERMINAL,
+    'CampaignNotFound': TERMINAL,
+    'EnforcedPause': BACKOFF,
+    'ContractBalanceInsufficient': BACKOFF,
+    'FundTransferError': BACKOFF,
+    # a misconfigured owner key is fixed by an operator, the campaigns are still there afterwards
+    'Unauthorized': BACKOFF,
+    'OwnableUnauthorizedAccount': BACKOFF,
+}
+
+# Node error messages, matched in order on the lowercased message
+MESSAGE_CATEGORIES = (
+    (('nonce too low', 'already known', 'invalid nonce', 'nonce has already been used'), RETRY_NEW_NONCE),
+    (('replacement transaction underpriced', 'transaction underpriced', 'less than block base fee',
+      'fee cap less than'), RETRY_SAME_NONCE),
+)
+# On a first send, another transaction we don't track already holds the nonce
+NONCE_TAKEN_MESSAGE = 'replacement transaction underpriced'
+
+
+def classify_revert(name: str) -> str:
+    return REVERT_CATEGORIES.get(name, BACKOFF)
+
+
+def classify(error: Exception, errors: dict = None, replacement: bool = False) -> str:
+    """Category of a failed send or receipt wait; `errors` are the contract's
+    revert errors by selector, see discards.revert_errors. `replacement` is
+    True when the failed send was a fee bump of our own stuck transaction."""
+    if isinstance(error, TimeExhausted):
+        return RETRY_SAME_NONCE
+    if isinstance(error, ContractLogicError) and errors is not None and isinstance(error.data, str):
+        return classify_revert(revert_name(errors, error.data))
+    message = str(error).lower()
+    if not replacement and NONCE_TAKEN_MESSAGE in message:
+        return RETRY_NEW_NONCE
+    for fragments, category in MESSAGE_CATEGORIES:
+        if any(fragment in message for fragment in fragments):
+            return category
+    # timeouts, rate limits and connection errors included
+    return BACKOFF
+
+
+class RetryPolicy:
+    """Per-campaign retry delays driven by the category of the last failure.
+
+    Each retryable category starts from its own base delay and doubles with
+    every consecutive failure of the same key, up to `max_delay`, with
+    +/-`jitter` so campaigns that failed together don't retry together.
+    `delay` returns None for terminal failures. A key's count is dropped by
+    `forget` once its campaign is settled.
+    """
+
+    def __init__(self, backoff: float = 30, max_delay: float = 900, jitter: float = 0.2,
+                 same_nonce: float = 5, new_nonce: float = 1):
+        self.base_delays = {RETRY_SAME_NONCE: same_nonce, RETRY_NEW_NONCE: new_nonce, BACKOFF: backoff}
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self._failures = {}
+        self._lock = threading.Lock()
+
+    def delay(self, key, category: str):
+        if category == TERMINAL:
+            self.forget(key)
+            return None
+        with self._lock:
+            failures = self._failures.get(key, 0)
+            self._failures[key] = failures + 1
+        delay = min(self.max_delay, self.base_delays[category] * 2 ** failures)
+        return delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def forget(self, key):
+        with self._lock:
+            self._failures.pop(key, None)
@@ -0,0 +1,211 @@
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import Future
+
+from web3 import Web3
+from web3.exceptions import MethodNotSupported, MethodUnavailable, TimeExhausted, TransactionNotFound, Web3TypeError
+
+logger = logging.getLogger(__name__)
+
+
+class ReceiptTracker:
+    """Resolves receipt futures for every pending transaction from one poller.
+
+    Each new block is fetched once with eth_getBlockReceipts, the blocks of
+    one poll in a single batch request (at most `max_batch_blocks`), and
+    matched against all tracked hashes, falling back to one eth_getTransactionReceipt
+    per pending hash and poll on nodes without that method. A tracked
+    entry may hold several hashes (a transaction and its fee-bumped
+    replacements) and resolves with whichever gets mined. Newly tracked
+    hashes are looked up once directly so a transaction mined before it was
+    tracked is not missed. Entries without a receipt after `timeout`
+    seconds fail with TimeExhausted.
+    """
+
+    def __init__(self, w3: Web3, poll_interval: float = 1, max_batch_blocks: int = 50):
+        self.w3 = w3
+        self.poll_interval = poll_interval
+        self.max_batch_blocks = max_batch_blocks
+        self.block_receipts = True
+        self.batch = True
+        self._by_hash = {}
+        self._entries = {}
+        self._unchecked = []
+        self._last_block = None
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def track(self, tx_hashes: list, timeout: float) -> Future:
+        future = Future()
+        self._add(future, tx_hashes, timeout)
+        return future
+
+    def start(self):
+        threading.Thread(target=self._run, name='receipt-tracker', daemon=True).start()
+
+    def poll(self):
+        unchecked = self._take_unchecked()
+        head = self.w3.eth.block_number
+        if self._last_block is None:
+            self._last_block = head
+        while self._last_block < head and self._entries:
+            last = min(head, self._last_block + self.max_batch_blocks)
+            receipts = self._get_block_receipts(range(self._last_block + 1, last + 1))
+            if receipts is None:
+                # one lookup per pending hash covers every new block at once
+                self._resolve(self._get_receipts(self._tracked_hashes()))
+                break
+            self._resolve(receipts)
+            self._last_block = last
+        self._last_block = head
+        self._resolve(self._get_receipts(unchecked))
+        self._expire()
+
+    def _run(self):
+        while True:
+            try:
+                self.poll()
+            except Exception as e:
+                logger.error('Error polling receipts: %s', e)
+            time.sleep(self.poll_interval)
+
+    def _get_block_receipts(self, blocks: range):
+        """Receipts of all `blocks`, None if the node can't return them per block."""
+        if not self.block_receipts:
+            return None
+        try:
+            block_receipts = self._batch_block_receipts(blocks) if self.batch else None
+            if block_receipts is None:
+                block_receipts = [self.w3.eth.get_block_receipts(block) for block in blocks]
+        except (MethodUnavailable, MethodNotSupported):
+            logger.warning('Node has no eth_getBlockReceipts, looking up pending receipts one by one')
+            self.block_receipts = False
+            return None
+        return [receipt for receipts in block_receipts for receipt in receipts]
+
+    def _batch_block_receipts(self, blocks: range):
+        try:
+            with self.w3.batch_requests() as batch:
+                for block in blocks:
+                    batch.add(self.w3.eth.get_block_receipts(block))
+                return batch.execute()
+        except Web3TypeError:
+            # the provider has no batch support
+            self.batch = False
+            return None
+
+    def _get_receipts(self, tx_hashes: list) -> list:
+        receipts = []
+        for tx_hash in tx_hashes:
+            try:
+                receipts.append(self.w3.eth.get_transaction_receipt(tx_hash))
+            except TransactionNotFound:
+                pass
+        return receipts
+
+    def _add(self, future, tx_hashes: list, timeout: float):
+        tx_hashes = [bytes(tx_hash) for tx_hash in tx_hashes]
+        with self._lock:
+            self._entries[future] = (tx_hashes, time.time() + timeout)
+            for tx_hash in tx_hashes:
+                self._by_hash[tx_hash] = future
+            self._unchecked.extend(tx_hashes)
+
+    def _tracked_hashes(self) -> list:
+        with self._lock:
+            return list(self._by_hash)
+
+    def _take_unchecked(self) -> list:
+        with self._lock:
+            unchecked, self._unchecked = self._unchecked, []
+            return [tx_hash for tx_hash in unchecked if tx_hash in self._by_hash]
+
+    def _pop(self, future):
+        tx_hashes, _ = self._entries.pop(future)
+        for tx_hash in tx_hashes:
+            if self._by_hash.get(tx_hash) is future:
+                del self._by_hash[tx_hash]
+
+    def _resolve(self, receipts: list):
+        resolved = []
+        with self._lock:
+            for receipt in receipts:
+                future = self._by_hash.get(bytes(receipt['transactionHash']))
+                if future is not None:
+                    self._pop(future)
+                    resolved.append((future, receipt))
+        # callbacks may track again, so they run outside the lock
+        for future, receipt in resolved:
+            if not future.done():
+                future.set_result(receipt)
+
+    def _expire(self):
+        now = time.time()
+        with self._lock:
+            expired = [future for future, (_, deadline) in self._entries.items() if deadline <= now]
+            for future in expired:
+                self._pop(future)
+        for future in expired:
+            if not future.done():
+                future.set_exception(TimeExhausted("Transaction is not in the chain yet"))
+
+
+class AsyncReceiptTracker(ReceiptTracker):
+    """ReceiptTracker for AsyncWeb3; `track` returns an asyncio future and
+    `run` is the polling task."""
+
+    def track(self, tx_hashes: list, timeout: float) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        self._add(future, tx_hashes, timeout)
+        return future
+
+    async def run(self):
+        while True:
+            try:
+                await self.poll()
+            except Exception as e:
+                logger.error('Error polling receipts: %s', e)
+            await asyncio.sleep(self.poll_interval)
+
+    async def poll(self):
+        unchecked = self._take_unchecked()
+        head = await self.w3.eth.block_number
+        if self._last_block is None:
+            self._last_block = head
+        while self._last_block < head and self._entries:
+            last = min(head, self._last_block + self.max_batch_blocks)
+            receipts = await self._get_block_receipts(range(self._last_block + 1, last + 1))
+            if receipts is None:
+                self._resolve(await self._get_receipts(self._tracked_hashes()))
+                break
+            self._resolve(receipts)
+            self._last_block = last
+        self._last_block = head
+        self._resolve(await self._get_receipts(unchecked))
+        self._expire()
+
+    async def _get_block_receipts(self, blocks: range):
+        if not self.block_receipts:
+            return None
+        try:
+            # concurrent lookups, a coalescing provider sends them as one batch
+            block_receipts = await asyncio.gather(*(self.w3.eth.get_block_receipts(block) for block in blocks))
+        except (MethodUnavailable, MethodNotSupported):
+            logger.warning('Node has no eth_getBlockReceipts, looking up pending receipts one by one')
+            self.block_receipts = False
+            return None
+        return [receipt for receipts in block_receipts for receipt in receipts]
+
+    async def _get_receipts(self, tx_hashes: list) -> list:
+        receipts = await asyncio.gather(*(self._get_receipt(tx_hash) for tx_hash in tx_hashes))
+        return [receipt for receipt in receipts if receipt is not None]
+
+    async def _get_receipt(self, tx_hash):
+        try:
+            return await self.w3.eth.get_transaction_receipt(tx_hash)
+        except TransactionNotFound:
+            return None
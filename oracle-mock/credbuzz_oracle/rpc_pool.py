@@ -0,0 +1,443 @@
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+import aiohttp
+from web3 import AsyncHTTPProvider, HTTPProvider
+from web3.providers.async_base import AsyncJSONBaseProvider
+from web3.providers.base import JSONBaseProvider
+
+from .metrics import RPC_ENDPOINT_ERRORS
+
+logger = logging.getLogger(__name__)
+
+WRITE_METHODS = ('eth_sendRawTransaction',)
+# JSON-RPC errors caused by the endpoint (rate limits) rather than the request. Anything
+# else, -32603 internal errors included, is the request's and goes back to web3 as is so
+# reverts surface as ContractLogicError
+ENDPOINT_ERROR_CODES = (-32005, 429)
+ENDPOINT_ERROR_MESSAGES = ('rate limit', 'rate-limit', 'too many requests', 'request rate exceeded',
+                           'compute units per second')
+# execution reverted, never the endpoint's fault whatever the revert reason says
+REVERT_ERROR_CODE = 3
+# HTTP statuses of endpoints refusing array payloads
+BATCH_REJECTED_STATUSES = (400, 405, 501)
+
+
+class Endpoint:
+    """Latency and health of one RPC endpoint."""
+
+    def __init__(self, url: str, provider):
+        self.url = url
+        # host and port only, endpoint paths and credentials usually carry the API key
+        self.name = urlparse(url).netloc.rsplit('@', 1)[-1] or url
+        self.provider = provider
+        self.latency = None
+        self.failures = 0
+        self.open_until = 0
+        self.head = None
+        self.lagging = False
+        self.batch = True
+
+    def available(self, now: float) -> bool:
+        return now >= self.open_until and not self.lagging
+
+
+class ProviderPool:
+    """Endpoint selection shared by the sync and async pooled providers.
+
+    Reads go to the available endpoint with the lowest EWMA latency and fail
+    over to the next one on transport errors or rate-limit responses. After
+    `failure_threshold` failures in a row an endpoint's circuit opens for
+    `cooldown` seconds, doubling up to `max_cooldown` while it keeps
+    failing. Every `head_check_interval` seconds all endpoints are asked for
+    their head and those more than `max_lag` blocks behind the best one are
+    skipped until they catch up. Transactions are broadcast to every
+    endpoint with `write_mode='all'`, or sent to the first one and failed
+    over with `write_mode='preferred'`. When no endpoint is available all of
+    them are tried anyway, so a full outage only slows requests down.
+
+    Batches (`w3.batch_requests()`) go out as one array payload and fail
+    over like single requests. An endpoint that refuses array payloads gets
+    the calls of later batches one by one.
+    """
+
+    def _init_pool(self, endpoints: list, write_mode: str, alpha: float, failure_threshold: int,
+                   cooldown: float, max_cooldown: float, max_lag: int, head_check_interval: float):
+        if write_mode not in ('all', 'preferred'):
+            raise Exception(f"Unknown RPC write mode {write_mode}")
+        self.endpoints = endpoints
+        self.write_mode = write_mode
+        self.alpha = alpha
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.max_lag = max_lag
+        self.head_check_interval = head_check_interval
+        self._heads_checked_at = 0
+
+    def _candidates(self, preferred: bool = False) -> list:
+        now = time.time()
+        available = [endpoint for endpoint in self.endpoints if endpoint.available(now)]
+        if preferred:
+            # configuration order, broken endpoints only as a last resort
+            return available + [endpoint for endpoint in self.endpoints if endpoint not in available]
+        if not available:
+            # everything is broken, try the endpoint whose circuit closes first
+            return sorted(self.endpoints, key=lambda endpoint: endpoint.open_until)
+        # unmeasured endpoints go first so every endpoint gets a latency sample
+        return sorted(available, key=lambda endpoint: endpoint.latency or 0)
+
+    def _heads_due(self) -> bool:
+        if time.time() - self._heads_checked_at < self.head_check_interval:
+            return False
+        self._heads_checked_at = time.time()
+        return True
+
+    def _update_lag(self):
+        heads = [endpoint.head for endpoint in self.endpoints if endpoint.head is not None]
+        if not heads:
+            return
+        best = max(heads)
+        for endpoint in self.endpoints:
+            lagging = endpoint.head is not None and best - endpoint.head > self.max_lag
+            if lagging and not endpoint.lagging:
+                logger.warning('RPC endpoint %s is %d blocks behind, skipping it', endpoint.name, best - endpoint.head)
+            endpoint.lagging = lagging
+
+    def _succeeded(self, endpoint: Endpoint, elapsed: float):
+        if endpoint.latency is None:
+            endpoint.latency = elapsed
+        else:
+            endpoint.latency = self.alpha * elapsed + (1 - self.alpha) * endpoint.latency
+        endpoint.failures = 0
+        endpoint.open_until = 0
+
+    def _failed(self, endpoint: Endpoint, error):
+        endpoint.failures += 1
+        RPC_ENDPOINT_ERRORS.labels(endpoint.name).inc()
+        if endpoint.failures >= self.failure_threshold:
+            cooldown = min(self.cooldown * 2 ** (endpoint.failures - self.failure_threshold), self.max_cooldown)
+            endpoint.open_until = time.time() + cooldown
+            logger.warning('RPC endpoint %s failed %d times, pausing it for %ss: %s',
+                           endpoint.name, endpoint.failures, cooldown, error)
+
+    def _endpoint_error(self, response: dict):
+        """The error of `response` if the endpoint rather than the request is at fault."""
+        error = response.get('error') if isinstance(response, dict) else None
+        if not isinstance(error, dict):
+            return None
+        code = error.get('code')
+        if code == REVERT_ERROR_CODE:
+            return None
+        message = str(error.get('message', '')).lower()
+        if code in ENDPOINT_ERROR_CODES or any(text in message for text in ENDPOINT_ERROR_MESSAGES):
+            return error
+        return None
+
+    def _batch_error(self, requests: list, response):
+        """Why `response` to the `requests` batch can't be used: ('endpoint',
+        error) when the endpoint is at fault, ('rejected', error) when it
+        doesn't take batches, None when it is one response per request.
+        Other per-call errors, e.g. reverts, belong to their own caller."""
+        if not isinstance(response, list) or len(response) != len(requests):
+            error = self._endpoint_error(response)
+            return ('endpoint', error) if error is not None else ('rejected', response)
+        # a rate-limited call means the endpoint dropped part of the batch, retry all of it elsewhere
+        for item in response:
+            error = self._endpoint_error(item)
+            if error is not None:
+                return 'endpoint', error
+        return None
+
+    def _rejects_batches(self, error: Exception) -> bool:
+        response = getattr(error, 'response', None)
+        status = getattr(response, 'status_code', None) or getattr(error, 'status', None)
+        return status in BATCH_REJECTED_STATUSES
+
+    def _batch_rejected(self, endpoint: Endpoint, error):
+        logger.warning('RPC endpoint %s rejects batch requests, sending their calls one by one: %s',
+                       endpoint.name, error)
+        endpoint.batch = False
+
+    def _pick_broadcast(self, results: list) -> dict:
+        """First accepted broadcast, else the first rejection so the caller sees why."""
+        responses = [response for response, _ in results if response is not None]
+        for response in responses:
+            if 'error' not in response:
+                return response
+        if responses:
+            return responses[0]
+        raise Exception(f"Error broadcasting transaction on every RPC endpoint: {results[0][1]}")
+
+
+class PooledHTTPProvider(ProviderPool, JSONBaseProvider):
+    """Web3 provider spreading requests over several HTTP endpoints, see ProviderPool."""
+
+    def __init__(self, urls: list, write_mode: str = 'all', alpha: float = 0.2,
+                 failure_threshold: int = 3, cooldown: float = 30, max_cooldown: float = 600,
+                 max_lag: int = 5, head_check_interval: float = 15, request_timeout: float = 10):
+        super().__init__()
+        endpoints = [
+            # failover replaces the provider's own retries
+            Endpoint(url, HTTPProvider(url, request_kwargs={'timeout': request_timeout},
+                                       exception_retry_configuration=None))
+            for url in urls
+        ]
+        self._init_pool(endpoints, write_mode, alpha, failure_threshold, cooldown,
+                        max_cooldown, max_lag, head_check_interval)
+        self._heads_lock = threading.Lock()
+        self._broadcaster = ThreadPoolExecutor(max_workers=len(endpoints), thread_name_prefix='rpc-broadcast')
+
+    def make_request(self, method, params):
+        self._check_heads()
+        if method in WRITE_METHODS and self.write_mode == 'all':
+            return self._broadcast(method, params)
+
+        error = None
+        for endpoint in self._candidates(preferred=method in WRITE_METHODS):
+            response, error = self._request(endpoint, method, params)
+            if response is not None:
+                return response
+        raise Exception(f"Error calling {method} on every RPC endpoint: {error}")
+
+    def make_batch_request(self, requests: list) -> list:
+        self._check_heads()
+        error = None
+        for endpoint in self._candidates():
+            responses, error = self._batch(endpoint, requests)
+            if responses is not None:
+                return responses
+        raise Exception(f"Error sending a batch of {len(requests)} calls on every RPC endpoint: {error}")
+
+    def is_connected(self, show_traceback: bool = False) -> bool:
+        return any(endpoint.provider.is_connected(show_traceback) for endpoint in self.endpoints)
+
+    def _batch(self, endpoint: Endpoint, requests: list) -> tuple:
+        if not endpoint.batch:
+            return self._one_by_one(endpoint, requests)
+        start = time.perf_counter()
+        try:
+            # responses come back sorted by id, which is request order
+            response = endpoint.provider.make_batch_request(requests)
+        except Exception as e:
+            if self._rejects_batches(e):
+                self._batch_rejected(endpoint, e)
+                return self._one_by_one(endpoint, requests)
+            self._failed(endpoint, e)
+            return None, e
+        failure = self._batch_error(requests, response)
+        if failure is None:
+            self._succeeded(endpoint, time.perf_counter() - start)
+            return response, None
+        cause, error = failure
+        if cause == 'rejected':
+            self._batch_rejected(endpoint, error)
+            return self._one_by_one(endpoint, requests)
+        self._failed(endpoint, error)
+        return None, error
+
+    def _one_by_one(self, endpoint: Endpoint, requests: list) -> tuple:
+        responses = []
+        for method, params in requests:
+            response, error = self._request(endpoint, method, params)
+            if response is None:
+                return None, error
+            responses.append(response)
+        return responses, None
+
+    def _request(self, endpoint: Endpoint, method, params) -> tuple:
+        start = time.perf_counter()
+        try:
+            response = endpoint.provider.make_request(method, params)
+        except Exception as e:
+            self._failed(endpoint, e)
+            return None, e
+        error = self._endpoint_error(response)
+        if error is not None:
+            self._failed(endpoint, error)
+            return None, error
+        self._succeeded(endpoint, time.perf_counter() - start)
+        return response, None
+
+    def _broadcast(self, method, params) -> dict:
+        endpoints = self._candidates()
+        futures = [self._broadcaster.submit(self._request, endpoint, method, params) for endpoint in endpoints]
+        return self._pick_broadcast([future.result() for future in futures])
+
+    def _check_heads(self):
+        # a single caller refreshes the heads, the others don't wait for it
+        if not self._heads_due() or not self._heads_lock.acquire(blocking=False):
+            return
+        try:
+            for endpoint in self.endpoints:
+                response, _ = self._request(endpoint, 'eth_blockNumber', [])
+                if response is not None and 'result' in response:
+                    endpoint.head = int(response['result'], 16)
+            self._update_lag()
+        finally:
+            self._heads_lock.release()
+
+
+class AsyncPooledHTTPProvider(ProviderPool, AsyncJSONBaseProvider):
+    """PooledHTTPProvider for AsyncWeb3.
+
+    With `coalesce`, reads issued in the same event loop tick, e.g. by
+    gathered coroutines, are sent together as batches of at most
+    `max_batch_size` calls; each caller still gets its own response.
+    """
+
+    def __init__(self, urls: list, write_mode: str = 'all', alpha: float = 0.2,
+                 failure_threshold: int = 3, cooldown: float = 30, max_cooldown: float = 600,
+                 max_lag: int = 5, head_check_interval: float = 15, request_timeout: float = 10,
+                 coalesce: bool = True, max_batch_size: int = 100):
+        super().__init__()
+        request_kwargs = {'timeout': aiohttp.ClientTimeout(total=request_timeout)}
+        endpoints = [
+            Endpoint(url, AsyncHTTPProvider(url, request_kwargs=request_kwargs, exception_retry_configuration=None))
+            for url in urls
+        ]
+        self._init_pool(endpoints, write_mode, alpha, failure_threshold, cooldown,
+                        max_cooldown, max_lag, head_check_interval)
+        self.coalesce = coalesce
+        self.max_batch_size = max_batch_size
+        self._queued = []
+        self._flushes = set()
+
+    async def cache_async_session(self, session):
+        for endpoint in self.endpoints:
+            await endpoint.provider.cache_async_session(session)
+        return session
+
+    async def make_request(self, method, params):
+        await self._check_heads()
+        if method in WRITE_METHODS and self.write_mode == 'all':
+            return await self._broadcast(method, params)
+        if self.coalesce and method not in WRITE_METHODS:
+            return await self._enqueue(method, params)
+        return await self._send(method, params)
+
+    async def make_batch_request(self, requests: list) -> list:
+        await self._check_heads()
+        error = None
+        for endpoint in self._candidates():
+            responses, error = await self._batch(endpoint, requests)
+            if responses is not None:
+                return responses
+        raise Exception(f"Error sending a batch of {len(requests)} calls on every RPC endpoint: {error}")
+
+    async def is_connected(self, show_traceback: bool = False) -> bool:
+        for endpoint in self.endpoints:
+            if await endpoint.provider.is_connected(show_traceback):
+                return True
+        return False
+
+    async def disconnect(self):
+        for endpoint in self.endpoints:
+            await endpoint.provider.disconnect()
+
+    async def _send(self, method, params) -> dict:
+        error = None
+        for endpoint in self._candidates(preferred=method in WRITE_METHODS):
+            response, error = await self._request(endpoint, method, params)
+            if response is not None:
+                return response
+        raise Exception(f"Error calling {method} on every RPC endpoint: {error}")
+
+    def _enqueue(self, method, params) -> asyncio.Future:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._queued.append((method, params, future))
+        if len(self._queued) == 1:
+            # runs once every coroutine already scheduled in this tick had its turn
+            loop.call_soon(self._flush)
+        return future
+
+    def _flush(self):
+        queued, self._queued = self._queued, []
+        for i in range(0, len(queued), self.max_batch_size):
+            task = asyncio.ensure_future(self._send_queued(queued[i:i + self.max_batch_size]))
+            self._flushes.add(task)
+            task.add_done_callback(self._flushes.discard)
+
+    async def _send_queued(self, queued: list):
+        try:
+            if len(queued) == 1:
+                method, params, _ = queued[0]
+                responses = [await self._send(method, params)]
+            else:
+                responses = await self.make_batch_request([(method, params) for method, params, _ in queued])
+        except Exception as e:
+            for _, _, future in queued:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, _, future), response in zip(queued, responses):
+            if not future.done():
+                future.set_result(response)
+
+    async def _batch(self, endpoint: Endpoint, requests: list) -> tuple:
+        if not endpoint.batch:
+            return await self._one_by_one(endpoint, requests)
+        start = time.perf_counter()
+        try:
+            response = await endpoint.provider.make_batch_request(requests)
+        except Exception as e:
+            if self._rejects_batches(e):
+                self._batch_rejected(endpoint, e)
+                return await self._one_by_one(endpoint, requests)
+            self._failed(endpoint, e)
+            return None, e
+        failure = self._batch_error(requests, response)
+        if failure is None:
+            self._succeeded(endpoint, time.perf_counter() - start)
+            return response, None
+        cause, error = failure
+        if cause == 'rejected':
+            self._batch_rejected(endpoint, error)
+            return await self._one_by_one(endpoint, requests)
+        self._failed(endpoint, error)
+        return None, error
+
+    async def _one_by_one(self, endpoint: Endpoint, requests: list) -> tuple:
+        responses = []
+        for method, params in requests:
+            response, error = await self._request(endpoint, method, params)
+            if response is None:
+                return None, error
+            responses.append(response)
+        return responses, None
+
+    async def _request(self, endpoint: Endpoint, method, params) -> tuple:
+        start = time.perf_counter()
+        try:
+            response = await endpoint.provider.make_request(method, params)
+        except Exception as e:
+            self._failed(endpoint, e)
+            return None, e
+        error = self._endpoint_error(response)
+        if error is not None:
+            self._failed(endpoint, error)
+            return None, error
+        self._succeeded(endpoint, time.perf_counter() - start)
+        return response, None
+
+    async def _broadcast(self, method, params) -> dict:
+        results = await asyncio.gather(*(
+            self._request(endpoint, method, params) for endpoint in self._candidates()
+        ))
+        return self._pick_broadcast(results)
+
+    async def _check_heads(self):
+        if not self._heads_due():
+            return
+        results = await asyncio.gather(*(
+            self._request(endpoint, 'eth_blockNumber', []) for endpoint in self.endpoints
+        ))
+        for endpoint, (response, _) in zip(self.endpoints, results):
+            if response is not None and 'result' in response:
+                endpoint.head = int(response['result'], 16)
+        self._update_lag()
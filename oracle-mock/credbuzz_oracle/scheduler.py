@@ -0,0 +1,84 @@
+import heapq
+import itertools
+import threading
+import time
+
+
+class DeadlineScheduler:
+    """Min-heap of campaign deadlines.
+
+    Rescheduling a key pushes a new entry and leaves the old one in the heap;
+    stale entries are skipped when they reach the top. `schedule` can be
+    called from any thread and wakes up a pending `wait` when the new
+    deadline is earlier than the one it is sleeping towards; `wake` makes it
+    return right away.
+    """
+
+    def __init__(self):
+        self._heap = []
+        self._deadlines = {}
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+        self._woken = False
+
+    def __len__(self) -> int:
+        return len(self._deadlines)
+
+    def schedule(self, key, deadline: float):
+        with self._condition:
+            self._deadlines[key] = deadline
+            heapq.heappush(self._heap, (deadline, next(self._counter), key))
+            self._condition.notify_all()
+
+    def wake(self):
+        with self._condition:
+            self._woken = True
+            self._condition.notify_all()
+
+    def cancel(self, key):
+        with self._condition:
+            self._deadlines.pop(key, None)
+
+    def next_deadline(self):
+        with self._condition:
+            self._drop_stale()
+            return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now: float) -> list:
+        """Removes and returns the keys whose deadline is at or before `now`,
+        earliest first."""
+        due = []
+        with self._condition:
+            while True:
+                self._drop_stale()
+                if not self._heap or self._heap[0][0] > now:
+                    return due
+                _, _, key = heapq.heappop(self._heap)
+                del self._deadlines[key]
+                due.append(key)
+
+    def wait(self, timeout: float, deadlines: bool = True) -> bool:
+        """Blocks until the earliest deadline passes, `wake` is called or
+        `timeout` seconds elapse. Returns True if a deadline is due. With
+        `deadlines=False` only `wake` and the timeout end the wait, due
+        deadlines stay in the heap."""
+        end = time.time() + timeout
+        with self._condition:
+            while True:
+                now = time.time()
+                self._drop_stale()
+                if deadlines and self._heap and self._heap[0][0] <= now:
+                    self._woken = False
+                    return True
+                if self._woken or now >= end:
+                    self._woken = False
+                    return False
+                wake_at = min(end, self._heap[0][0]) if deadlines and self._heap else end
+                self._condition.wait(wake_at - now)
+
+    def _drop_stale(self):
+        while self._heap:
+            deadline, _, key = self._heap[0]
+            if self._deadlines.get(key) == deadline:
+                return
+            heapq.heappop(self._heap)
@@ -0,0 +1,216 @@
+import bisect
+import hashlib
+import logging
+import multiprocessing
+import queue
+import time
+
+from web3 import Web3
+
+from .campaign_index import CampaignIndex
+from .campaigns import CAMPAIGN_TYPES, MarketplaceCampaigns
+from .logs import setup_logging
+from .metrics import instrument, serve
+from .multicall import MulticallReader
+from .rpc_pool import PooledHTTPProvider
+from .scheduler import DeadlineScheduler
+
+logger = logging.getLogger(__name__)
+
+
+def _ring_hash(value: bytes) -> int:
+    return int.from_bytes(hashlib.blake2b(value, digest_size=8).digest(), 'big')
+
+
+class HashRing:
+    """Consistent hash ring mapping bytes32 campaign ids to shard members.
+
+    Every member sits at `replicas` points of a 64-bit ring and owns the ids
+    hashing between its points and the previous ones. When a member leaves
+    only its own ids move, spread over the remaining members.
+    """
+
+    def __init__(self, members: list, replicas: int = 64):
+        self.members = sorted(members)
+        points = sorted(
+            (_ring_hash(f'{member}:{i}'.encode()), member) for member in self.members for i in range(replicas)
+        )
+        self._hashes = [point for point, _ in points]
+        self._owners = [member for _, member in points]
+
+    def owner(self, campaign_id: bytes) -> str:
+        i = bisect.bisect(self._hashes, _ring_hash(campaign_id)) % len(self._hashes)
+        return self._owners[i]
+
+    def owns(self, member: str):
+        """CampaignIndex `owns` predicate for the slice of `member`."""
+        return lambda key: self.owner(key[1]) == member
+
+
+class ShardWorker:
+    """Index and deadline decisions for one slice of the campaigns.
+
+    Runs in its own process with its own RPC pool and campaign index, both
+    restricted to the ids the hash ring gives it. Expired campaigns are not
+    sent from here: they are reported on `discards` as (campaign_type,
+    campaign_ids) for the supervisor's single signer, and looked at again
+    after `resubmit_delay` seconds in case the discard never lands. A new
+    member list on `control` re-bootstraps the worker on its new slice.
+    """
+
+    def __init__(self, name: str, members: list, config: dict, discards, control, metrics_port: int = None):
+        self.name = name
+        self.members = members
+        self.config = config
+        self.discards = discards
+        self.control = control
+        self.metrics_port = metrics_port
+        self.sleep_time = config['sleep_time']
+        self.resubmit_delay = config['resubmit_delay']
+        self.campaign_index = None
+        self.deadline_scheduler = DeadlineScheduler()
+
+    def run(self):
+        # the forked logging thread is gone, every worker writes its own records
+        setup_logging(self.config['log_level'])
+        w3 = Web3(PooledHTTPProvider(self.config['rpc_urls']))
+        contract = w3.eth.contract(address=self.config['marketplace_address'], abi=self.config['marketplace_abi'])
+        marketplace = MarketplaceCampaigns(contract, MulticallReader(w3, self.config['multicall_address']),
+                                           cache_size=self.config['campaign_cache_size'])
+        self.campaign_index = CampaignIndex(w3, marketplace, owns=HashRing(self.members).owns(self.name))
+        if self.metrics_port is not None:
+            instrument(w3, None, self.campaign_index)
+            serve(self.metrics_port, self.config['metrics_addr'])
+
+        while True:
+            try:
+                self.sweep()
+            except Exception as e:
+                logger.exception('Error processing shard %s: %s', self.name, e)
+            self._wait()
+
+    def sweep(self):
+        started = time.perf_counter()
+        if self.campaign_index.last_block is None:
+            changed = self.campaign_index.bootstrap()
+        else:
+            changed = self.campaign_index.sync()
+
+        for key in changed:
+            campaign = self.campaign_index.get(key)
+            if campaign is None:
+                self.deadline_scheduler.cancel(key)
+            else:
+                self.deadline_scheduler.schedule(key, campaign.offer_ends_in + 1)
+
+        due = self.deadline_scheduler.pop_due(time.time())
+        expired = {campaign_type: [] for campaign_type in CAMPAIGN_TYPES}
+        for key in due:
+            if self.campaign_index.get(key) is None:
+                continue
+            expired[key[0]].append(key[1])
+            # the Discarded log cancels this, otherwise the campaign is reported again
+            self.deadline_scheduler.schedule(key, time.time() + self.resubmit_delay)
+
+        for campaign_type, campaign_ids in expired.items():
+            if campaign_ids:
+                self.discards.put((campaign_type, campaign_ids))
+
+        logger.info('Shard sweep done', extra={
+            'shard': self.name, 'tracked': len(self.campaign_index.campaigns), 'changed': len(changed),
+            'due': len(due), 'expired': sum(len(campaign_ids) for campaign_ids in expired.values()),
+            'duration_ms': round((time.perf_counter() - started) * 1000, 1),
+        })
+
+    def reshard(self, members: list):
+        logger.warning('Shard %s rebalancing over %d workers', self.name, len(members))
+        self.members = members
+        self.campaign_index.owns = HashRing(members).owns(self.name)
+        # the next sweep bootstraps the new slice from scratch
+        self.campaign_index.last_block = None
+        self.deadline_scheduler = DeadlineScheduler()
+
+    def _wait(self):
+        # sleep until the next deadline, but pull new logs at least every sleep_time
+        next_deadline = self.deadline_scheduler.next_deadline()
+        delay = self.sleep_time if next_deadline is None else min(self.sleep_time, next_deadline - time.time())
+        try:
+            members = self.control.get(timeout=max(delay, 0))
+        except queue.Empty:
+            return
+        self.reshard(members)
+
+
+def run_shard_worker(*args):
+    ShardWorker(*args).run()
+
+
+class ShardSupervisor:
+    """Runs `workers` ShardWorker processes around one discard signer.
+
+    Workers are forked so they start from the loaded configuration. Every
+    batch they report is handed to `on_discard(campaign_type, campaign_ids)`
+    on the supervisor's thread, which is the only place transactions are
+    signed, so nonces never collide. When a worker exits, the remaining ones
+    get the new member list and take over its campaigns. `on_tick` runs on
+    the same thread at least every `check_interval` seconds.
+    """
+
+    def __init__(self, workers: int, config: dict, on_discard, metrics_port: int = None,
+                 check_interval: float = 1, on_tick=None):
+        self.config = config
+        self.on_discard = on_discard
+        self.on_tick = on_tick
+        self.metrics_port = metrics_port
+        self.check_interval = check_interval
+        self.members = [f'shard-{i}' for i in range(workers)]
+        self._context = multiprocessing.get_context('fork')
+        self.discards = self._context.Queue()
+        self.processes = {}
+        self.controls = {}
+
+    def start(self):
+        for i, name in enumerate(self.members):
+            control = self._context.Queue()
+            metrics_port = None if self.metrics_port is None else self.metrics_port + 1 + i
+            process = self._context.Process(
+                target=run_shard_worker, name=name, daemon=True,
+                args=(name, self.members, self.config, self.discards, control, metrics_port),
+            )
+            process.start()
+            self.processes[name] = process
+            self.controls[name] = control
+        logger.info('Started %d shard workers', len(self.members))
+
+    def run(self):
+        """Handles the reported discards until every worker is gone; `start`
+        the workers first."""
+        while True:
+            try:
+                campaign_type, campaign_ids = self.discards.get(timeout=self.check_interval)
+            except queue.Empty:
+                pass
+            else:
+                try:
+                    self.on_discard(campaign_type, campaign_ids)
+                except Exception as e:
+                    logger.error('Error discarding %d %s campaigns: %s', len(campaign_ids), campaign_type, e)
+            if self.on_tick is not None:
+                self.on_tick()
+            self._check_workers()
+
+    def _check_workers(self):
+        exited = [name for name, process in self.processes.items() if not process.is_alive()]
+        if not exited:
+            return
+        for name in exited:
+            logger.error('Shard worker %s exited with code %s, rebalancing its campaigns',
+                         name, self.processes[name].exitcode)
+            del self.processes[name]
+            del self.controls[name]
+        if not self.processes:
+            raise Exception("Every shard worker exited")
+
+        self.members = sorted(self.processes)
+        for control in self.controls.values():
+            control.put(self.members)
@@ -0,0 +1,99 @@
+from decimal import Decimal
+from typing import NamedTuple
+
+from web3 import Web3
+
+from .cache import LRUCache
+
+ERC20_METADATA_ABI = [
+    {
+        'inputs': [],
+        'name': 'decimals',
+        'outputs': [{'internalType': 'uint8', 'name': '', 'type': 'uint8'}],
+        'stateMutability': 'view',
+        'type': 'function',
+    },
+    {
+        'inputs': [],
+        'name': 'symbol',
+        'outputs': [{'internalType': 'string', 'name': '', 'type': 'string'}],
+        'stateMutability': 'view',
+        'type': 'function',
+    },
+]
+
+
+class TokenInfo(NamedTuple):
+    symbol: str
+    decimals: int
+
+
+class TokenMetadata:
+    """ERC-20 symbol and decimals of campaign tokens.
+
+    Both are fixed at deployment, so they are read once per token through
+    the multicall reader and kept in a bounded LRU cache. Tokens without
+    the optional metadata getters show up by address with 0 decimals.
+    """
+
+    def __init__(self, w3: Web3, reader, cache_size: int = 1024):
+        self.w3 = w3
+        self.reader = reader
+        self.cache = LRUCache('tokens', cache_size)
+
+    def get_many(self, token_addresses) -> dict:
+        """TokenInfo by address for every address of `token_addresses`."""
+        infos, missing = self._cached(token_addresses)
+        return self._fill(infos, missing, self.reader.aggregate(self._calls(missing)))
+
+    def get(self, token_address: str) -> TokenInfo:
+        return self.get_many([token_address])[token_address]
+
+    def totals(self, amounts: list) -> dict:
+        """Sums (token_address, raw amount) pairs per token symbol in whole units."""
+        return self._totals(amounts, self.get_many({token for token, _ in amounts}))
+
+    def _cached(self, token_addresses) -> tuple:
+        infos, missing = {}, []
+        for token_address in dict.fromkeys(token_addresses):
+            info = self.cache.get(token_address)
+            if info is None:
+                missing.append(token_address)
+            else:
+                infos[token_address] = info
+        return infos, missing
+
+    def _calls(self, token_addresses: list) -> list:
+        calls = []
+        for token_address in token_addresses:
+            token = self.w3.eth.contract(address=token_address, abi=ERC20_METADATA_ABI)
+            calls.extend([(token, 'symbol', ()), (token, 'decimals', ())])
+        return calls
+
+    def _fill(self, infos: dict, missing: list, results: list) -> dict:
+        for i, token_address in enumerate(missing):
+            symbol, decimals = results[2 * i], results[2 * i + 1]
+            infos[token_address] = TokenInfo(symbol or token_address, decimals or 0)
+            self.cache.put(token_address, infos[token_address])
+        return infos
+
+    def _totals(self, amounts: list, infos: dict) -> dict:
+        totals = {}
+        for token_address, amount in amounts:
+            info = infos[token_address]
+            totals[info.symbol] = totals.get(info.symbol, 0) + Decimal(amount).scaleb(-info.decimals)
+        return {symbol: str(total) for symbol, total in totals.items()}
+
+
+class AsyncTokenMetadata(TokenMetadata):
+    """TokenMetadata for AsyncWeb3; `reader` must be an AsyncMulticallReader."""
+
+    async def get_many(self, token_addresses) -> dict:
+        infos, missing = self._cached(token_addresses)
+        return self._fill(infos, missing, await self.reader.aggregate(self._calls(missing)))
+
+    async def get(self, token_address: str) -> TokenInfo:
+        return (await self.get_many([token_address]))[token_address]
+
+    async def totals(self, amounts: list) -> dict:
+        return self._totals(amounts, await self.get_many({token for token, _ in amounts}))
@@ -0,0 +1,20 @@
+import glob
+import json
+import os
+
+import pytest
+from web3 import Web3
+
+REPO = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..')
+
+
+@pytest.fixture(scope='session')
+def marketplace_abi():
+    build_info = glob.glob(os.path.join(REPO, 'ignition', 'deployments', '*', 'build-info', '*.json'))[0]
+    with open(build_info) as f:
+        return json.load(f)['output']['contracts']['contracts/Marketplace.sol']['Marketplace']['abi']
+
+
+@pytest.fixture
+def marketplace_contract(marketplace_abi):
+    return Web3().eth.contract(address='0x' + '11' * 20, abi=marketplace_abi)
@@ -0,0 +1,145 @@
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import aiohttp
+from aiohttp import web
+
+from credbuzz_oracle.backend import AsyncBackendNotifier, BackendNotifier, take_batch
+
+
+def test_take_batch_pops_the_oldest_updates():
+    pending = {'a': 'discarded', 'b': 'discarded', 'c': 'discarded'}
+    assert take_batch(pending, 2) == {'a': 'discarded', 'b': 'discarded'}
+    assert pending == {'c': 'discarded'}
+
+
+def notify_all_sync(routes: dict, updates: list, **kwargs) -> list:
+    requests = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+            requests.append((self.path, body))
+            status = routes[self.path]() if self.path in routes else 404
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', '2')
+            self.end_headers()
+            self.wfile.write(b'{}')
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        notifier = BackendNotifier(f'http://127.0.0.1:{server.server_port}', workers=1, batch_window=0.05,
+                                   backoff_factor=0.01, **kwargs)
+        notifier.start()
+        for campaign_id, status in updates:
+            assert notifier.notify(campaign_id, status)
+        notifier.flush()
+    finally:
+        server.shutdown()
+        server.server_close()
+    return requests
+
+
+def test_updates_are_coalesced_into_one_bulk_post():
+    requests = notify_all_sync(
+        {'/update-campaigns': lambda: 200},
+        [('0x01', 'discarded'), ('0x02', 'discarded'), ('0x01', 'discarded')],
+    )
+    assert requests == [('/update-campaigns', {'updates': [
+        {'campaign_id': '0x01', 'status': 'discarded'},
+        {'campaign_id': '0x02', 'status': 'discarded'},
+    ]})]
+
+
+def test_updates_fall_back_to_single_posts():
+    requests = notify_all_sync(
+        {'/update-campaign': lambda: 200},
+        [('0x01', 'discarded'), ('0x02', 'discarded')],
+    )
+    assert [path for path, _ in requests] == ['/update-campaigns', '/update-campaign', '/update-campaign']
+    assert [body for _, body in requests[1:]] == [
+        {'campaign_id': '0x01', 'status': 'discarded'},
+        {'campaign_id': '0x02', 'status': 'discarded'},
+    ]
+
+
+def test_updates_retry_server_errors():
+    statuses = iter([503, 200])
+    requests = notify_all_sync(
+        {'/update-campaign': lambda: next(statuses)},
+        [('0x01', 'discarded')],
+    )
+    assert len(requests) == 2
+
+
+def test_notify_refuses_new_campaigns_when_the_queue_is_full():
+    notifier = BackendNotifier('http://127.0.0.1:1', queue_size=1)
+    assert notifier.notify('0x01', 'discarded')
+    assert notifier.notify('0x01', 'discarded')
+    assert not notifier.notify('0x02', 'discarded')
+
+
+async def notify_all(routes: dict, updates: list, **kwargs) -> list:
+    requests = []
+
+    def handler(path):
+        async def handle(request):
+            requests.append((path, await request.json()))
+            return routes[path]()
+        return handle
+
+    app = web.Application()
+    for path in routes:
+        app.router.add_post(path, handler(path))
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = runner.addresses[0][1]
+    try:
+        async with aiohttp.ClientSession() as session:
+            notifier = AsyncBackendNotifier(f'http://127.0.0.1:{port}', session=session, batch_window=0.05,
+                                            backoff_factor=0.01, **kwargs)
+            task = asyncio.create_task(notifier.run())
+            for campaign_id, status in updates:
+                assert notifier.notify(campaign_id, status)
+            await asyncio.sleep(0.3)
+            task.cancel()
+    finally:
+        await runner.cleanup()
+    return requests
+
+
+def test_async_updates_are_coalesced_into_one_bulk_post():
+    requests = asyncio.run(notify_all(
+        {'/update-campaigns': lambda: web.json_response({})},
+        [('0x01', 'discarded'), ('0x02', 'discarded'), ('0x01', 'discarded')],
+    ))
+    assert requests == [('/update-campaigns', {'updates': [
+        {'campaign_id': '0x01', 'status': 'discarded'},
+        {'campaign_id': '0x02', 'status': 'discarded'},
+    ]})]
+
+
+def test_async_updates_fall_back_to_single_posts():
+    requests = asyncio.run(notify_all(
+        {'/update-campaigns': lambda: web.Response(status=404), '/update-campaign': lambda: web.json_response({})},
+        [('0x01', 'discarded'), ('0x02', 'discarded')],
+    ))
+    assert [path for path, _ in requests] == ['/update-campaigns', '/update-campaign', '/update-campaign']
+
+
+def test_async_updates_retry_server_errors():
+    statuses = iter([503, 200])
+    requests = asyncio.run(notify_all(
+        {'/update-campaign': lambda: web.json_response({}, status=next(statuses))},
+        [('0x01', 'discarded')],
+    ))
+    assert len(requests) == 2
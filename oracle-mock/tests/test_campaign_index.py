@@ -0,0 +1,165 @@
+import pytest
+from hexbytes import HexBytes
+
+from credbuzz_oracle.campaign_index import CampaignIndex
+from credbuzz_oracle.campaigns import PUBLIC, TARGETED, CampaignStatus, PublicCampaign, TargetedCampaign
+
+
+def targeted(campaign_id, status=CampaignStatus.ONGOING):
+    return TargetedCampaign(campaign_id, '0xcreator', '0xkol', 100, 1, '0xtoken', status)
+
+
+def public(campaign_id, status=CampaignStatus.ONGOING):
+    return PublicCampaign(campaign_id, '0xcreator', 100, 1, '0xtoken', status)
+
+
+class FakeMarketplace:
+    def __init__(self, contract, campaigns, fail_reads=False):
+        self.contract = contract
+        self.campaigns = campaigns
+        self.fail_reads = fail_reads
+        self.listed_at = []
+        self.invalidated = []
+        self.finalized = []
+
+    def list_campaign_ids(self, campaign_type, block):
+        self.listed_at.append(block)
+        return [campaign.id for key, campaign in self.campaigns.items() if key[0] == campaign_type]
+
+    def get_campaigns(self, campaign_type, campaign_ids):
+        if self.fail_reads and campaign_ids:
+            raise ConnectionError('rpc down')
+        return [self.campaigns.get((campaign_type, campaign_id)) for campaign_id in campaign_ids]
+
+    def invalidate(self, campaign_type, campaign_id):
+        self.invalidated.append((campaign_type, campaign_id))
+
+    def finalize(self, campaign_type, campaign_id, status):
+        self.finalized.append((campaign_type, campaign_id, status))
+        key = (campaign_type, campaign_id)
+        self.campaigns[key] = self.campaigns[key]._replace(campaign_status=status)
+
+
+class FakeEth:
+    block_number = 42
+
+
+class FakeWeb3:
+    eth = FakeEth()
+
+
+@pytest.fixture
+def campaigns():
+    return {
+        (TARGETED, b'a'): targeted(b'a'),
+        (TARGETED, b'b'): targeted(b'b', CampaignStatus.COMPLETED),
+        (PUBLIC, b'c'): public(b'c'),
+    }
+
+
+def test_bootstrap_keeps_the_ongoing_campaigns(marketplace_contract, campaigns):
+    marketplace = FakeMarketplace(marketplace_contract, campaigns)
+    index = CampaignIndex(FakeWeb3(), marketplace)
+
+    keys = index.bootstrap()
+
+    assert keys == {(TARGETED, b'a'), (TARGETED, b'b'), (PUBLIC, b'c')}
+    assert set(index.campaigns) == {(TARGETED, b'a'), (PUBLIC, b'c')}
+    assert index.last_block == 42
+    assert marketplace.listed_at == [42, 42]
+
+
+def test_failed_bootstrap_is_retried(marketplace_contract, campaigns):
+    marketplace = FakeMarketplace(marketplace_contract, campaigns, fail_reads=True)
+    index = CampaignIndex(FakeWeb3(), marketplace)
+
+    with pytest.raises(ConnectionError):
+        index.bootstrap()
+    assert index.last_block is None
+
+    marketplace.fail_reads = False
+    index.bootstrap()
+    assert index.last_block == 42
+    assert set(index.campaigns) == {(TARGETED, b'a'), (PUBLIC, b'c')}
+
+
+def test_bootstrap_only_keeps_owned_campaigns(marketplace_contract, campaigns):
+    index = CampaignIndex(FakeWeb3(), FakeMarketplace(marketplace_contract, campaigns),
+                          owns=lambda key: key[0] == PUBLIC)
+    assert index.bootstrap() == {(PUBLIC, b'c')}
+    assert set(index.campaigns) == {(PUBLIC, b'c')}
+
+
+def log(contract, event_name, campaign_id, block=43, removed=False):
+    return {'topics': [HexBytes(contract.events[event_name].topic), HexBytes(campaign_id.ljust(32, b'\0'))],
+            'blockNumber': block, 'removed': removed}
+
+
+def test_final_logs_alone_only_set_the_status(marketplace_contract):
+    index = CampaignIndex(FakeWeb3(), FakeMarketplace(marketplace_contract, {}))
+    index.ingest([log(marketplace_contract, 'TargetedCampaignDiscarded', b'a'),
+                  log(marketplace_contract, 'PublicCampaignCompleted', b'c')])
+
+    assert index._take_dirty() == {
+        (TARGETED, b'a'.ljust(32, b'\0')): CampaignStatus.DISCARDED,
+        (PUBLIC, b'c'.ljust(32, b'\0')): CampaignStatus.COMPLETED,
+    }
+
+
+@pytest.mark.parametrize('event_names', [
+    ('TargetedCampaignUpdated', 'TargetedCampaignDiscarded'),
+    ('TargetedCampaignDiscarded', 'TargetedCampaignUpdated'),
+    ('TargetedCampaignFulfilled', 'TargetedCampaignDiscarded'),
+])
+def test_mixed_logs_need_a_re_read(marketplace_contract, event_names):
+    index = CampaignIndex(FakeWeb3(), FakeMarketplace(marketplace_contract, {}))
+    for event_name in event_names:
+        # across separate ingests too, the merge sees the earlier status
+        index.ingest([log(marketplace_contract, event_name, b'a')])
+
+    assert index._take_dirty() == {(TARGETED, b'a'.ljust(32, b'\0')): None}
+
+
+def test_final_logs_removed_by_a_reorg_need_a_re_read(marketplace_contract):
+    index = CampaignIndex(FakeWeb3(), FakeMarketplace(marketplace_contract, {}))
+    index.ingest([log(marketplace_contract, 'TargetedCampaignDiscarded', b'a', removed=True)])
+
+    assert index._take_dirty() == {(TARGETED, b'a'.ljust(32, b'\0')): None}
+
+
+def test_logs_of_other_shards_are_ignored(marketplace_contract):
+    index = CampaignIndex(FakeWeb3(), FakeMarketplace(marketplace_contract, {}),
+                          owns=lambda key: key[0] == PUBLIC)
+    index.ingest([log(marketplace_contract, 'TargetedCampaignCreated', b'a'),
+                  log(marketplace_contract, 'PublicCampaignCreated', b'c')])
+
+    assert index._take_dirty() == {(PUBLIC, b'c'.ljust(32, b'\0')): None}
+
+
+def test_streamed_logs_are_applied_on_sync(marketplace_contract):
+    a, c = b'a'.ljust(32, b'\0'), b'c'.ljust(32, b'\0')
+    marketplace = FakeMarketplace(marketplace_contract, {(TARGETED, a): targeted(a), (PUBLIC, c): public(c)})
+    index = CampaignIndex(FakeWeb3(), marketplace)
+    index.bootstrap()
+    marketplace.invalidated.clear()
+
+    index.ingest([log(marketplace_contract, 'TargetedCampaignDiscarded', a),
+                  log(marketplace_contract, 'PublicCampaignUpdated', c)])
+
+    assert index.sync(poll_logs=False) == {(TARGETED, a), (PUBLIC, c)}
+    assert marketplace.finalized == [(TARGETED, a, CampaignStatus.DISCARDED)]
+    assert marketplace.invalidated == [(PUBLIC, c)]
+    assert set(index.campaigns) == {(PUBLIC, c)}
+
+
+def test_failed_refresh_requeues_the_events(marketplace_contract):
+    a = b'a'.ljust(32, b'\0')
+    marketplace = FakeMarketplace(marketplace_contract, {(TARGETED, a): targeted(a)})
+    index = CampaignIndex(FakeWeb3(), marketplace)
+    index.bootstrap()
+    index.ingest([log(marketplace_contract, 'TargetedCampaignUpdated', a)])
+
+    marketplace.fail_reads = True
+    with pytest.raises(ConnectionError):
+        index.sync(poll_logs=False)
+    assert index._take_dirty() == {(TARGETED, a): None}
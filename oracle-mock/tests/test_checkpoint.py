@@ -0,0 +1,73 @@
+import sqlite3
+
+import pytest
+
+from credbuzz_oracle.campaigns import PUBLIC, TARGETED
+from credbuzz_oracle.checkpoint import CheckpointStore
+
+MARKETPLACE = '0x' + 'AB' * 20
+A, B = b'a' * 32, b'b' * 32
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / 'checkpoint.sqlite3')
+
+
+def test_nothing_checkpointed_yet(path):
+    assert CheckpointStore(path, MARKETPLACE).load_campaigns() == (None, {})
+
+
+def test_campaigns_survive_a_reopen(path):
+    store = CheckpointStore(path, MARKETPLACE)
+    store.save_campaigns(10, [((TARGETED, A), 0, 100, '0xtoken', b'info-a'),
+                              ((PUBLIC, B), 0, 200, '0xtoken', b'info-b')], [])
+    store.save_campaigns(11, [], [(PUBLIC, B)])
+    store.close()
+
+    assert CheckpointStore(path, MARKETPLACE).load_campaigns() == (11, {(TARGETED, A): b'info-a'})
+
+
+def test_another_marketplace_starts_over(path):
+    store = CheckpointStore(path, MARKETPLACE)
+    store.save_campaigns(10, [((TARGETED, A), 0, 100, '0xtoken', b'info-a')], [])
+    store.add_pending(3, b'h1', [(TARGETED, A)])
+    store.close()
+
+    store = CheckpointStore(path, '0x' + 'cd' * 20)
+    assert store.load_campaigns() == (None, {})
+    assert store.load_pending() == []
+
+
+def test_replacements_are_kept_next_to_the_original(path):
+    store = CheckpointStore(path, MARKETPLACE)
+    store.add_pending(3, b'h1', [(TARGETED, A), (TARGETED, B)])
+    store.add_pending(4, b'h2', [(PUBLIC, A)])
+    store.add_pending(3, b'h3', [(TARGETED, A), (TARGETED, B)])
+    store.add_pending(3, b'h3', [(TARGETED, A), (TARGETED, B)])
+    store.close()
+
+    store = CheckpointStore(path, MARKETPLACE)
+    assert store.load_pending() == [
+        (3, [b'h1', b'h3'], [(TARGETED, A), (TARGETED, B)]),
+        (4, [b'h2'], [(PUBLIC, A)]),
+    ]
+
+    store.remove_pending([3])
+    assert store.load_pending() == [(4, [b'h2'], [(PUBLIC, A)])]
+
+
+def test_pending_nonces_keyed_by_nonce_alone_are_migrated(path):
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.executescript("""
+        CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+        CREATE TABLE pending_txs (nonce INTEGER PRIMARY KEY, tx_hash BLOB NOT NULL, campaign_type TEXT,
+                                  campaign_id BLOB);
+    """)
+    conn.execute('INSERT INTO meta VALUES (?, ?)', ('marketplace_address', MARKETPLACE.lower()))
+    conn.execute('INSERT INTO pending_txs VALUES (?, ?, ?, ?)', (3, b'h1', TARGETED, A))
+    conn.close()
+
+    store = CheckpointStore(path, MARKETPLACE)
+    store.add_pending(3, b'h2', [(TARGETED, A)])
+    assert store.load_pending() == [(3, [b'h1', b'h2'], [(TARGETED, A)])]
@@ -0,0 +1,65 @@
+import logging
+
+import pytest
+from pydantic import ValidationError
+
+from credbuzz_oracle.config import OracleConfig, load_config
+
+KEY = 'ab' * 32
+RPC_URL = 'https://base-mainnet.g.alchemy.com/v2/secret-api-key'
+
+
+@pytest.fixture
+def environ(tmp_path):
+    abi_path = tmp_path / 'abi.json'
+    abi_path.write_text('[]')
+    return {
+        'BASE_ALCHEMY_RPC_URL': RPC_URL,
+        'BASE_PRIVATE_KEY': KEY,
+        'MARKETPLACE_ADDRESS': '0x' + '11' * 20,
+        'MARKETPLACE_ABI_PATH': str(abi_path),
+        'USDC_ADDRESS': '0x' + '22' * 20,
+        'USDC_ABI_PATH': str(abi_path),
+        'BASE_URL': 'http://backend:8000/',
+    }
+
+
+def test_from_env(environ):
+    config = OracleConfig.from_env(environ)
+    assert config.rpc_urls == [RPC_URL]
+    assert config.private_key.get_secret_value() == KEY
+    assert config.backend_url == 'http://backend:8000'
+    assert KEY not in repr(config)
+
+
+def test_errors_do_not_echo_secrets(environ):
+    environ['BASE_PRIVATE_KEY'] = KEY[:-1] + 'z'
+    environ['BASE_RPC_URLS'] = 'ftp://node/secret-api-key'
+    with pytest.raises(ValidationError) as excinfo:
+        OracleConfig.from_env(environ)
+    message = str(excinfo.value)
+    assert 'private_key' in message and 'rpc_urls' in message
+    assert environ['BASE_PRIVATE_KEY'] not in message
+    assert 'secret-api-key' not in message
+
+
+def test_load_config_logs_errors_without_input(environ, caplog):
+    environ['BASE_PRIVATE_KEY'] = KEY[:-1] + 'z'
+    with caplog.at_level(logging.ERROR):
+        assert load_config(environ) is None
+    assert 'private_key' in caplog.text
+    assert environ['BASE_PRIVATE_KEY'] not in caplog.text
+
+
+def test_backend_url_is_required(environ):
+    del environ['BASE_URL']
+    with pytest.raises(ValidationError, match='backend_url'):
+        OracleConfig.from_env(environ)
+
+
+def test_changes_split_live_and_restart_fields(environ):
+    config = OracleConfig.from_env(environ)
+    environ.update({'SWEEP_INTERVAL': '5', 'BASE_PRIVATE_KEY': 'cd' * 32})
+    live, restart = config.changes(OracleConfig.from_env(environ))
+    assert live == {'sleep_time': 5}
+    assert restart == ['private_key']
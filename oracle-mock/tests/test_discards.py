@@ -0,0 +1,52 @@
+import pytest
+from eth_utils import function_abi_to_4byte_selector
+from web3 import Web3
+
+from credbuzz_oracle.campaigns import BATCH_DISCARD_FNS
+from credbuzz_oracle.discards import (DISCARD_BASE_GAS, DISCARD_GAS_PER_CAMPAIGN, chunk_discards, revert_errors, revert_name,
+                      supports_batch_discard)
+
+
+def test_chunks_stay_within_the_gas_limit():
+    campaign_ids = list(range(10))
+    batches = chunk_discards(campaign_ids, DISCARD_BASE_GAS + 3 * DISCARD_GAS_PER_CAMPAIGN)
+
+    assert batches == [[0, 1, 2], [3, 4, 5], [6, 7, 8], [9]]
+
+
+def test_small_limits_still_discard_one_campaign_per_batch():
+    assert chunk_discards([1, 2], DISCARD_BASE_GAS) == [[1], [2]]
+
+
+def test_no_campaigns_no_batches():
+    assert chunk_discards([]) == []
+
+
+@pytest.mark.parametrize('data, name', [
+    ('0xce1befcb', 'CampaignNotFound'),
+    ('0x08c379a0' + '00' * 64, 'Error'),
+    ('0xdeadbeef', 'Reverted'),
+    (None, 'Reverted'),
+])
+def test_revert_name(marketplace_contract, data, name):
+    assert revert_name(revert_errors(marketplace_contract), data) == name
+
+
+BATCH_DISCARD_ABI = [
+    {'type': 'function', 'name': name, 'stateMutability': 'nonpayable', 'outputs': [],
+     'inputs': [{'name': 'campaignIds', 'type': 'bytes32[]'}]}
+    for name in BATCH_DISCARD_FNS.values()
+]
+
+
+def test_deployed_marketplace_without_batch_discard(marketplace_contract):
+    # the Base deployment predates the batch entry points
+    assert not supports_batch_discard(marketplace_contract, b'\x60\x80' * 100)
+
+
+def test_batch_discard_needs_the_abi_and_the_bytecode(marketplace_abi):
+    contract = Web3().eth.contract(address='0x' + '11' * 20, abi=marketplace_abi + BATCH_DISCARD_ABI)
+    code = b''.join(b'\x63' + function_abi_to_4byte_selector(entry) for entry in BATCH_DISCARD_ABI)
+
+    assert supports_batch_discard(contract, code)
+    assert not supports_batch_discard(contract, code[:5])
@@ -0,0 +1,48 @@
+from credbuzz_oracle.fee_oracle import FeeOracle
+
+
+class FakeCall:
+    signature = 'batchDiscardTargetedCampaigns(bytes32[])'
+
+    def __init__(self, per_item=30000, base=21000):
+        self.per_item = per_item
+        self.base = base
+        self.count = 0
+        self.estimates = 0
+
+    def __call__(self, count):
+        self.count = count
+        return self
+
+    def estimate_gas(self, transaction):
+        self.estimates += 1
+        return self.base + self.per_item * self.count
+
+
+def test_gas_is_memoized_per_item_and_scaled():
+    fee_oracle = FeeOracle(None, estimate_margin=1)
+    call = FakeCall()
+    assert fee_oracle.gas(call(10), 'targeted', 10, '0xowner') == 21000 + 30000 * 10
+    assert fee_oracle.gas(call(15), 'targeted', 15, '0xowner') == 21000 + 30000 * 15
+    assert call.estimates == 1
+
+
+def test_gas_is_estimated_again_for_a_different_batch_shape():
+    fee_oracle = FeeOracle(None, estimate_margin=1)
+    call = FakeCall()
+    fee_oracle.gas(call(10), 'targeted', 10, '0xowner')
+    fee_oracle.gas(call(21), 'targeted', 21, '0xowner')
+    fee_oracle.gas(call(4), 'targeted', 4, '0xowner')
+    assert call.estimates == 3
+
+
+def test_forget_drops_the_estimates_of_a_campaign_type():
+    fee_oracle = FeeOracle(None, estimate_margin=1)
+    call = FakeCall()
+    fee_oracle.gas(call(10), 'targeted', 10, '0xowner')
+    fee_oracle.gas(call(10), 'public', 10, '0xowner')
+    fee_oracle.forget('targeted')
+    call.per_item = 40000
+    assert fee_oracle.gas(call(10), 'targeted', 10, '0xowner') == 21000 + 40000 * 10
+    assert fee_oracle.gas(call(10), 'public', 10, '0xowner') == 21000 + 30000 * 10
+    assert call.estimates == 3
@@ -0,0 +1,79 @@
+import time
+
+from credbuzz_oracle.leader import LeaderElector, SqliteLease
+
+
+class FlakyLease:
+    def __init__(self):
+        self.fail = False
+
+    def acquire(self, holder, ttl):
+        if self.fail:
+            raise ConnectionError('lease store down')
+        return True
+
+    def release(self, holder):
+        pass
+
+
+def elector(backend, events, **kwargs):
+    return LeaderElector(backend, on_elected=lambda: events.append('elected'),
+                         on_demoted=lambda: events.append('demoted'), **kwargs)
+
+
+def test_only_one_replica_holds_the_lease(tmp_path):
+    path = str(tmp_path / 'lease.sqlite3')
+    events_a, events_b = [], []
+    a = elector(SqliteLease(path), events_a, holder='a')
+    b = elector(SqliteLease(path), events_b, holder='b')
+
+    a.renew()
+    b.renew()
+    a.renew()
+
+    assert a.is_leader and not b.is_leader
+    assert events_a == ['elected'] and events_b == []
+
+
+def test_standby_takes_over_once_the_lease_expires(tmp_path):
+    path = str(tmp_path / 'lease.sqlite3')
+    a = LeaderElector(SqliteLease(path), holder='a', ttl=0.1, safety_margin=0.05)
+    b = LeaderElector(SqliteLease(path), holder='b', ttl=0.1, safety_margin=0.05)
+
+    a.renew()
+    b.renew()
+    assert not b.is_leader
+
+    time.sleep(0.15)
+    b.renew()
+    assert b.is_leader
+    # a stopped renewing, it stood down before b could take over
+    assert not a.is_leader
+
+
+def test_released_lease_is_free_right_away(tmp_path):
+    path = str(tmp_path / 'lease.sqlite3')
+    a = LeaderElector(SqliteLease(path), holder='a')
+    b = LeaderElector(SqliteLease(path), holder='b')
+
+    a.renew()
+    a.stop()
+    b.renew()
+
+    assert b.is_leader and not a.is_leader
+
+
+def test_leader_stands_down_when_renewals_fail():
+    backend = FlakyLease()
+    events = []
+    replica = elector(backend, events, ttl=0.1, safety_margin=0.05)
+
+    replica.renew()
+    backend.fail = True
+    replica.renew()
+    assert replica.is_leader
+
+    time.sleep(0.06)
+    replica.renew()
+    assert not replica.is_leader
+    assert events == ['elected', 'demoted']
@@ -0,0 +1,107 @@
+import pytest
+from eth_abi import decode, encode
+from web3 import Web3
+from web3.providers.base import BaseProvider
+
+from credbuzz_oracle.multicall import MULTICALL3_ADDRESS, MulticallReader
+
+TARGET = '0x' + '22' * 20
+DOUBLE_ABI = [{
+    'type': 'function', 'name': 'double', 'stateMutability': 'view',
+    'inputs': [{'name': 'x', 'type': 'uint256'}], 'outputs': [{'name': '', 'type': 'uint256'}],
+}]
+AGGREGATE3_SELECTOR = Web3.keccak(text='aggregate3((address,bool,bytes)[])')[:4]
+# double(x) reverts for this x
+REVERTING = 13
+
+
+class FakeNode(BaseProvider):
+    """Answers aggregate3 like Multicall3 would, failing batches above `max_calls`."""
+
+    def __init__(self, max_calls=None, multicall=True):
+        super().__init__()
+        self.max_calls = max_calls
+        self.multicall = multicall
+        self.batches = []
+        self.single_calls = 0
+
+    def make_request(self, method, params):
+        if method == 'eth_chainId':
+            return self._result('0x2105')
+        if method == 'eth_getCode':
+            return self._result('0x6080' if self.multicall else '0x')
+        data = bytes.fromhex(params[0]['data'][2:])
+        if data[:4] != AGGREGATE3_SELECTOR:
+            self.single_calls += 1
+            result = self._double(data)
+            if result is None:
+                return {'jsonrpc': '2.0', 'id': 1, 'error': {'code': 3, 'message': 'execution reverted', 'data': '0x'}}
+            return self._result('0x' + result.hex())
+        calls, = decode(['(address,bool,bytes)[]'], data[4:])
+        self.batches.append(len(calls))
+        if self.max_calls is not None and len(calls) > self.max_calls:
+            return {'jsonrpc': '2.0', 'id': 1, 'error': {'code': -32000, 'message': 'out of gas'}}
+        results = [(result is not None, result or b'') for result in (self._double(call) for _, _, call in calls)]
+        return self._result('0x' + encode(['(bool,bytes)[]'], [results]).hex())
+
+    def _double(self, call_data: bytes):
+        x, = decode(['uint256'], call_data[4:])
+        return None if x == REVERTING else encode(['uint256'], [2 * x])
+
+    def _result(self, result):
+        return {'jsonrpc': '2.0', 'id': 1, 'result': result}
+
+
+def reader(node, **kwargs):
+    w3 = Web3(node)
+    return MulticallReader(w3, MULTICALL3_ADDRESS, **kwargs), w3.eth.contract(address=TARGET, abi=DOUBLE_ABI)
+
+
+def test_results_come_back_in_input_order():
+    node = FakeNode()
+    multicall, contract = reader(node)
+
+    assert multicall.read(contract, 'double', [(x,) for x in range(5)]) == [0, 2, 4, 6, 8]
+    assert node.batches == [5]
+
+
+def test_batches_are_cut_at_the_call_count():
+    node = FakeNode()
+    multicall, contract = reader(node, max_batch_size=2)
+
+    assert multicall.read(contract, 'double', [(x,) for x in range(5)]) == [0, 2, 4, 6, 8]
+    assert node.batches == [2, 2, 1]
+
+
+@pytest.mark.parametrize('limits', [
+    {'max_batch_gas': 50_000, 'gas_per_call': 25_000},
+    # 4 words of result overhead plus the uint256 of each call
+    {'max_response_bytes': 2 * 5 * 32},
+])
+def test_batches_are_cut_at_the_gas_and_response_size_limits(limits):
+    node = FakeNode()
+    multicall, contract = reader(node, **limits)
+
+    assert multicall.read(contract, 'double', [(x,) for x in range(5)]) == [0, 2, 4, 6, 8]
+    assert node.batches == [2, 2, 1]
+
+
+def test_rejected_batches_are_bisected():
+    node = FakeNode(max_calls=2)
+    multicall, contract = reader(node)
+
+    assert multicall.read(contract, 'double', [(x,) for x in range(5)]) == [0, 2, 4, 6, 8]
+    assert node.batches == [5, 2, 3, 1, 2]
+
+
+def test_reverted_calls_read_as_none():
+    multicall, contract = reader(FakeNode())
+    assert multicall.read(contract, 'double', [(1,), (REVERTING,), (3,)]) == [2, None, 6]
+
+
+def test_without_multicall3_every_call_is_sent_alone():
+    node = FakeNode(multicall=False)
+    multicall, contract = reader(node)
+
+    assert multicall.read(contract, 'double', [(1,), (REVERTING,), (3,)]) == [2, None, 6]
+    assert node.batches == [] and node.single_calls == 3
@@ -0,0 +1,172 @@
+import asyncio
+
+from web3.exceptions import TransactionNotFound
+
+from credbuzz_oracle.nonce_manager import AsyncNonceManager, NonceManager
+
+
+class FakeEth:
+    def __init__(self, latest=10, pending=None, known=(), mined=()):
+        self.latest = latest
+        self.pending = latest if pending is None else pending
+        self.known = set(known)
+        self.mined = set(mined)
+
+    def get_transaction_count(self, address, block):
+        return self.pending if block == 'pending' else self.latest
+
+    def get_transaction(self, tx_hash):
+        if tx_hash not in self.known:
+            raise TransactionNotFound(tx_hash)
+        return {'hash': tx_hash}
+
+    def get_transaction_receipt(self, tx_hash):
+        if tx_hash not in self.mined:
+            raise TransactionNotFound(tx_hash)
+        return {'transactionHash': tx_hash, 'status': 1}
+
+
+class FakeWeb3:
+    def __init__(self, eth):
+        self.eth = eth
+
+
+class AsyncFakeEth(FakeEth):
+    async def get_transaction_count(self, address, block):
+        return super().get_transaction_count(address, block)
+
+    async def get_transaction(self, tx_hash):
+        return super().get_transaction(tx_hash)
+
+    async def get_transaction_receipt(self, tx_hash):
+        return super().get_transaction_receipt(tx_hash)
+
+
+def manager(**kwargs):
+    return NonceManager(FakeWeb3(FakeEth(**kwargs)), '0xowner')
+
+
+def test_allocates_from_the_pending_count():
+    nonces = manager(latest=10, pending=12)
+    assert [nonces.allocate() for _ in range(3)] == [12, 13, 14]
+
+
+def test_released_nonces_are_reused_first():
+    nonces = manager()
+    first, second, third = nonces.allocate(), nonces.allocate(), nonces.allocate()
+    nonces.release(second)
+    nonces.sent(first, 'a')
+    nonces.sent(third, 'c')
+    assert nonces.allocate() == second
+    assert nonces.allocate() == 13
+
+
+def test_resync_keeps_nonces_being_signed():
+    nonces = manager()
+    nonce = nonces.allocate()
+    assert nonces.resync() == []
+    nonces.sent(nonce, 'a')
+    assert nonces.allocate() == nonce + 1
+
+
+def test_resync_frees_the_gap_left_by_dropped_transactions():
+    eth = FakeEth(latest=10, known={'b'})
+    nonces = NonceManager(FakeWeb3(eth), '0xowner')
+    for tx_hash in ('a', 'b', 'c'):
+        nonces.sent(nonces.allocate(), tx_hash)
+    reserved = nonces.allocate()
+
+    assert sorted(nonces.resync()) == ['a', 'c']
+    assert nonces.pending == {11: ['b']}
+    # 10 and 12 were dropped, 13 is still being signed
+    assert [nonces.allocate(), nonces.allocate(), nonces.allocate()] == [10, 12, 14]
+    nonces.sent(reserved, 'd')
+
+
+def test_resync_forgets_mined_transactions():
+    eth = FakeEth(latest=10, mined={'a', 'b'})
+    nonces = NonceManager(FakeWeb3(eth), '0xowner')
+    nonces.sent(nonces.allocate(), 'a')
+    nonces.sent(nonces.allocate(), 'b')
+    eth.latest = 12
+    assert nonces.resync() == []
+    assert nonces.pending == {}
+    assert nonces.allocate() == 12
+
+
+def test_released_nonce_below_the_chain_is_not_reused_after_resync():
+    eth = FakeEth(latest=10)
+    nonces = NonceManager(FakeWeb3(eth), '0xowner')
+    nonce = nonces.allocate()
+    # another sender used the nonce, the send failed with "nonce too low"
+    eth.latest = 11
+    nonces.release(nonce)
+    nonces.resync()
+    assert nonces.allocate() == 11
+
+
+def test_reset_skips_nonces_being_signed():
+    eth = FakeEth(latest=10)
+    nonces = NonceManager(FakeWeb3(eth), '0xowner')
+    nonces.allocate()
+    nonces.reset()
+    assert nonces.allocate() == 11
+
+
+def test_async_resync_keeps_nonces_being_signed():
+    async def run():
+        nonces = AsyncNonceManager(FakeWeb3(AsyncFakeEth(latest=10)), '0xowner')
+        nonce = await nonces.allocate()
+        await nonces.resync()
+        nonces.sent(nonce, 'a')
+        return nonce, await nonces.allocate()
+
+    assert asyncio.run(run()) == (10, 11)
+
+
+def test_resync_skips_nonces_held_by_unknown_pooled_transactions():
+    eth = FakeEth(latest=10)
+    nonces = NonceManager(FakeWeb3(eth), '0xowner')
+    nonce = nonces.allocate()
+    # another sender's transaction holds nonce 10, ours was rejected as underpriced
+    eth.pending = 11
+    nonces.release(nonce)
+    nonces.resync()
+    assert nonces.allocate() == 11
+
+
+def test_nonce_mined_without_our_transactions_counts_as_dropped():
+    eth = FakeEth(latest=10)
+    nonces = NonceManager(FakeWeb3(eth), '0xowner')
+    nonce = nonces.allocate()
+    nonces.sent(nonce, 'a')
+    nonces.sent(nonce, 'a2')
+    # a previous leader's transaction took the nonce
+    eth.latest = 11
+
+    assert nonces.resync() == ['a2']
+    assert nonces.pending == {}
+    assert nonces.allocate() == 11
+
+
+def test_nonce_mined_with_a_replaced_transaction_is_not_dropped():
+    eth = FakeEth(latest=10, mined={'a'})
+    nonces = NonceManager(FakeWeb3(eth), '0xowner')
+    nonce = nonces.allocate()
+    nonces.sent(nonce, 'a')
+    nonces.sent(nonce, 'a2')
+    eth.latest = 11
+
+    assert nonces.resync() == []
+    assert nonces.pending == {}
+
+
+def test_async_nonce_mined_without_our_transactions_counts_as_dropped():
+    async def run():
+        eth = AsyncFakeEth(latest=10)
+        nonces = AsyncNonceManager(FakeWeb3(eth), '0xowner')
+        nonces.sent(await nonces.allocate(), 'a')
+        eth.latest = 11
+        return await nonces.resync()
+
+    assert asyncio.run(run()) == ['a']
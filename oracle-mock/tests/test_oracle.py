@@ -0,0 +1,188 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from credbuzz_oracle.async_oracle import AsyncOracle
+from credbuzz_oracle.campaigns import TARGETED
+from credbuzz_oracle.oracle import Oracle
+from credbuzz_oracle.scheduler import DeadlineScheduler
+
+SLEEP_TIME = 0.05
+
+
+class Stop(BaseException):
+    pass
+
+
+class FakeIndex:
+    """Synced index that stops the oracle loop after `max_syncs` syncs."""
+
+    def __init__(self, max_syncs=None):
+        self.last_block = 1
+        self.campaigns = {}
+        self.syncs = 0
+        self.max_syncs = max_syncs
+
+    def sync(self, poll_logs=True):
+        self.syncs += 1
+        if self.max_syncs is not None and self.syncs > self.max_syncs:
+            raise Stop()
+        return set()
+
+    def get(self, key):
+        return None
+
+
+class Standby:
+    is_leader = False
+
+
+def standby(oracle_class, **index_kwargs):
+    config = SimpleNamespace(sleep_time=SLEEP_TIME, max_concurrency=4)
+    oracle = oracle_class(config)
+    oracle.campaign_index = FakeIndex(**index_kwargs)
+    oracle.leader_elector = Standby()
+    oracle.log_stream = None
+    oracle.deadline_scheduler = DeadlineScheduler()
+    # due for a while, only the leader would pop it
+    oracle.deadline_scheduler.schedule((TARGETED, b'a'), time.time() - 60)
+    return oracle
+
+
+def test_standby_sleeps_between_sweeps_despite_due_deadlines():
+    oracle = standby(Oracle, max_syncs=3)
+    oracle.start = lambda: None
+
+    started = time.time()
+    with pytest.raises(Stop):
+        oracle.run()
+
+    assert time.time() - started >= 3 * SLEEP_TIME
+    assert len(oracle.deadline_scheduler) == 1
+
+
+def test_async_standby_sleeps_despite_due_deadlines():
+    oracle = standby(AsyncOracle)
+
+    started = time.time()
+    asyncio.run(oracle.wait_for_work())
+
+    assert time.time() - started >= SLEEP_TIME
+    assert len(oracle.deadline_scheduler) == 1
+
+
+def test_election_wakes_a_standby():
+    oracle = standby(Oracle)
+    oracle.leader_elector.is_leader = True
+    oracle.nonce_manager = SimpleNamespace(reset=lambda: None)
+    oracle.on_elected()
+
+    started = time.time()
+    assert oracle.deadline_scheduler.wait(5, deadlines=False) is False
+    assert time.time() - started < 1
+
+
+class FakeReceiptTracker:
+    def __init__(self):
+        self.tracked = []
+
+    def track(self, tx_hashes, timeout):
+        self.tracked.append(list(tx_hashes))
+        return SimpleNamespace(add_done_callback=lambda callback: None)
+
+
+def test_resumed_discards_track_every_replacement():
+    oracle = Oracle(SimpleNamespace(receipt_timeout=180))
+    oracle.nonce_manager = SimpleNamespace(restore=lambda: [(3, [b'h1', b'h2'], [(TARGETED, b'a'), (TARGETED, b'b')])])
+    oracle.receipt_tracker = FakeReceiptTracker()
+
+    oracle.resume_pending_discards()
+
+    assert oracle.receipt_tracker.tracked == [[b'h1', b'h2']]
+    assert oracle.pending_discards == {(TARGETED, b'a'): 3, (TARGETED, b'b'): 3}
+
+
+def test_discard_whose_nonce_was_taken_is_retried():
+    oracle = Oracle(SimpleNamespace(retry_delay=30, retry_max_delay=900))
+    # resync reports the nonce as mined by a transaction we did not send
+    oracle.nonce_manager = SimpleNamespace(resync=lambda: [b'h2'])
+    oracle.pending_discards = {(TARGETED, b'a'): 3}
+
+    oracle.on_discard_stuck(TARGETED, [b'a'], 3, [b'h1', b'h2'])
+
+    assert oracle.pending_discards == {}
+    assert len(oracle.deadline_scheduler) == 1
+
+
+class FailingIndex(FakeIndex):
+    def sync(self, poll_logs=True):
+        if self.syncs == 0:
+            self.syncs += 1
+            raise ConnectionError('Error calling eth_blockNumber on every RPC endpoint')
+        return super().sync(poll_logs)
+
+
+def test_failed_sweep_does_not_stop_the_loop(caplog):
+    oracle = Oracle(SimpleNamespace(sleep_time=SLEEP_TIME))
+    oracle.start = lambda: None
+    oracle.campaign_index = FailingIndex(max_syncs=2)
+    oracle.leader_elector = None
+    oracle.log_stream = None
+
+    with pytest.raises(Stop):
+        oracle.run()
+    assert oracle.campaign_index.syncs == 3
+    assert [record.exc_info[0] for record in caplog.records if record.exc_info] == [Exception]
+
+
+class FakeNonceManager:
+    def __init__(self, *resyncs):
+        self.resyncs = list(resyncs)
+
+    def resync(self):
+        return self.resyncs.pop(0)
+
+
+def stuck_oracle(replace_error, *resyncs):
+    oracle = Oracle(SimpleNamespace(retry_delay=30, retry_max_delay=900, receipt_timeout=180))
+    oracle.leader_elector = None
+    oracle.nonce_manager = FakeNonceManager(*resyncs)
+    oracle.discard_preflight = SimpleNamespace(errors={})
+    oracle.receipt_tracker = FakeReceiptTracker()
+    oracle.pending_discards = {(TARGETED, b'a'): 3}
+
+    def replace_discard(campaign_type, campaign_ids, nonce, tx_hash):
+        raise replace_error
+
+    oracle.replace_discard = replace_discard
+    return oracle
+
+
+def test_replacement_finding_its_nonce_used_by_another_sender_is_retried():
+    oracle = stuck_oracle(ValueError('nonce too low'), [], [b'h1'])
+
+    oracle.on_discard_stuck(TARGETED, [b'a'], 3, [b'h1'])
+
+    assert oracle.pending_discards == {}
+    assert oracle.receipt_tracker.tracked == []
+
+
+def test_replacement_finding_its_nonce_mined_by_us_waits_for_the_receipt():
+    oracle = stuck_oracle(ValueError('nonce too low'), [], [])
+
+    oracle.on_discard_stuck(TARGETED, [b'a'], 3, [b'h1'])
+
+    assert oracle.pending_discards == {(TARGETED, b'a'): 3}
+    assert oracle.receipt_tracker.tracked == [[b'h1']]
+
+
+def test_underpriced_replacement_is_bumped_again():
+    oracle = stuck_oracle(ValueError('replacement transaction underpriced'), [])
+
+    oracle.on_discard_stuck(TARGETED, [b'a'], 3, [b'h1'])
+
+    # no second resync, the stuck transaction still holds the nonce
+    assert oracle.nonce_manager.resyncs == []
+    assert oracle.receipt_tracker.tracked == [[b'h1']]
@@ -0,0 +1,60 @@
+import pytest
+from web3.exceptions import ContractCustomError, TimeExhausted
+
+from credbuzz_oracle.discards import revert_errors
+from credbuzz_oracle.outcomes import BACKOFF, RETRY_NEW_NONCE, RETRY_SAME_NONCE, TERMINAL, RetryPolicy, classify
+
+
+def custom_error(data: str) -> ContractCustomError:
+    return ContractCustomError(data, data=data)
+
+
+@pytest.fixture
+def errors(marketplace_contract):
+    return revert_errors(marketplace_contract)
+
+
+@pytest.mark.parametrize('error, category', [
+    (TimeExhausted('no receipt'), RETRY_SAME_NONCE),
+    # CampaignNotFound(bytes32), Unauthorized(), unknown
+    (custom_error('0xce1befcb' + '00' * 32), TERMINAL),
+    (custom_error('0x82b42900'), BACKOFF),
+    (custom_error('0xdeadbeef'), BACKOFF),
+    (ValueError({'code': -32000, 'message': 'nonce too low'}), RETRY_NEW_NONCE),
+    (ValueError({'code': -32000, 'message': 'already known'}), RETRY_NEW_NONCE),
+    (ValueError({'code': -32000, 'message': 'transaction underpriced'}), RETRY_SAME_NONCE),
+    (ValueError({'code': -32000, 'message': 'max fee per gas less than block base fee'}), RETRY_SAME_NONCE),
+    (ConnectionError('connection reset'), BACKOFF),
+])
+def test_classify(errors, error, category):
+    assert classify(error, errors) == category
+
+
+def test_underpriced_replacement_depends_on_the_send():
+    error = ValueError({'code': -32000, 'message': 'replacement transaction underpriced'})
+    # a first send collided with a transaction we don't track
+    assert classify(error) == RETRY_NEW_NONCE
+    assert classify(error, replacement=True) == RETRY_SAME_NONCE
+
+
+def test_retry_delays_back_off_per_key():
+    policy = RetryPolicy(backoff=10, max_delay=35, jitter=0)
+    assert [policy.delay('a', BACKOFF) for _ in range(4)] == [10, 20, 35, 35]
+    assert policy.delay('b', BACKOFF) == 10
+    assert policy.delay('c', RETRY_SAME_NONCE) == 5
+
+
+def test_forget_and_terminal_reset_the_backoff():
+    policy = RetryPolicy(backoff=10, jitter=0)
+    policy.delay('a', BACKOFF)
+    policy.forget('a')
+    assert policy.delay('a', BACKOFF) == 10
+    assert policy.delay('a', TERMINAL) is None
+    assert policy.delay('a', BACKOFF) == 10
+
+
+def test_retry_delays_are_jittered():
+    policy = RetryPolicy(backoff=10, jitter=0.2)
+    delays = {policy.delay(key, BACKOFF) for key in range(50)}
+    assert all(8 <= delay <= 12 for delay in delays)
+    assert len(delays) > 1
@@ -0,0 +1,162 @@
+import asyncio
+
+import pytest
+from web3.exceptions import MethodUnavailable, TimeExhausted, TransactionNotFound, Web3TypeError
+
+from credbuzz_oracle.receipt_tracker import AsyncReceiptTracker, ReceiptTracker
+
+A, B, C = b'\xaa' * 32, b'\xbb' * 32, b'\xcc' * 32
+
+
+class FakeEth:
+    def __init__(self, block_number=10, block_receipts=True):
+        self.block_number = block_number
+        self.blocks = {}
+        self.block_receipts = block_receipts
+        self.block_lookups = []
+        self.receipt_lookups = []
+
+    def mine(self, *tx_hashes):
+        self.block_number += 1
+        self.blocks[self.block_number] = [{'transactionHash': tx_hash, 'status': 1} for tx_hash in tx_hashes]
+
+    def get_block_receipts(self, block):
+        if not self.block_receipts:
+            raise MethodUnavailable('eth_getBlockReceipts')
+        self.block_lookups.append(block)
+        return self.blocks.get(block, [])
+
+    def get_transaction_receipt(self, tx_hash):
+        self.receipt_lookups.append(tx_hash)
+        for receipts in self.blocks.values():
+            for receipt in receipts:
+                if receipt['transactionHash'] == tx_hash:
+                    return receipt
+        raise TransactionNotFound(tx_hash)
+
+
+class FakeWeb3:
+    def __init__(self, eth):
+        self.eth = eth
+
+    def batch_requests(self):
+        raise Web3TypeError('batch requests are not supported')
+
+
+def tracker(eth, **kwargs):
+    tracker = ReceiptTracker(FakeWeb3(eth), **kwargs)
+    tracker.poll()
+    return tracker
+
+
+def test_hashes_mined_before_tracking_are_looked_up_once():
+    eth = FakeEth()
+    eth.mine(A)
+    receipts = tracker(eth)
+    future = receipts.track([A], timeout=60)
+
+    receipts.poll()
+    assert future.result(0)['transactionHash'] == A
+    assert eth.receipt_lookups == [A] and len(receipts) == 0
+
+
+def test_new_blocks_resolve_tracked_hashes_from_block_receipts():
+    eth = FakeEth()
+    receipts = tracker(eth)
+    first, second = receipts.track([A], timeout=60), receipts.track([B], timeout=60)
+    receipts.poll()
+    eth.receipt_lookups.clear()
+
+    eth.mine(C)
+    eth.mine(B, A)
+    receipts.poll()
+    assert first.result(0)['transactionHash'] == A
+    assert second.result(0)['transactionHash'] == B
+    assert eth.block_lookups == [11, 12] and eth.receipt_lookups == []
+    # the batch failure is remembered
+    assert not receipts.batch
+
+
+def test_block_receipts_are_fetched_at_most_max_batch_blocks_at_a_time():
+    eth = FakeEth()
+    receipts = tracker(eth, max_batch_blocks=2)
+    receipts.track([A], timeout=60)
+    for _ in range(5):
+        eth.mine()
+
+    receipts.poll()
+    assert eth.block_lookups == [11, 12, 13, 14, 15]
+    assert receipts._last_block == 15
+
+
+def test_a_replacement_resolves_the_entry_of_the_original():
+    eth = FakeEth()
+    receipts = tracker(eth)
+    future = receipts.track([A, B], timeout=60)
+    receipts.poll()
+
+    eth.mine(B)
+    receipts.poll()
+    assert future.result(0)['transactionHash'] == B
+    assert receipts._by_hash == {} and len(receipts) == 0
+
+
+def test_without_block_receipts_every_tracked_hash_is_looked_up():
+    eth = FakeEth(block_receipts=False)
+    receipts = tracker(eth)
+    first, second = receipts.track([A], timeout=60), receipts.track([B], timeout=60)
+    receipts.poll()
+    eth.receipt_lookups.clear()
+
+    eth.mine(A)
+    receipts.poll()
+    assert first.result(0)['transactionHash'] == A and not second.done()
+    assert sorted(eth.receipt_lookups) == [A, B]
+    assert not receipts.block_receipts
+
+
+def test_entries_without_a_receipt_time_out():
+    eth = FakeEth()
+    receipts = tracker(eth)
+    future = receipts.track([A], timeout=0)
+
+    receipts.poll()
+    with pytest.raises(TimeExhausted):
+        future.result(0)
+    assert len(receipts) == 0
+
+
+class AsyncFakeEth(FakeEth):
+    @property
+    async def block_number(self):
+        return self._block_number
+
+    @block_number.setter
+    def block_number(self, block_number):
+        self._block_number = block_number
+
+    def mine(self, *tx_hashes):
+        self._block_number += 1
+        self.blocks[self._block_number] = [{'transactionHash': tx_hash, 'status': 1} for tx_hash in tx_hashes]
+
+    async def get_block_receipts(self, block):
+        return super().get_block_receipts(block)
+
+    async def get_transaction_receipt(self, tx_hash):
+        return super().get_transaction_receipt(tx_hash)
+
+
+def test_async_tracker_resolves_from_block_receipts():
+    async def resolve():
+        eth = AsyncFakeEth()
+        receipts = AsyncReceiptTracker(FakeWeb3(eth))
+        await receipts.poll()
+        future = receipts.track([A, B], timeout=60)
+        await receipts.poll()
+        eth.mine(B)
+        await receipts.poll()
+        return eth, await future
+
+    eth, receipt = asyncio.run(resolve())
+    assert receipt['transactionHash'] == B
+    assert eth.block_lookups == [11]
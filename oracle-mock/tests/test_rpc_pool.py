@@ -0,0 +1,73 @@
+import time
+
+import pytest
+from web3 import Web3
+from web3.exceptions import ContractLogicError
+
+from credbuzz_oracle.rpc_pool import PooledHTTPProvider
+
+
+class FakeProvider:
+    def __init__(self, response):
+        self.response = response
+        self.calls = 0
+
+    def make_request(self, method, params):
+        if method == 'eth_chainId':
+            return {'id': 1, 'jsonrpc': '2.0', 'result': '0x2105'}
+        self.calls += 1
+        return dict(self.response, id=1, jsonrpc='2.0')
+
+    def make_batch_request(self, requests):
+        self.calls += 1
+        return [dict(item, id=i, jsonrpc='2.0') for i, item in enumerate(self.response)]
+
+
+def pool(*responses) -> PooledHTTPProvider:
+    provider = PooledHTTPProvider([f'http://node-{i}' for i in range(len(responses))])
+    # no head checks, they would reorder the endpoints by latency
+    provider._heads_checked_at = time.time() + 3600
+    for endpoint, response in zip(provider.endpoints, responses):
+        endpoint.provider = FakeProvider(response)
+    return provider
+
+
+REVERT = {'error': {'code': 3, 'message': 'execution reverted: rate limit', 'data': '0x82b42900'}}
+INTERNAL = {'error': {'code': -32603, 'message': 'gas required exceeds allowance'}}
+RATE_LIMITED = {'error': {'code': 429, 'message': 'Your app has exceeded its compute units per second capacity'}}
+OK = {'result': '0x1'}
+
+
+@pytest.mark.parametrize('response', [REVERT, INTERNAL])
+def test_request_errors_are_returned_without_failover(response):
+    provider = pool(response, OK)
+    assert provider.make_request('eth_call', [])['error'] == response['error']
+    assert provider.endpoints[0].failures == 0
+    assert provider.endpoints[1].provider.calls == 0
+
+
+def test_rate_limits_fail_over():
+    provider = pool(RATE_LIMITED, OK)
+    assert provider.make_request('eth_call', [])['result'] == '0x1'
+    assert provider.endpoints[0].failures == 1
+
+
+def test_revert_surfaces_as_contract_logic_error():
+    w3 = Web3(pool(REVERT))
+    with pytest.raises(ContractLogicError) as excinfo:
+        w3.eth.call({'to': '0x' + '11' * 20, 'data': '0x'})
+    assert excinfo.value.data == '0x82b42900'
+
+
+def test_batch_item_errors_stay_with_their_item():
+    provider = pool([OK, REVERT], [OK, OK])
+    responses = provider.make_batch_request([('eth_call', []), ('eth_call', [])])
+    assert responses[1]['error'] == REVERT['error']
+    assert provider.endpoints[1].provider.calls == 0
+
+
+def test_rate_limited_batch_item_fails_the_batch_over():
+    provider = pool([OK, RATE_LIMITED], [OK, OK])
+    responses = provider.make_batch_request([('eth_call', []), ('eth_call', [])])
+    assert [response['result'] for response in responses] == ['0x1', '0x1']
+    assert provider.endpoints[0].failures == 1
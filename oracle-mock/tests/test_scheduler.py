@@ -0,0 +1,72 @@
+import threading
+import time
+
+from credbuzz_oracle.scheduler import DeadlineScheduler
+
+
+def test_pop_due_returns_due_keys_earliest_first():
+    scheduler = DeadlineScheduler()
+    scheduler.schedule('b', 20)
+    scheduler.schedule('a', 10)
+    scheduler.schedule('c', 30)
+
+    assert scheduler.pop_due(25) == ['a', 'b']
+    assert len(scheduler) == 1
+    assert scheduler.next_deadline() == 30
+
+
+def test_reschedule_replaces_the_old_deadline():
+    scheduler = DeadlineScheduler()
+    scheduler.schedule('a', 10)
+    scheduler.schedule('a', 40)
+
+    assert scheduler.next_deadline() == 40
+    assert scheduler.pop_due(20) == []
+    assert scheduler.pop_due(40) == ['a']
+
+
+def test_cancelled_keys_are_skipped():
+    scheduler = DeadlineScheduler()
+    scheduler.schedule('a', 10)
+    scheduler.schedule('b', 20)
+    scheduler.cancel('a')
+
+    assert len(scheduler) == 1
+    assert scheduler.next_deadline() == 20
+    assert scheduler.pop_due(30) == ['b']
+    assert scheduler.next_deadline() is None
+
+
+def test_wait_returns_when_a_deadline_is_due():
+    scheduler = DeadlineScheduler()
+    scheduler.schedule('a', time.time() - 1)
+    assert scheduler.wait(5) is True
+
+
+def test_wait_times_out_without_due_deadlines():
+    scheduler = DeadlineScheduler()
+    scheduler.schedule('a', time.time() + 60)
+    assert scheduler.wait(0.01) is False
+
+
+def test_earlier_schedule_wakes_a_pending_wait():
+    scheduler = DeadlineScheduler()
+    scheduler.schedule('a', time.time() + 60)
+    timer = threading.Timer(0.05, scheduler.schedule, ('b', time.time()))
+    timer.start()
+
+    started = time.time()
+    assert scheduler.wait(5) is True
+    assert time.time() - started < 5
+    timer.join()
+
+
+def test_wake_interrupts_a_wait():
+    scheduler = DeadlineScheduler()
+    timer = threading.Timer(0.05, scheduler.wake)
+    timer.start()
+
+    started = time.time()
+    assert scheduler.wait(5) is False
+    assert time.time() - started < 5
+    timer.join()
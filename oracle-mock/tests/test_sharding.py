@@ -0,0 +1,67 @@
+import multiprocessing
+import os
+
+import pytest
+
+from credbuzz_oracle import sharding
+from credbuzz_oracle.sharding import HashRing, ShardSupervisor
+
+
+def fake_worker(name, members, config, discards, control, metrics_port):
+    discards.put(('targeted', [(name, os.getpid())]))
+    control.get()
+
+
+class Stop(Exception):
+    pass
+
+
+def test_supervisor_forks_each_worker_once(monkeypatch):
+    monkeypatch.setattr(sharding, 'run_shard_worker', fake_worker)
+    reported = []
+    supervisor = ShardSupervisor(3, {}, lambda campaign_type, campaign_ids: reported.extend(campaign_ids),
+                                 check_interval=0.05)
+
+    ticks = []
+
+    def on_tick():
+        # give a second round of workers time to report before stopping
+        if len(reported) >= 3:
+            ticks.append(None)
+        if len(ticks) > 10:
+            raise Stop()
+
+    supervisor.on_tick = on_tick
+    supervisor.start()
+    try:
+        with pytest.raises(Stop):
+            supervisor.run()
+        assert sorted(name for name, _ in reported) == ['shard-0', 'shard-1', 'shard-2']
+        assert len({pid for _, pid in reported}) == 3
+        assert len(multiprocessing.active_children()) == 3
+    finally:
+        for process in supervisor.processes.values():
+            process.terminate()
+            process.join()
+
+
+def test_hash_ring_moves_only_the_leaving_members_ids():
+    ids = [i.to_bytes(32, 'big') for i in range(2000)]
+    before = HashRing(['shard-0', 'shard-1', 'shard-2'])
+    after = HashRing(['shard-0', 'shard-2'])
+
+    owners = {campaign_id: before.owner(campaign_id) for campaign_id in ids}
+    assert set(owners.values()) == {'shard-0', 'shard-1', 'shard-2'}
+    for campaign_id, owner in owners.items():
+        if owner != 'shard-1':
+            assert after.owner(campaign_id) == owner
+        else:
+            assert after.owner(campaign_id) in ('shard-0', 'shard-2')
+
+
+def test_hash_ring_owns_predicate():
+    ring = HashRing(['a', 'b'])
+    campaign_id = b'\x01' * 32
+    owner = ring.owner(campaign_id)
+    assert ring.owns(owner)(('targeted', campaign_id))
+    assert not ring.owns('b' if owner == 'a' else 'a')(('targeted', campaign_id))
@@ -490,6 +490,178 @@ describe("Marketplace", function () {
     });
   });
 
+  describe("Batch Discards", function () {
+    let marketplace: any;
+    let mockToken: any;
+    let creator: any;
+    let kol: any;
+    let campaignData: any;
+    let campaignIds: any[];
+
+    beforeEach(async function () {
+      const setup = await setupTargetedCampaignTest();
+      marketplace = setup.marketplace;
+      mockToken = setup.mockToken;
+      creator = setup.creator;
+      kol = setup.kol;
+      campaignData = setup.campaignData;
+
+      await mockToken
+        .connect(creator)
+        .approve(marketplace.target, campaignData.offeringAmount * BigInt(3));
+
+      campaignIds = [];
+      for (let i = 0; i < 3; i++) {
+        const tx = await marketplace
+          .connect(creator)
+          .createTargetedCampaign(
+            campaignData.selectedKol,
+            campaignData.offeringAmount,
+            campaignData.offerEndsIn,
+            campaignData.tokenAddress
+          );
+        const receipt = await tx.wait();
+        const event = receipt.logs.find(
+          (log: any) =>
+            log.fragment && log.fragment.name === "TargetedCampaignCreated"
+        );
+        campaignIds.push(event.args[0]);
+      }
+    });
+
+    it("Should discard every ongoing campaign in the batch", async function () {
+      const creatorBalanceBefore = await mockToken.balanceOf(creator.address);
+
+      await expect(marketplace.batchDiscardTargetedCampaigns(campaignIds))
+        .to.emit(marketplace, "TargetedCampaignDiscarded")
+        .withArgs(campaignIds[2], await marketplace.owner());
+
+      for (const campaignId of campaignIds) {
+        const campaign = await marketplace.getTargetedCampaignInfo(campaignId);
+        expect(campaign.campaignStatus).to.equal(CampaignStatus.DISCARDED);
+      }
+
+      const creatorBalanceAfter = await mockToken.balanceOf(creator.address);
+      expect(creatorBalanceAfter - creatorBalanceBefore).to.equal(
+        campaignData.offeringAmount * BigInt(3)
+      );
+    });
+
+    it("Should skip finalized and unknown campaigns", async function () {
+      await marketplace.connect(kol).fulfilTargetedCampaign(campaignIds[0]);
+      const unknownId = hre.ethers.ZeroHash;
+
+      const tx = await marketplace.batchDiscardTargetedCampaigns([
+        ...campaignIds,
+        unknownId,
+      ]);
+      const receipt = await tx.wait();
+      const discarded = receipt.logs.filter(
+        (log: any) =>
+          log.fragment && log.fragment.name === "TargetedCampaignDiscarded"
+      );
+      expect(discarded.map((log: any) => log.args[0])).to.deep.equal(
+        campaignIds.slice(1)
+      );
+
+      const campaign = await marketplace.getTargetedCampaignInfo(
+        campaignIds[0]
+      );
+      expect(campaign.campaignStatus).to.equal(CampaignStatus.FULFILLED);
+    });
+
+    it("Should only allow the owner to batch discard", async function () {
+      await expect(
+        marketplace.connect(creator).batchDiscardTargetedCampaigns(campaignIds)
+      ).to.be.revertedWithCustomError(
+        marketplace,
+        "OwnableUnauthorizedAccount"
+      );
+      await expect(
+        marketplace.connect(creator).batchDiscardPublicCampaigns(campaignIds)
+      ).to.be.revertedWithCustomError(
+        marketplace,
+        "OwnableUnauthorizedAccount"
+      );
+    });
+  });
+
+  describe("Public Batch Discards", function () {
+    let marketplace: any;
+    let mockToken: any;
+    let creator: any;
+    let campaignData: any;
+    let campaignIds: any[];
+
+    beforeEach(async function () {
+      const setup = await setupPublicCampaignTest();
+      marketplace = setup.marketplace;
+      mockToken = setup.mockToken;
+      creator = setup.creator;
+      campaignData = setup.campaignData;
+
+      await mockToken
+        .connect(creator)
+        .approve(marketplace.target, campaignData.poolAmount * BigInt(3));
+
+      campaignIds = [];
+      for (let i = 0; i < 3; i++) {
+        const tx = await marketplace
+          .connect(creator)
+          .createPublicCampaign(
+            campaignData.offerEndsIn,
+            campaignData.poolAmount,
+            campaignData.tokenAddress
+          );
+        const receipt = await tx.wait();
+        const event = receipt.logs.find(
+          (log: any) =>
+            log.fragment && log.fragment.name === "PublicCampaignCreated"
+        );
+        campaignIds.push(event.args[0]);
+      }
+    });
+
+    it("Should discard every ongoing campaign in the batch", async function () {
+      const creatorBalanceBefore = await mockToken.balanceOf(creator.address);
+
+      await expect(marketplace.batchDiscardPublicCampaigns(campaignIds))
+        .to.emit(marketplace, "PublicCampaignDiscarded")
+        .withArgs(campaignIds[2], await marketplace.owner());
+
+      for (const campaignId of campaignIds) {
+        const campaign = await marketplace.getPublicCampaignInfo(campaignId);
+        expect(campaign.campaignStatus).to.equal(CampaignStatus.DISCARDED);
+      }
+
+      const creatorBalanceAfter = await mockToken.balanceOf(creator.address);
+      expect(creatorBalanceAfter - creatorBalanceBefore).to.equal(
+        campaignData.poolAmount * BigInt(3)
+      );
+    });
+
+    it("Should skip finalized and unknown campaigns", async function () {
+      await marketplace.connect(creator).completePublicCampaign(campaignIds[0]);
+      const unknownId = hre.ethers.ZeroHash;
+
+      const tx = await marketplace.batchDiscardPublicCampaigns([
+        ...campaignIds,
+        unknownId,
+      ]);
+      const receipt = await tx.wait();
+      const discarded = receipt.logs.filter(
+        (log: any) =>
+          log.fragment && log.fragment.name === "PublicCampaignDiscarded"
+      );
+      expect(discarded.map((log: any) => log.args[0])).to.deep.equal(
+        campaignIds.slice(1)
+      );
+
+      const campaign = await marketplace.getPublicCampaignInfo(campaignIds[0]);
+      expect(campaign.campaignStatus).to.equal(CampaignStatus.FULFILLED);
+    });
+  });
+
   describe("Getter Functions", function () {
     let marketplace: any;
     let mockToken: any;